@@ -1,12 +1,23 @@
 import pulumi
 import json
 from modules.efs import Efs
+from modules.rds import Rds
+from modules.fsx import Fsx
 from modules.eks import Eks
 from modules.eks_nodes_ec2 import EksNodesEc2
-from modules.vpc import Vpc
-from modules.route53 import Route53
+from modules.vpc import Vpc, subnet_azs
+from modules.route53 import Route53, IngressDnsAlias
 from modules.lb import LoadBalancer
-from modules.eks_addons import EfsAddon
+from modules.addon_versions import AddonVersionResolver
+from modules.external_dns import ExternalDns
+from modules.eks_addons import EfsAddon, EbsAddon, FsxAddon
+from modules.stack_config import StackConfigError, check_availability_zones, load_stack_config
+from modules.providers import create_providers
+from modules.service_account_role import POD_IDENTITY_AGENT_ADDON
+from modules.dns import ClusterDns, NODE_LOCAL_DNS_IP
+from modules.kube_proxy import KubeProxyAddon, ipvs_kernel_modules
+from modules.observability import CLOUDWATCH_OBSERVABILITY_ADDON, Observability
+from modules.api_priority import ApiPriority
 import pulumi_aws as aws
 # import pulumi_command as command
 # import pulumi_null as null
@@ -19,226 +30,535 @@ def die(msg):
 config = pulumi.Config()
 
 ###################################################################################################
-## Required Settings
+## Settings
 ###################################################################################################
-resource_prefix                 = config.require("resource_prefix")
-vpc_cidr_block                  = config.require("vpc_cidr_block")
-kubernetes_version              = config.require("kubernetes_version")
-zone_name                       = config.require("zone_name")
-storage_class_name              = config.require("storage_class_name")
-eks_node_group_instance_types   = config.require_object("eks_node_group_instance_types")
-storage_mount_options           = config.require_object("storage_mount_options")
+# Everything is read and checked here, before any provider or resource exists, and every problem
+# is reported at once. See modules/stack_config.py for the keys and their defaults.
+try:
+    cfg = load_stack_config(config)
+except StackConfigError as e:
+    die(str(e))
 
-pulumi.export("resource_prefix", resource_prefix)
-
-# The number of PUBLIC subnets to create
-public_subnet_count = config.get_int("public_subnet_count") or 2
-
-# The number of PRIVATE subnets to create. This also current dictates the number of node-groups created for the cluster - 1 per private subnet.
-private_subnet_count = config.get_int("private_subnet_count") or 2
-
-# How many nodes should exist in each nodegroup created
-eks_nodes_per_nodegroup = config.get_int("eks_nodes_per_nodegroup") or 1
-
-# This is the min memory (mib) for any instance participating in a node group/autoscaling group
-eks_instance_min_mem = config.get_int("eks_instance_min_mem") or 4096
-
-# Maximum nodes that should exist in each nodegroup created
-eks_max_nodes_per_nodegroup = config.get_int("eks_max_nodes_per_nodegroup") or 10
-
-eks_instance_min_vcpu = config.get_int("eks_instance_min_vcpu") or 1
-
-eks_nodegroup_ami_type = config.get("eks_nodegroup_ami_type", "AL2023_x86_64_STANDARD")
+resource_prefix = cfg.resource_prefix
+vpc_cidr_block = cfg.vpc_cidr_block
+common_tags = cfg.common_tags
 
-common_tags = config.get_object("common_tags")
-if common_tags is None:
-    common_tags = {
-        "cb-environment": "development",
-        "cb-expiry": "2027-2-30",
-        "cb-owner": "professional-services",
-        "cb-purpose": "local testing cluster",
-        "cb-user": "kshenk",
-    }
-
-kubernetes_upgrade_policy = config.get("kubernetes_upgrade_policy") or "STANDARD"
-create_alb_controller = config.get_bool("create_alb_controller") or False
-create_eks_cluster = config.get_bool("create_eks_cluster") or False
-create_efs_filesystem = config.get_bool("create_efs_filesystem") or False
-create_asg_schedule = config.get_bool("create_asg_schedule") or False
-create_r53_zone = config.get_bool("create_r53_zone") or False
-route53_wait_for_validation = config.get_bool("route53_wait_for_validation") or False
-
-cluster_enable_private_access = config.get_bool("cluster_enable_private_access") or False
-cluster_enable_public_access = config.get_bool("cluster_enable_public_access") or True # Otherwise, I don't think you can reach it.
+pulumi.export("resource_prefix", resource_prefix)
 
-# You typically want YOUR local IP address in here at the least.
-# TODO: take additional cidrs (such as the VPN) from user configuration 
-access_cidrs = [config.get("myip")]
-if len(access_cidrs) == 0:
+if not cfg.cluster_access_cidrs:
     pulumi.warn("'myip' is not set!")
 
-additional_eks_cidrs = config.get_object("additional_eks_access_cidrs") or []
-cluster_access_cidrs = access_cidrs + additional_eks_cidrs
-
-asg_schedule = config.get_object("asg_schedule")
-if create_asg_schedule is not True:
+if cfg.create_asg_schedule is not True:
     pulumi.info("AutoScaling Group Schedules are not enabled")
 
-if eks_max_nodes_per_nodegroup < eks_nodes_per_nodegroup and eks_nodes_per_nodegroup > 0:
-    die("eks_max_nodes_per_nodegroup must be greater than eks_nodes_per_nodegroup!")
-
-if create_alb_controller and not create_eks_cluster:
-    die("create_eks_cluster must be true if create_alb_controller is true")
-
-available = aws.get_availability_zones_output()
-
-# Passing the provider to each resource adopts the tags
-aws_provider = aws.Provider("aws-provider",
-    default_tags=aws.ProviderDefaultTagsArgs(
-        tags=common_tags
-    )
-)
+# Which parts of the program this stack deploys - see STACK_LAYERS in modules/stack_config.py
+deploy_network = cfg.layer in ["all", "network"]
+deploy_cluster = cfg.layer in ["all", "cluster"]
+deploy_platform = cfg.layer in ["all", "platform"]
+
+# Every resource and invoke names its provider; default providers are disabled for the stack
+providers = create_providers(common_tags)
+
+# Resolved up front (not as an Output) so subnets and EFS mount targets can be laid out per AZ
+available = aws.get_availability_zones(state="available", opts=pulumi.InvokeOptions(provider=providers.aws))
+try:
+    availability_zones = check_availability_zones(cfg, available.names)
+except StackConfigError as e:
+    die(str(e))
+
+def eks_kubeconfig(endpoint, certificate_authority, cluster_name) -> pulumi.Output:
+    return pulumi.Output.all(endpoint, certificate_authority, cluster_name).apply(lambda args: json.dumps({
+        "apiVersion": "v1",
+        "clusters": [{"cluster": {"server": args[0], "certificate-authority-data": args[1]}, "name": "eks"}],
+        "contexts": [{"context": {"cluster": "eks", "user": "eks"}, "name": "eks"}],
+        "current-context": "eks",
+        "users": [{"name": "eks", "user": {"exec": {
+            "apiVersion": "client.authentication.k8s.io/v1beta1",
+            "command": "aws",
+            "args": ["eks", "get-token", "--cluster-name", args[2]],
+        }}}],
+    }))
+
+# Each cluster's outputs go under the 'clusters' output. The first cluster's are also exported at the
+# top level, where the helper scripts and the platform layer read them.
+primary_cluster = cfg.clusters[0]
+cluster_outputs = {cluster.name: {} for cluster in cfg.clusters}
+
+def cluster_export(cluster, key, value):
+    cluster_outputs[cluster.name][key] = value
+    if cluster is primary_cluster:
+        pulumi.export(key, value)
 
 ###################################################################################################
 ## Creating resources
 ###################################################################################################
-## VPC
+## Network layer: VPC, hosted zone & certificate
 ###################################################################################################
-vpc = Vpc(aws_provider, f"{resource_prefix}-vpc", {
-    'availability_zones': available.names, 
-    'resource_prefix': resource_prefix, 
-    'public_subnet_count': public_subnet_count, 
-    'private_subnet_count': private_subnet_count, 
-    'cidr_block': vpc_cidr_block, 
-    'enable_dns_support': config.get_bool("enable_dns_support") or True, 
-    'enable_dns_hostnames': config.get_bool("enable_dns_host_name") or True
-})
-
-pulumi.export("vpc_id", vpc.vpc_id)
-pulumi.export("vpc_cidr_block", vpc.cidr_block)
-pulumi.export("nat_public_ip", vpc.nat_public_ip)
-
-## Hosted Zone & Certificate
-###################################################################################################
-if create_r53_zone:
-    zone = Route53(aws_provider, f"{resource_prefix}-route53", {
+if deploy_network:
+    vpc = Vpc(providers, f"{resource_prefix}-vpc", {
+        'availability_zones': list(availability_zones),
         'resource_prefix': resource_prefix, 
-        'zone_name': zone_name,
-        'wait_for_validation': route53_wait_for_validation
+        'public_subnet_count': cfg.public_subnet_count, 
+        'private_subnet_count': cfg.private_subnet_count, 
+        'cidr_block': vpc_cidr_block, 
+        'enable_dns_support': cfg.enable_dns_support,
+        'enable_dns_hostnames': cfg.enable_dns_hostnames,
+        'cluster_names': [cluster.cluster_name for cluster in cfg.clusters],
     })
 
-    pulumi.export("zone_name", zone.zone_name)
-    pulumi.export("hosted_zone_id", zone.hosted_zone_id)
-    pulumi.export("certificate_arn", zone.certificate_arn)
-    pulumi.export("nameservers", zone.nameservers)
+    pulumi.export("vpc_id", vpc.vpc_id)
+    pulumi.export("vpc_cidr_block", vpc.cidr_block)
+    pulumi.export("nat_public_ip", vpc.nat_public_ip)
+    pulumi.export("private_subnet_ids", vpc.private_subnet_ids)
+    pulumi.export("private_subnet_azs", vpc.private_subnet_azs)
+    pulumi.export("private_route_table_id", vpc.private_route_table_id)
+
+    vpc_id = vpc.vpc_id
+    private_subnet_ids = vpc.private_subnet_ids
+    private_subnet_azs = vpc.private_subnet_azs
+    private_route_table_id = vpc.private_route_table_id
+    nat_public_ip = vpc.nat_public_ip
+    # Node groups wait on the private routing (NAT) rather than on the subnet ids alone
+    network_dependencies = vpc.private_network_dependencies
+
+    ## Hosted Zone & Certificate
+    ###############################################################################################
+    if cfg.create_r53_zone:
+        zone = Route53(providers, f"{resource_prefix}-route53", {
+            'resource_prefix': resource_prefix, 
+            'zone_name': cfg.zone_name,
+            'wait_for_validation': cfg.route53_wait_for_validation,
+            'subject_alternative_names': list(cfg.subject_alternative_names),
+        })
 
-## EKS Cluster
+        pulumi.export("zone_name", zone.zone_name)
+        pulumi.export("hosted_zone_id", zone.hosted_zone_id)
+        pulumi.export("certificate_arn", zone.certificate_arn)
+        pulumi.export("nameservers", zone.nameservers)
+        pulumi.export("certificate_validation_records", zone.validation_records)
+
+        hosted_zone_id = zone.hosted_zone_id
+else:
+    network = pulumi.StackReference(cfg.network_stack)
+
+    vpc_id = network.require_output("vpc_id")
+    # The subnet count comes from config so components can still create one resource per subnet
+    private_subnet_ids = [network.require_output("private_subnet_ids")[i] for i in range(cfg.private_subnet_count)]
+    # Same round-robin layout the network stack used, known now rather than as an Output
+    private_subnet_azs = subnet_azs(availability_zones, cfg.private_subnet_count)
+    private_route_table_id = network.require_output("private_route_table_id")
+    nat_public_ip = network.require_output("nat_public_ip")
+    # Already deployed by the network stack
+    network_dependencies = []
+    hosted_zone_id = network.get_output("hosted_zone_id")
+
+## Cluster layer: EKS, nodes and the data services that outlive platform changes
 ###################################################################################################
-if create_eks_cluster:
-    eks = Eks(aws_provider, vpc, f"{resource_prefix}-eks", {
-        'cluster_name': resource_prefix, 
-        'k8s_version': kubernetes_version, 
-        'k8s_upgrade_policy': kubernetes_upgrade_policy, 
-        'vpc_id': vpc.vpc_id, 
-        'vpc_cidr': vpc_cidr_block, 
-        'private_subnet_ids': vpc.private_subnet_ids, 
-        'enable_private_access': cluster_enable_private_access, 
-        'enable_public_access': cluster_enable_public_access, 
-        'storage_class_name': storage_class_name,
-        'public_access_cidrs': std.concat_output(input=[
-            cluster_access_cidrs,
-            [vpc.nat_public_ip.apply(lambda nat_public_ip: f"{nat_public_ip}/32")],
-        ]).apply(lambda invoke: [cidr for cidr in invoke.result if cidr is not None])
-    })
-
-    k8s_provider = k8s.Provider(f"{resource_prefix}-k8s-provider",
-        kubeconfig=pulumi.Output.all(
-            eks.eks_endpoint,
-            eks.certificate_authority,  # you'll need to expose this from Eks
-            eks.cluster_name,
-        ).apply(lambda args: json.dumps({
-            "apiVersion": "v1",
-            "clusters": [{"cluster": {"server": args[0], "certificate-authority-data": args[1]}, "name": "eks"}],
-            "contexts": [{"context": {"cluster": "eks", "user": "eks"}, "name": "eks"}],
-            "current-context": "eks",
-            "users": [{"name": "eks", "user": {"exec": {
-                "apiVersion": "client.authentication.k8s.io/v1beta1",
-                "command": "aws",
-                "args": ["eks", "get-token", "--cluster-name", args[2]],
-            }}}],
-        })),
-        opts=pulumi.ResourceOptions(parent=eks)
-    )
-
-    eks_nodes_ec2 = EksNodesEc2(aws_provider, eks, vpc, f"{resource_prefix}-eks-nodes", {
-        'cluster_name': resource_prefix, 
-        'aws_iam_role_node_arn': eks.aws_iam_role_node_arn, 
-        'nodegroup_name': "ng", 
-        'private_subnet_ids': vpc.private_subnet_ids, 
-        'instance_types': eks_node_group_instance_types, 
-        'eks_nodegroup_ami_type': eks_nodegroup_ami_type,
-        'sizeMin': 0,
-        'sizeMax': eks_max_nodes_per_nodegroup, 
-        'sizeDesired': eks_nodes_per_nodegroup, 
-        'memory_min': eks_instance_min_mem, 
-        'vcpu_min': eks_instance_min_vcpu, 
-        'tags': common_tags,
-        'asg_schedule': asg_schedule if create_asg_schedule else {}
-    })
+if deploy_cluster:
+    ## EKS Clusters
+    ###############################################################################################
+    # One Eks and EksNodesEc2 per entry of `clusters`. They share the VPC and the data services below
+    # but nothing else, so the clusters build in parallel.
+    eks_clusters = {}
+    eks_node_groups = {}
+    if cfg.create_eks_cluster:
+        for cluster in cfg.clusters:
+            eks = Eks(providers, vpc if deploy_network else None, f"{cluster.cluster_name}-eks", {
+                'cluster_name': cluster.cluster_name, 
+                'k8s_version': cluster.kubernetes_version, 
+                'k8s_upgrade_policy': cfg.kubernetes_upgrade_policy, 
+                'control_plane_scaling_tier': cfg.control_plane_scaling_tier,
+                'primary': cluster is primary_cluster,
+                'vpc_id': vpc_id, 
+                'vpc_cidr': vpc_cidr_block, 
+                'private_subnet_ids': private_subnet_ids, 
+                'enable_private_access': cfg.cluster_enable_private_access, 
+                'enable_public_access': cfg.cluster_enable_public_access, 
+                'storage_class_name': cfg.storage_class_name,
+                'service_account_role_mode': cfg.service_account_role_mode,
+                'control_plane_log_types': list(cfg.control_plane_log_types),
+                'control_plane_log_retention_days': cfg.control_plane_log_retention_days,
+                'public_access_cidrs': std.concat_output(input=[
+                    list(cfg.cluster_access_cidrs),
+                    [nat_public_ip.apply(lambda nat_public_ip: f"{nat_public_ip}/32")],
+                ], opts=pulumi.InvokeOptions(provider=providers.std)).apply(lambda invoke: [cidr for cidr in invoke.result if cidr is not None])
+            })
+
+            eks_nodes_ec2 = EksNodesEc2(providers, [eks.cluster, *eks.node_role_dependencies], network_dependencies, f"{cluster.cluster_name}-eks-nodes", {
+                'cluster_name': cluster.cluster_name, 
+                'aws_iam_role_node_arn': eks.aws_iam_role_node_arn, 
+                'nodegroup_name': "ng", 
+                'private_subnet_ids': private_subnet_ids, 
+                'instance_types': list(cluster.eks_node_group_instance_types), 
+                'eks_nodegroup_ami_type': cluster.eks_nodegroup_ami_type,
+                'sizeMin': 0,
+                'sizeMax': cluster.eks_max_nodes_per_nodegroup, 
+                'sizeDesired': cluster.eks_nodes_per_nodegroup, 
+                'memory_min': cfg.eks_instance_min_mem, 
+                'vcpu_min': cfg.eks_instance_min_vcpu, 
+                'tags': common_tags,
+                'asg_schedule': cfg.asg_schedule if cfg.create_asg_schedule else {},
+                'cluster_dns_ip': NODE_LOCAL_DNS_IP if cfg.create_node_local_dns else None,
+                'kernel_modules': ipvs_kernel_modules(cfg.kube_proxy_settings) if cfg.create_kube_proxy_addon else [],
+            })
+
+            eks_clusters[cluster.name] = eks
+            eks_node_groups[cluster.name] = eks_nodes_ec2
+
+            cluster_export(cluster, "asg_creation_info", eks_nodes_ec2.asg_creation_info)
+            cluster_export(cluster, "eks_node_role_arn", eks.aws_iam_role_node_arn)
+            cluster_export(cluster, "eks_cluster_role_name", eks.eks_cluster_role_name)
+            cluster_export(cluster, "eks_cluster_name", eks.cluster_name)
+            cluster_export(cluster, "eks_cluster_id", eks.cluster_id)
+            cluster_export(cluster, "eks_cluster_status", eks.status)
+            cluster_export(cluster, "eks_cluster_endpoint", eks.eks_endpoint)
+            cluster_export(cluster, "eks_certificate_authority", eks.certificate_authority)
+            cluster_export(cluster, "oidc_provider_arn", eks.oidc_provider_arn)
+            cluster_export(cluster, "oidc_provider_url", eks.oidc_provider_url)
+            cluster_export(cluster, "upgrade_support_type", eks.upgrade_support_type)
+            cluster_export(cluster, "control_plane_scaling_tier", eks.control_plane_scaling_tier)
+
+            cluster_export(cluster, "eks_nodegroup_ids", eks_nodes_ec2.eks_nodegroup_ids)
+            cluster_export(cluster, "eks_nodegroup_arns", eks_nodes_ec2.eks_nodegroup_arns)
+            cluster_export(cluster, "eks_nodegroup_asgs", eks_nodes_ec2.eks_nodegroup_asgs)
+
+        eks = eks_clusters[primary_cluster.name]
+        eks_nodes_ec2 = eks_node_groups[primary_cluster.name]
+        pulumi.export("storage_class_name", cfg.storage_class_name)
+
+    ## END: if create_eks_cluster
+    ###############################################################################################
+
+    ## EFS
+    ###############################################################################################
+    efs = []
+    if cfg.create_efs_filesystem:
+        efs.append(Efs(providers, f"{resource_prefix}-efs-1", {
+            'private_subnet_ids': private_subnet_ids, 
+            'resource_prefix': resource_prefix, 
+            'vpc_id': vpc_id, 
+            'vpc_cidr': vpc_cidr_block,
+            'private_subnet_azs': private_subnet_azs,
+            'performance_mode': cfg.efs_performance_mode,
+            'throughput_mode': cfg.efs_throughput_mode,
+            'provisioned_throughput_mibps': cfg.efs_provisioned_throughput_mibps,
+            'transition_to_ia': cfg.efs_lifecycle.get("transition_to_ia"),
+            'transition_to_archive': cfg.efs_lifecycle.get("transition_to_archive"),
+            'transition_to_primary_storage_class': cfg.efs_lifecycle.get("transition_to_primary_storage_class"),
+            }
+        ))
+
+        pulumi.export("efs_mount_target", [__item.efs_mount_target for __item in efs])
+        pulumi.export("efs_system_id", [__item.efs_file_system_id for __item in efs])
+        pulumi.export("efs_file_system_id", efs[0].efs_file_system_id)
+        pulumi.export("efs_throughput", [{
+            'performance_mode': __item.performance_mode,
+            'throughput_mode': __item.throughput_mode,
+            'provisioned_throughput_mibps': __item.provisioned_throughput_mibps,
+        } for __item in efs])
+
+    ## Database
+    ###############################################################################################
+    if cfg.create_database:
+        rds = Rds(providers, f"{resource_prefix}-rds", {
+            **cfg.database_settings,
+            'rds_instance_identifier': f"{resource_prefix}-db",
+            'private_subnet_ids': private_subnet_ids,
+            'vpc_id': vpc_id,
+            'vpc_cidr_block': vpc_cidr_block,
+            'db_dns_name': "db",
+        })
 
-    pulumi.export("asg_creation_info", eks_nodes_ec2.asg_creation_info)
-    pulumi.export("eks_node_role_arn", eks.aws_iam_role_node_arn)
-    pulumi.export("eks_cluster_role_name", eks.eks_cluster_role_name)
-    pulumi.export("eks_cluster_name", eks.cluster_name)
-    pulumi.export("eks_cluster_id", eks.cluster_id)
-    pulumi.export("eks_cluster_status", eks.status)
-    pulumi.export("eks_cluster_endpoint", eks.eks_endpoint)
-    pulumi.export("storage_class_name", storage_class_name)
+        pulumi.export("database_dns_name", rds.dns_name)
+        pulumi.export("database_name", rds.name)
+        pulumi.export("database_user", rds.user)
+        pulumi.export("database_password", rds.password)
+        pulumi.export("database_secret_arn", rds.secret_arn)
+        pulumi.export("database_proxy_endpoint", rds.proxy_endpoint)
+        pulumi.export("database_reader_dns_name", rds.reader_dns_name)
+
+    ## FSx build cache
+    ###############################################################################################
+    if cfg.create_fsx_cache:
+        fsx = Fsx(providers, f"{resource_prefix}-fsx", {
+            'resource_prefix': resource_prefix,
+            'file_system_type': cfg.fsx_file_system_type,
+            'deployment_type': cfg.fsx_deployment_type,
+            'throughput_capacity': cfg.fsx_throughput_capacity,
+            'storage_capacity': cfg.fsx_storage_capacity,
+            'private_subnet_ids': private_subnet_ids,
+            'route_table_ids': [private_route_table_id],
+            'vpc_id': vpc_id,
+            'vpc_cidr': vpc_cidr_block,
+        })
 
-    pulumi.export("eks_nodegroup_ids", eks_nodes_ec2.eks_nodegroup_ids)
-    pulumi.export("eks_nodegroup_arns", eks_nodes_ec2.eks_nodegroup_arns)
-    pulumi.export("eks_nodegroup_asgs", eks_nodes_ec2.eks_nodegroup_asgs)
+        pulumi.export("fsx_file_system_id", fsx.file_system_id)
+        pulumi.export("fsx_dns_name", fsx.dns_name)
+        pulumi.export("fsx_storage_capacity", fsx.storage_capacity)
+        pulumi.export("fsx_root_volume_id", fsx.root_volume_id)
+        pulumi.export("fsx_mount_name", fsx.mount_name)
 
-## END: if create_eks_cluster
+## Platform layer: everything installed into the cluster, changed day to day
 ###################################################################################################
-    
-## EFS
-###################################################################################################
-efs = []
-if create_efs_filesystem:
-    efs.append(Efs(aws_provider, f"{resource_prefix}-efs-1", {
-        'private_subnet_ids': vpc.private_subnet_ids, 
-        'resource_prefix': resource_prefix, 
-        'vpc_id': vpc.vpc_id, 
-        'vpc_cidr': vpc_cidr_block,
+if deploy_platform and cfg.create_eks_cluster:
+    if deploy_cluster:
+        efs_file_system_id = efs[0].efs_file_system_id if cfg.create_efs_filesystem else None
+        fsx_outputs = {
+            'file_system_id': fsx.file_system_id,
+            'dns_name': fsx.dns_name,
+            'storage_capacity': fsx.storage_capacity,
+            'root_volume_id': fsx.root_volume_id,
+            'mount_name': fsx.mount_name,
+        } if cfg.create_fsx_cache else {}
+    else:
+        # A platform stack has a single cluster (see validate_stack_config)
+        cluster_stack = pulumi.StackReference(cfg.cluster_stack)
+
+        efs_file_system_id = cluster_stack.get_output("efs_file_system_id")
+        fsx_outputs = {
+            'file_system_id': cluster_stack.get_output("fsx_file_system_id"),
+            'dns_name': cluster_stack.get_output("fsx_dns_name"),
+            'storage_capacity': cluster_stack.get_output("fsx_storage_capacity"),
+            'root_volume_id': cluster_stack.get_output("fsx_root_volume_id"),
+            'mount_name': cluster_stack.get_output("fsx_mount_name"),
         }
-    ))
-
-    pulumi.export("efs_mount_target", [__item.efs_mount_target for __item in efs])
-    pulumi.export("efs_system_id", [__item.efs_file_system_id for __item in efs])
-
-    if create_eks_cluster:
-        efs_addon = EfsAddon(k8s_provider, eks_nodes_ec2, f"{resource_prefix}-efs-addon", {
-            'cluster_name': eks.cluster_name, 
-            'oidc_provider_arn': eks.oidc_provider_arn, 
-            'oidc_provider_url': eks.oidc_provider_url,
-            'storage_class_name': storage_class_name,
-            'storage_mount_options': storage_mount_options,
-            'efs_filesystem_id': efs[0].efs_file_system_id
-        })
-
-## ALB Controller
-###################################################################################################
-if create_alb_controller:
-    alb = LoadBalancer(k8s_provider, eks, f"{resource_prefix}-alb-controller", {
-        'cluster_name': eks.cluster_name,
-        'resource_prefix': resource_prefix,
-        'oidc_provider_arn': eks.oidc_provider_arn,
-        'oidc_provider_url': eks.oidc_provider_url,
-        'lb_service_account_namespace': 'kube-system',
-        'lb_service_account_name': 'aws-load-balancer-controller'
-    })
-
-    pulumi.export("alb_controller_sa_name", alb.service_account_name)
-    pulumi.export("alb_controller_role_arn", alb.lb_controller_role_arn)
 
+    for cluster in cfg.clusters:
+        if deploy_cluster:
+            eks = eks_clusters[cluster.name]
+            cluster_name = eks.cluster_name
+            oidc_provider_arn = eks.oidc_provider_arn
+            oidc_provider_url = eks.oidc_provider_url
+            # Addons wait for the node groups (not their ASG tags and schedules); the ALB controller only
+            # needs the API server, which the k8s provider already implies
+            node_dependencies = eks_node_groups[cluster.name].node_groups
+            cluster_dependencies = []
+
+            cluster_providers = providers.for_cluster(k8s.Provider(f"{cluster.cluster_name}-k8s-provider",
+                kubeconfig=eks_kubeconfig(eks.eks_endpoint, eks.certificate_authority, eks.cluster_name),
+                opts=pulumi.ResourceOptions(parent=eks)
+            ))
+        else:
+            cluster_name = cluster_stack.require_output("eks_cluster_name")
+            # A Pod Identity cluster has no OIDC provider
+            oidc_provider_arn = cluster_stack.get_output("oidc_provider_arn")
+            oidc_provider_url = cluster_stack.get_output("oidc_provider_url")
+
+            cluster_providers = providers.for_cluster(k8s.Provider(f"{cluster.cluster_name}-k8s-provider",
+                kubeconfig=eks_kubeconfig(
+                    cluster_stack.require_output("eks_cluster_endpoint"),
+                    cluster_stack.require_output("eks_certificate_authority"),
+                    cluster_name,
+                ),
+            ))
+            # The cluster and its nodes already exist
+            node_dependencies = []
+            cluster_dependencies = []
+
+        ## Addon versions
+        ###########################################################################################
+        # Resolved now, so an addon that doesn't support the cluster's Kubernetes version fails the
+        # preview instead of failing the apply after the cluster has been created.
+        addon_resolver = AddonVersionResolver(providers, cluster.kubernetes_version, aws.config.region,
+            pinned=cfg.addon_versions,
+            cache_path=cfg.addon_version_cache,
+        )
+        pod_identity_agent_version = addon_resolver.resolve(POD_IDENTITY_AGENT_ADDON) if cfg.service_account_role_mode == "pod-identity" else None
+        coredns_addon_version = addon_resolver.resolve("coredns") if cfg.create_coredns_addon else None
+        kube_proxy_addon_version = addon_resolver.resolve("kube-proxy") if cfg.create_kube_proxy_addon else None
+        cloudwatch_addon_version = addon_resolver.resolve(CLOUDWATCH_OBSERVABILITY_ADDON) if cfg.create_cloudwatch_observability else None
+        efs_csi_addon_version = addon_resolver.resolve("aws-efs-csi-driver") if cfg.create_efs_filesystem else None
+        ebs_csi_addon_version = addon_resolver.resolve("aws-ebs-csi-driver") if cfg.create_ebs_csi else None
+        fsx_csi_addon_version = addon_resolver.resolve("aws-fsx-csi-driver") if cfg.create_fsx_cache and cfg.fsx_file_system_type == "lustre" else None
+
+        ## API priority and fairness
+        ###########################################################################################
+        # Only needs the API server. The CI controllers and their agents get separate priority levels,
+        # so a burst of build pods can't starve the controllers' requests.
+        if cfg.create_api_priority_and_fairness:
+            api_priority = ApiPriority(cluster_providers, cluster_dependencies, f"{cluster.cluster_name}-api-priority", {
+                'ci_namespace': cfg.ci_namespace,
+                'settings': cfg.api_priority_settings,
+            })
+
+            cluster_export(cluster, "api_priority_settings", api_priority.settings)
+
+        ## EKS Pod Identity
+        ###########################################################################################
+        # The agent runs on every node and hands out the credentials of the associated roles, so the
+        # controllers below wait for it rather than start without credentials.
+        if cfg.service_account_role_mode == "pod-identity":
+            pod_identity_agent = aws.eks.Addon(f"{cluster.cluster_name}-pod-identity-agent",
+                cluster_name=cluster_name,
+                addon_name=POD_IDENTITY_AGENT_ADDON,
+                addon_version=pod_identity_agent_version,
+                resolve_conflicts_on_create="OVERWRITE",
+                resolve_conflicts_on_update="PRESERVE",
+                opts=pulumi.ResourceOptions(provider=providers.aws, depends_on=node_dependencies)
+            )
+            node_dependencies = [*node_dependencies, pod_identity_agent]
+            cluster_dependencies = [*cluster_dependencies, pod_identity_agent]
+
+        ## kube-proxy
+        ###########################################################################################
+        if cfg.create_kube_proxy_addon:
+            kube_proxy = KubeProxyAddon(cluster_providers, node_dependencies, f"{cluster.cluster_name}-kube-proxy", {
+                'cluster_name': cluster_name,
+                'addon_version': kube_proxy_addon_version,
+                'settings': cfg.kube_proxy_settings,
+            })
+
+            cluster_export(cluster, "kube_proxy_mode", kube_proxy.mode)
+            cluster_export(cluster, "kube_proxy_ipvs_scheduler", kube_proxy.ipvs_scheduler)
+
+        ## Cluster DNS
+        ###########################################################################################
+        # With NodeLocal DNSCache, kubelet points pods at the cache on their node, so the workloads
+        # below only start once it runs.
+        if cfg.create_coredns_addon or cfg.create_node_local_dns:
+            cluster_dns = ClusterDns(cluster_providers, node_dependencies, f"{cluster.cluster_name}-dns", {
+                'cluster_name': cluster_name,
+                'manage_coredns': cfg.create_coredns_addon,
+                'coredns_addon_version': coredns_addon_version,
+                'settings': cfg.coredns_settings,
+                'node_local_dns': cfg.create_node_local_dns,
+            })
+            if cluster_dns.node_local_dns:
+                node_dependencies = [*node_dependencies, cluster_dns.node_local_dns]
+                cluster_dependencies = [*cluster_dependencies, cluster_dns.node_local_dns]
+
+            cluster_export(cluster, "coredns_settings", cluster_dns.settings)
+            cluster_export(cluster, "node_local_dns_ip", NODE_LOCAL_DNS_IP if cfg.create_node_local_dns else None)
+
+        ## EFS CSI
+        ###########################################################################################
+        if cfg.create_efs_filesystem:
+            efs_addon = EfsAddon(cluster_providers, node_dependencies, f"{cluster.cluster_name}-efs-addon", {
+                'cluster_name': cluster_name, 
+                'service_account_role_mode': cfg.service_account_role_mode,
+                'oidc_provider_arn': oidc_provider_arn, 
+                'oidc_provider_url': oidc_provider_url,
+                'storage_classes': list(cfg.efs_storage_classes),
+                'efs_filesystem_id': efs_file_system_id,
+                'addon_version': efs_csi_addon_version,
+            })
+
+            cluster_export(cluster, "efs_storage_class_names", efs_addon.storage_class_names)
+
+        ## FSx CSI
+        ###########################################################################################
+        if cfg.create_fsx_cache:
+            fsx_addon = FsxAddon(cluster_providers, node_dependencies, f"{cluster.cluster_name}-fsx-addon", {
+                'cluster_name': cluster_name,
+                'service_account_role_mode': cfg.service_account_role_mode,
+                'oidc_provider_arn': oidc_provider_arn,
+                'oidc_provider_url': oidc_provider_url,
+                'storage_class_name': cfg.fsx_storage_class_name,
+                'file_system_type': cfg.fsx_file_system_type,
+                **fsx_outputs,
+                'vpc_cidr': vpc_cidr_block,
+                'addon_version': fsx_csi_addon_version,
+                # CloudBees CI runs the agents in '<ci_namespace>-builds'
+                'claim_namespace': f"{cfg.ci_namespace}-builds",
+            })
+
+            cluster_export(cluster, "fsx_storage_class_name", fsx_addon.storage_class_name)
+            cluster_export(cluster, "fsx_claim_name", fsx_addon.claim_name)
+            cluster_export(cluster, "fsx_claim_namespace", fsx_addon.claim_namespace)
+
+        ## EBS CSI
+        ###########################################################################################
+        if cfg.create_ebs_csi:
+            ebs_addon = EbsAddon(cluster_providers, node_dependencies, f"{cluster.cluster_name}-ebs-addon", {
+                'cluster_name': cluster_name,
+                'service_account_role_mode': cfg.service_account_role_mode,
+                'oidc_provider_arn': oidc_provider_arn,
+                'oidc_provider_url': oidc_provider_url,
+                'storage_classes': list(cfg.ebs_storage_classes),
+                'addon_version': ebs_csi_addon_version,
+            })
+
+            cluster_export(cluster, "ebs_storage_class_names", ebs_addon.storage_class_names)
+            cluster_export(cluster, "ebs_csi_role_arn", ebs_addon.ebs_csi_role_arn)
+
+        ## ALB Controller
+        ###########################################################################################
+        if cfg.create_alb_controller:
+            alb = LoadBalancer(cluster_providers, cluster_dependencies, f"{cluster.cluster_name}-alb-controller", {
+                'cluster_name': cluster_name,
+                'service_account_role_mode': cfg.service_account_role_mode,
+                'resource_prefix': cluster.cluster_name,
+                'oidc_provider_arn': oidc_provider_arn,
+                'oidc_provider_url': oidc_provider_url,
+                'lb_service_account_namespace': 'kube-system',
+                'lb_service_account_name': 'aws-load-balancer-controller',
+                'chart_version': cfg.alb_chart_version,
+                'chart_digest': cfg.alb_chart_digest,
+                'chart_cache_dir': cfg.chart_cache_dir,
+                'controller_profile': cfg.alb_controller_profile,
+                'webhook_tls': cfg.alb_webhook_tls,
+            })
+
+            cluster_export(cluster, "alb_controller_sa_name", alb.service_account_name)
+            cluster_export(cluster, "alb_controller_role_arn", alb.lb_controller_role_arn)
+            cluster_export(cluster, "alb_chart_version", cfg.alb_chart_version)
+            cluster_export(cluster, "alb_webhook_tls", alb.webhook_tls)
+
+        ## ExternalDNS
+        ###########################################################################################
+        # Every cluster manages records in the shared zone, each as its own TXT owner (its cluster name)
+        if cfg.create_external_dns:
+            external_dns = ExternalDns(cluster_providers, node_dependencies, f"{cluster.cluster_name}-external-dns", {
+                'cluster_name': cluster.cluster_name,
+                'service_account_role_mode': cfg.service_account_role_mode,
+                'oidc_provider_arn': oidc_provider_arn,
+                'oidc_provider_url': oidc_provider_url,
+                'hosted_zone_id': hosted_zone_id,
+                'zone_name': cfg.zone_name,
+                'region': aws.config.region,
+                'chart_version': cfg.external_dns_chart_version,
+                'chart_digest': cfg.external_dns_chart_digest,
+                'chart_cache_dir': cfg.chart_cache_dir,
+                'settings': cfg.external_dns_settings,
+            })
+
+            cluster_export(cluster, "external_dns_role_arn", external_dns.external_dns_role_arn)
+
+        ## Observability
+        ###########################################################################################
+        if cfg.create_metrics_server or cfg.create_cloudwatch_observability or cfg.create_observability_dashboard:
+            observability = Observability(cluster_providers, node_dependencies, f"{cluster.cluster_name}-observability", {
+                'cluster_name': cluster_name,
+                'region': aws.config.region,
+                'metrics_server': cfg.create_metrics_server,
+                'chart_version': cfg.metrics_server_chart_version,
+                'chart_digest': cfg.metrics_server_chart_digest,
+                'chart_cache_dir': cfg.chart_cache_dir,
+                'cloudwatch_observability': cfg.create_cloudwatch_observability,
+                'cloudwatch_addon_version': cloudwatch_addon_version,
+                'container_logs': cfg.cloudwatch_container_logs,
+                'service_account_role_mode': cfg.service_account_role_mode,
+                'oidc_provider_arn': oidc_provider_arn,
+                'oidc_provider_url': oidc_provider_url,
+                'dashboard': cfg.create_observability_dashboard,
+            })
+
+            cluster_export(cluster, "cloudwatch_agent_role_arn", observability.cloudwatch_agent_role_arn)
+            cluster_export(cluster, "observability_dashboard_name", observability.dashboard_name)
+
+        ## Ingress DNS alias
+        ###########################################################################################
+        # The zone's wildcard record points at the CI ingress, which runs on the first cluster
+        if cfg.create_ingress_dns_alias and cluster is primary_cluster:
+            ingress_dns = IngressDnsAlias(cluster_providers, f"{cluster.cluster_name}-ingress-dns", {
+                'zone_id': hosted_zone_id,
+                'zone_name': cfg.zone_name,
+                'ingress_namespace': cfg.ci_namespace,
+                'ingress_name': cfg.ci_ingress_name,
+            }, opts=pulumi.ResourceOptions(depends_on=[alb.chart] if cfg.create_alb_controller else []))
+
+            pulumi.export("alb_dns_name", ingress_dns.alb_dns_name)
+            pulumi.export("ingress_dns_record", ingress_dns.record_fqdn)
+
+if cfg.create_eks_cluster and (deploy_cluster or deploy_platform):
+    pulumi.export("clusters", cluster_outputs)
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Helper steps around the Pulumi stack (helm values, CI install, ECR access, DNS alias).
+Reads the stack's config and outputs once through the Automation API instead of one CLI call per value.
+
+    ./helper.py values | install | ecr create|delete | dns create|delete | up [--timeline file]
+"""
+import asyncio
+import sys
+
+from modules.automation import main
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import time
+import pulumi
+import pulumi_aws as aws
+import pulumi_command as command
+from typing import Dict, List, Optional
+from modules.providers import Providers
+
+DEFAULT_CACHE_PATH = ".addon-versions.json"
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+def version_key(version: str) -> tuple:
+    """'v2.3.0-eksbuild.1' -> (2, 3, 0, 1), so versions compare numerically."""
+    return tuple(int(n) for n in re.findall(r"\d+", version))
+
+class AddonVersionResolver:
+    """
+    Resolves EKS managed addon versions against the cluster's Kubernetes version.
+
+    Lookups run as synchronous invokes while the program is evaluated, so an incompatible
+    version fails `pulumi preview` before the cluster (or anything else long-running) is created.
+    Results are memoized per (region, addon, kubernetes version) in a local JSON file.
+    """
+
+    def __init__(self, providers: Providers, kubernetes_version: str, region: str,
+                 pinned: Optional[Dict[str, str]] = None,
+                 cache_path: str = DEFAULT_CACHE_PATH, cache_ttl: int = DEFAULT_CACHE_TTL):
+        self.providers = providers
+        self.kubernetes_version = str(kubernetes_version)
+        self.region = region
+        self.pinned = pinned or {}
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+        self._cache = self._load_cache()
+
+    def _load_cache(self) -> dict:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pulumi.log.warn(f"Ignoring unreadable addon version cache {self.cache_path}")
+            return {}
+
+    def _save_cache(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "w") as f:
+                json.dump(self._cache, f, indent=2, sort_keys=True)
+        except OSError as e:
+            pulumi.log.warn(f"Could not write addon version cache {self.cache_path}: {e}")
+
+    def _cached(self, key: str) -> Optional[dict]:
+        cached = self._cache.get(key)
+        if cached and time.time() - cached["resolved_at"] < self.cache_ttl:
+            return cached
+        return None
+
+    def latest(self, addon_name: str) -> str:
+        """Newest addon version compatible with the cluster's Kubernetes version."""
+        key = f"{self.region}/{addon_name}/{self.kubernetes_version}"
+        cached = self._cached(key)
+        if cached:
+            return cached["version"]
+
+        result = aws.eks.get_addon_version(
+            addon_name=addon_name,
+            kubernetes_version=self.kubernetes_version,
+            most_recent=True,
+            opts=pulumi.InvokeOptions(provider=self.providers.aws),
+        )
+        if not result.version:
+            raise ValueError(f"No version of addon '{addon_name}' supports Kubernetes {self.kubernetes_version}")
+
+        self._cache[key] = {"version": result.version, "resolved_at": int(time.time())}
+        self._save_cache()
+        return result.version
+
+    def compatible(self, addon_name: str) -> List[str]:
+        """
+        Every addon version compatible with the cluster's Kubernetes version, newest first. The AWS
+        provider has no invoke listing them, so this asks the CLI.
+        """
+        key = f"{self.region}/{addon_name}/{self.kubernetes_version}/compatible"
+        cached = self._cached(key)
+        if cached:
+            return cached["versions"]
+
+        result = command.local.run(
+            command=(f"aws eks describe-addon-versions --addon-name {addon_name} --kubernetes-version {self.kubernetes_version}"
+                     f" --region {self.region} --query 'addons[].addonVersions[].addonVersion' --output json"),
+            opts=pulumi.InvokeOptions(provider=self.providers.command),
+        )
+        versions = sorted(json.loads(result.stdout or "[]"), key=version_key, reverse=True)
+        if not versions:
+            raise ValueError(f"No version of addon '{addon_name}' supports Kubernetes {self.kubernetes_version}")
+
+        self._cache[key] = {"versions": versions, "resolved_at": int(time.time())}
+        self._save_cache()
+        return versions
+
+    def resolve(self, addon_name: str) -> str:
+        """The pinned version for the addon if one is configured, otherwise the newest compatible one."""
+        latest = self.latest(addon_name)
+        pinned = self.pinned.get(addon_name)
+        if not pinned:
+            return latest
+
+        compatible = self.compatible(addon_name)
+        if pinned not in compatible:
+            raise ValueError(
+                f"Addon '{addon_name}' is pinned to {pinned}, which doesn't support Kubernetes "
+                f"{self.kubernetes_version}. Compatible versions: {', '.join(compatible)}"
+            )
+        if pinned != latest:
+            pulumi.log.info(f"Addon '{addon_name}' is pinned to {pinned} (newest compatible: {latest})")
+        return pinned
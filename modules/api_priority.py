@@ -0,0 +1,146 @@
+import pulumi
+from typing import Any, Dict, List, Optional, Sequence, TypedDict
+import pulumi_kubernetes as k8s
+from modules.providers import Providers
+
+# API Priority and Fairness: each FlowSchema sends the requests of its subjects to a priority level, and
+# each level gets its own share of the API server's concurrency. With the defaults every service account
+# ends up in the shared 'workload-low' level, so a burst from build pods queues the controllers' watches
+# and pod creations behind it.
+CI_CONTROLLERS_PRIORITY_LEVEL = "ci-controllers"
+CI_AGENTS_PRIORITY_LEVEL = "ci-agents"
+# Ahead of the built-in 'service-accounts' (9000) and 'global-default' schemas, behind the system ones
+CI_CONTROLLERS_MATCHING_PRECEDENCE = 1000
+CI_AGENTS_MATCHING_PRECEDENCE = 1100
+
+class ApiPrioritySettings(TypedDict, total=False):
+    # Service accounts in the CI namespace the controllers (and operations center) run as
+    controller_service_accounts: List[str]
+    # Namespace the agent pods run in; defaults to CloudBees CI's '<ci_namespace>-builds'
+    agent_namespace: Optional[str]
+    # Concurrency shares; the built-in workload-low level has 100 and global-default 20
+    controller_shares: int
+    agent_shares: int
+    # Percent of the agents' seats other levels may borrow while agents are idle
+    agent_lendable_percent: int
+    # Requests an agent level queue holds before the API server answers 429
+    agent_queue_length_limit: int
+
+DEFAULT_API_PRIORITY_SETTINGS: ApiPrioritySettings = {
+    "controller_service_accounts": ["jenkins", "cjoc"],
+    "agent_namespace": None,
+    "controller_shares": 100,
+    "agent_shares": 20,
+    "agent_lendable_percent": 50,
+    "agent_queue_length_limit": 50,
+}
+
+def validate_api_priority_settings(settings: ApiPrioritySettings) -> None:
+    unknown = [key for key in settings if key not in DEFAULT_API_PRIORITY_SETTINGS]
+    if unknown:
+        raise ValueError(f"Unknown API priority settings: {unknown}")
+    settings = {**DEFAULT_API_PRIORITY_SETTINGS, **settings}
+    accounts = settings["controller_service_accounts"]
+    if not isinstance(accounts, list) or not accounts or not all(isinstance(a, str) and a for a in accounts):
+        raise ValueError("API priority 'controller_service_accounts' must be a non-empty list of service account names")
+    for key, (low, high) in {"controller_shares": (1, 1000), "agent_shares": (1, 1000), "agent_lendable_percent": (0, 100),
+                             "agent_queue_length_limit": (1, 1000)}.items():
+        if not isinstance(settings[key], int) or isinstance(settings[key], bool) or not low <= settings[key] <= high:
+            raise ValueError(f"API priority '{key}' must be an integer between {low} and {high}, got {settings[key]!r}")
+
+def effective_api_priority_settings(settings: ApiPrioritySettings, ci_namespace: str) -> Dict[str, Any]:
+    """The settings with the defaults applied and the agent namespace filled in."""
+    settings = {**DEFAULT_API_PRIORITY_SETTINGS, **settings}
+    return {**settings, "agent_namespace": settings["agent_namespace"] or f"{ci_namespace}-builds"}
+
+def _all_requests(subjects: list) -> dict:
+    return {
+        "subjects": subjects,
+        "resource_rules": [{
+            "verbs": ["*"],
+            "api_groups": ["*"],
+            "resources": ["*"],
+            "cluster_scope": True,
+            "namespaces": ["*"],
+        }],
+        "non_resource_rules": [{"verbs": ["*"], "non_resource_urls": ["*"]}],
+    }
+
+class ApiPriorityArgs(TypedDict, total=False):
+    ci_namespace: str
+    settings: ApiPrioritySettings
+
+class ApiPriority(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, cluster_dependencies: Sequence[pulumi.Resource], name: str, args: ApiPriorityArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:ApiPriority", name, args, opts)
+
+        validate_api_priority_settings(args.get("settings") or {})
+        settings = effective_api_priority_settings(args.get("settings") or {}, args["ci_namespace"])
+
+        # Controllers keep their seats: nothing is lent, so a busy level can't leave them waiting
+        controllers_level = k8s.flowcontrol.v1.PriorityLevelConfiguration(f"{name}-controllers-level",
+            metadata={"name": CI_CONTROLLERS_PRIORITY_LEVEL},
+            spec={
+                "type": "Limited",
+                "limited": {
+                    "nominal_concurrency_shares": settings["controller_shares"],
+                    "lendable_percent": 0,
+                    "limit_response": {
+                        "type": "Queue",
+                        "queuing": {"queues": 64, "hand_size": 6, "queue_length_limit": 50},
+                    },
+                },
+            },
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=cluster_dependencies)
+        )
+
+        # Other levels may borrow the agents' idle seats; past the queue limit, agents get 429s
+        agents_level = k8s.flowcontrol.v1.PriorityLevelConfiguration(f"{name}-agents-level",
+            metadata={"name": CI_AGENTS_PRIORITY_LEVEL},
+            spec={
+                "type": "Limited",
+                "limited": {
+                    "nominal_concurrency_shares": settings["agent_shares"],
+                    "lendable_percent": settings["agent_lendable_percent"],
+                    "limit_response": {
+                        "type": "Queue",
+                        "queuing": {"queues": 128, "hand_size": 6, "queue_length_limit": settings["agent_queue_length_limit"]},
+                    },
+                },
+            },
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=cluster_dependencies)
+        )
+
+        k8s.flowcontrol.v1.FlowSchema(f"{name}-controllers",
+            metadata={"name": CI_CONTROLLERS_PRIORITY_LEVEL},
+            spec={
+                "priority_level_configuration": {"name": CI_CONTROLLERS_PRIORITY_LEVEL},
+                "matching_precedence": CI_CONTROLLERS_MATCHING_PRECEDENCE,
+                # Fair queuing per service account, so the operations center and the controllers don't hold each other up
+                "distinguisher_method": {"type": "ByUser"},
+                "rules": [_all_requests([
+                    {"kind": "ServiceAccount", "service_account": {"name": account, "namespace": args["ci_namespace"]}}
+                    for account in settings["controller_service_accounts"]
+                ])],
+            },
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[controllers_level])
+        )
+
+        k8s.flowcontrol.v1.FlowSchema(f"{name}-agents",
+            metadata={"name": CI_AGENTS_PRIORITY_LEVEL},
+            spec={
+                "priority_level_configuration": {"name": CI_AGENTS_PRIORITY_LEVEL},
+                "matching_precedence": CI_AGENTS_MATCHING_PRECEDENCE,
+                "distinguisher_method": {"type": "ByUser"},
+                "rules": [_all_requests([
+                    {"kind": "ServiceAccount", "service_account": {"name": "*", "namespace": settings["agent_namespace"]}},
+                ])],
+            },
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[agents_level])
+        )
+
+        self.settings = settings
+
+        self.register_outputs({
+            "settings": settings,
+        })
@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import json
+import os
+from contextlib import aclosing
+from dataclasses import dataclass
+from string import Template
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from pulumi import automation as auto
+
+from modules.timing import DeploymentTimer, format_summary
+
+PROJECT_NAME = "pulumi-eks"
+VALUES_TEMPLATE = "support/ci-example-values.yaml"
+ECR_POLICY_FILE = "support/ecr-pull-policy.json"
+ECR_SERVICE_ACCOUNT = "ci-pull-images"
+CI_RELEASE_NAME = "cloudbees-ci"
+CI_CHART = "cloudbees/cloudbees-core"
+HELM_TIMEOUT = "10000s"
+TIMELINE_FILE = "deploy-timeline.json"
+# How long install-helper waits for the aws-load-balancer-controller to publish the ALB
+INGRESS_WAIT_TIMEOUT = 600
+
+class HelperError(Exception):
+    pass
+
+@dataclass(frozen=True)
+class StackContext:
+    """Config and outputs of a stack, read once (two CLI calls, run concurrently) and shared by every step."""
+    stack: Any
+    config: Dict[str, Any]
+    outputs: Dict[str, Any]
+
+    def config_value(self, key: str, default: Any = None) -> Any:
+        return self.config.get(f"{PROJECT_NAME}:{key}", default)
+
+    def output(self, key: str, default: Any = None) -> Any:
+        return self.outputs.get(key, default)
+
+async def load_stack(stack_name: Optional[str] = None, work_dir: str = ".") -> StackContext:
+    if stack_name is None:
+        workspace = auto.LocalWorkspace(work_dir=work_dir)
+        current = workspace.stack()
+        if current is None:
+            raise HelperError("No stack selected. Run 'pulumi stack select' or pass --stack.")
+        stack_name = current.name
+    stack = auto.select_stack(stack_name=stack_name, work_dir=work_dir)
+    return await read_stack(stack)
+
+async def read_stack(stack: Any) -> StackContext:
+    config, outputs = await asyncio.gather(
+        asyncio.to_thread(stack.get_all_config),
+        asyncio.to_thread(stack.outputs),
+    )
+    return StackContext(
+        stack=stack,
+        config={key: value.value for key, value in config.items()},
+        outputs={key: value.value for key, value in outputs.items()},
+    )
+
+async def run(*cmd: str, check: bool = True, capture: bool = False) -> str:
+    """Runs a command (aws, kubectl, helm, eksctl) without blocking the other steps."""
+    proc = await asyncio.create_subprocess_exec(*cmd,
+        stdout=asyncio.subprocess.PIPE if capture else None,
+        stderr=asyncio.subprocess.PIPE if capture else None,
+    )
+    stdout, stderr = await proc.communicate()
+    if check and proc.returncode != 0:
+        detail = stderr.decode().strip() if stderr else ""
+        raise HelperError(f"'{' '.join(cmd)}' failed ({proc.returncode}) {detail}".strip())
+    return stdout.decode() if stdout else ""
+
+async def stream(*cmd: str) -> AsyncIterator[str]:
+    """Runs a long-lived command (kubectl --watch) and yields its output lines. The command is stopped once the caller is done."""
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE)
+    try:
+        async for line in proc.stdout:
+            yield line.decode().rstrip("\n")
+        if await proc.wait() != 0:
+            raise HelperError(f"'{' '.join(cmd)}' failed ({proc.returncode})")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+def cluster_name(ctx: StackContext) -> str:
+    """The primary cluster's name, which is also the alias of its kubeconfig context."""
+    name = ctx.output("eks_cluster_name")
+    if not name:
+        raise HelperError("Cannot find the eks_cluster_name output. Run 'pulumi up' on an 'all' or 'cluster' stack first.")
+    return name
+
+## Helm values
+###################################################################################################
+def as_cidr(address: Optional[str]) -> Optional[str]:
+    if not address:
+        return None
+    return address if "/" in address else f"{address}/32"
+
+def alb_inbound_cidrs(ctx: StackContext) -> str:
+    """Who may reach the CI ALB: myip, the NAT gateway and additional_alb_access_cidrs."""
+    additional = ctx.config_value("additional_alb_access_cidrs")
+    cidrs: List[Optional[str]] = [
+        as_cidr(ctx.config_value("myip")),
+        as_cidr(ctx.output("nat_public_ip")),
+        *(json.loads(additional) if additional else []),
+    ]
+    return ",".join(cidr for cidr in cidrs if cidr)
+
+def helm_values_env(ctx: StackContext) -> Dict[str, str]:
+    return {
+        "storage_class_name": ctx.output("storage_class_name") or "",
+        "hosted_zone_name": ctx.output("zone_name") or "",
+        "certificate_arn": ctx.output("certificate_arn") or "",
+        "inbound_cidrs": alb_inbound_cidrs(ctx),
+        # The stack already created the agents' namespace for the FSx for Lustre claim
+        "create_agent_namespace": "false" if ctx.output("fsx_claim_namespace") else "true",
+    }
+
+def render_values(template: str, env: Dict[str, str]) -> str:
+    """envsubst in-process: $var and ${var} are replaced, unknown variables become empty."""
+    class _Env(dict):
+        def __missing__(self, key):
+            return ""
+    return Template(template).substitute(_Env(env))
+
+def write_values(ctx: StackContext, path: str, template_path: str = VALUES_TEMPLATE, overwrite: bool = False) -> str:
+    if not os.path.isfile(template_path):
+        raise HelperError(f"{template_path} not found. Run this from the root of the repository.")
+    if os.path.exists(path) and not overwrite:
+        raise HelperError(f"{path} already exists. Move it or pass --overwrite to generate a new one.")
+    with open(template_path) as f:
+        rendered = render_values(f.read(), helm_values_env(ctx))
+    with open(path, "w") as f:
+        f.write(rendered)
+    return path
+
+## CI install
+###################################################################################################
+async def helm_install(ctx: StackContext, values_path: str) -> None:
+    namespace = ctx.config_value("ci_namespace") or "core"
+    version = ctx.config_value("ci_version")
+    if not version:
+        raise HelperError("Cannot find ci_version in pulumi config. Please run 'pulumi config set ci_version the.chart.version' and try again.")
+    context = cluster_name(ctx)
+    if await run("kubectl", "--context", context, "get", "ns", namespace, check=False, capture=True) == "":
+        await run("kubectl", "--context", context, "create", "ns", namespace)
+    await run("helm", "upgrade", "-i", CI_RELEASE_NAME, CI_CHART, "--kube-context", context,
+        "-n", namespace, "-f", values_path, "--version", version, "--timeout", HELM_TIMEOUT)
+
+async def helm_uninstall(ctx: StackContext) -> None:
+    namespace = ctx.config_value("ci_namespace") or "core"
+    context = cluster_name(ctx)
+    await run("helm", "uninstall", CI_RELEASE_NAME, "--kube-context", context, "-n", namespace, check=False)
+    await run("kubectl", "--context", context, "delete", "ns", namespace, check=False)
+
+## ECR pull access for build agents
+###################################################################################################
+def ecr_policy_name(ctx: StackContext) -> str:
+    return f"{ctx.config_value('resource_prefix')}-{ctx.config_value('ci_namespace') or 'core'}-ECRPullAccess"
+
+async def account_id() -> str:
+    return (await run("aws", "sts", "get-caller-identity", "--query", "Account", "--output", "text", capture=True)).strip()
+
+async def ecr_access(ctx: StackContext, action: str, aws_account_id: str) -> None:
+    policy_name = ecr_policy_name(ctx)
+    policy_arn = f"arn:aws:iam::{aws_account_id}:policy/{policy_name}"
+    namespace = f"{ctx.config_value('ci_namespace') or 'core'}-builds"
+    cluster = cluster_name(ctx)
+    policy_exists = (await run("aws", "iam", "get-policy", "--policy-arn", policy_arn, check=False, capture=True)) != ""
+
+    if action == "create":
+        if policy_exists:
+            print(f"Warning: IAM Policy {policy_arn} already exists")
+            return
+        await run("aws", "iam", "create-policy", "--policy-name", policy_name, "--policy-document", f"file://{ECR_POLICY_FILE}")
+        await run("eksctl", "create", "iamserviceaccount", "--name", ECR_SERVICE_ACCOUNT, "--namespace", namespace,
+            "--cluster", cluster, "--attach-policy-arn", policy_arn, "--approve", "--override-existing-serviceaccounts")
+    else:
+        if not policy_exists:
+            print(f"Warning: IAM Policy {policy_arn} does NOT exist")
+            return
+        await run("eksctl", "delete", "iamserviceaccount", "--name", ECR_SERVICE_ACCOUNT, "--namespace", namespace,
+            "--cluster", cluster, "--wait")
+        await run("aws", "iam", "delete-policy", "--policy-arn", policy_arn)
+
+## Ingress DNS alias
+###################################################################################################
+async def wait_for_ingress_hostname(ctx: StackContext, timeout: float = INGRESS_WAIT_TIMEOUT) -> str:
+    """Watches the CI ingress until the aws-load-balancer-controller publishes the ALB hostname."""
+    namespace = ctx.config_value("ci_namespace") or "core"
+    name = ctx.config_value("ci_ingress_name") or "cjoc"
+    # A field selector lets the watch start before helm has created the ingress
+    cmd = ("kubectl", "--context", cluster_name(ctx), "get", "ingress", "-n", namespace,
+        "--field-selector", f"metadata.name={name}", "--watch",
+        "-o", 'jsonpath={.status.loadBalancer.ingress[0].hostname}{"\\n"}')
+
+    async def first_hostname() -> str:
+        async with aclosing(stream(*cmd)) as lines:
+            async for line in lines:
+                if line.strip():
+                    return line.strip()
+        raise HelperError(f"The watch on ingress {namespace}/{name} ended before the ALB hostname was published")
+
+    try:
+        return await asyncio.wait_for(first_hostname(), timeout)
+    except TimeoutError:
+        raise HelperError(f"Ingress {namespace}/{name} has no ALB hostname after {timeout}s. "
+                          "Check the aws-load-balancer-controller logs and rerun.") from None
+
+async def set_ingress_dns_alias(ctx: StackContext, enabled: bool) -> Dict[str, Any]:
+    """Toggles create_ingress_dns_alias and runs the update. Returns the new outputs."""
+    stack = ctx.stack
+    await asyncio.to_thread(stack.set_config, "create_ingress_dns_alias", auto.ConfigValue(value=str(enabled).lower()))
+    result = await asyncio.to_thread(stack.up, on_output=print)
+    return {key: value.value for key, value in result.outputs.items()}
+
+async def install_helper(ctx: StackContext, action: str) -> None:
+    """install-helper.sh: the DNS alias on create; ECR access, DNS alias and the CI release on delete."""
+    if action == "create":
+        # The stack reads the ALB hostname off the ingress, so only update it once the hostname is there
+        print("Waiting for the load balancer controller to publish the ALB hostname...")
+        print(f"ALB published at {await wait_for_ingress_hostname(ctx)}")
+        outputs = await set_ingress_dns_alias(ctx, True)
+        print(f"Finished DNS update ({outputs.get('ingress_dns_record')}). Please allow a few minutes for "
+              f"propagation before accessing {outputs.get('zone_name')}")
+        return
+
+    # Removing ECR access and the alias record don't depend on each other
+    await asyncio.gather(
+        ecr_access(ctx, "delete", await account_id()),
+        set_ingress_dns_alias(ctx, False),
+    )
+    await helm_uninstall(ctx)
+
+## Timed update
+###################################################################################################
+async def timed_up(ctx: StackContext, timeline_path: str = TIMELINE_FILE) -> Dict[str, Any]:
+    """`pulumi up` with per-resource timings and the critical path written to timeline_path, even when the update fails."""
+    timer = DeploymentTimer()
+    try:
+        await asyncio.to_thread(ctx.stack.up, on_output=print, on_event=timer.on_event)
+    finally:
+        deployment = await asyncio.to_thread(ctx.stack.export_stack)
+        timer.add_state(deployment.deployment.get("resources", []))
+        report = timer.write(timeline_path)
+        print(format_summary(report))
+        print(f"Timeline written to {timeline_path}")
+    return report
+
+## CLI
+###################################################################################################
+async def main(argv: Sequence[str]) -> int:
+    parser = argparse.ArgumentParser(prog="helper.py", description="CloudBees CI helper steps driven through the Pulumi Automation API")
+    parser.add_argument("--stack", help="stack name (defaults to the selected stack)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    values = commands.add_parser("values", help="render support/<user>-values.yaml (create-helm-values.sh)")
+    values.add_argument("--output", default=f"support/{os.environ.get('USER', 'user')}-values.yaml")
+    values.add_argument("--overwrite", action="store_true")
+
+    install = commands.add_parser("install", help="render the values if needed and install CI (helm-install.sh)")
+    install.add_argument("--values", default=f"support/{os.environ.get('USER', 'user')}-values.yaml")
+
+    ecr = commands.add_parser("ecr", help="ECR pull access for build agents (ecr-access.sh)")
+    ecr.add_argument("action", choices=["create", "delete", "destroy"])
+
+    dns = commands.add_parser("dns", help="wildcard DNS alias / teardown (install-helper.sh)")
+    dns.add_argument("action", choices=["create", "delete", "destroy"])
+
+    up = commands.add_parser("up", help="pulumi up, recording a timeline and the critical path")
+    up.add_argument("--timeline", default=TIMELINE_FILE)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "action", None) == "destroy":
+        args.action = "delete"
+
+    try:
+        if args.command == "ecr":
+            # The stack and the AWS account are looked up at the same time
+            ctx, aws_account_id = await asyncio.gather(load_stack(args.stack), account_id())
+            await ecr_access(ctx, args.action, aws_account_id)
+            return 0
+
+        ctx = await load_stack(args.stack)
+        if args.command == "values":
+            path = write_values(ctx, args.output, overwrite=args.overwrite)
+            print(f"Wrote {path}. This should be considered a starting point - review it before installing CloudBees CI.")
+        elif args.command == "install":
+            if not os.path.exists(args.values):
+                write_values(ctx, args.values)
+            await helm_install(ctx, args.values)
+        elif args.command == "up":
+            await timed_up(ctx, args.timeline)
+        elif args.command == "dns":
+            await install_helper(ctx, args.action)
+    except (HelperError, auto.CommandError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
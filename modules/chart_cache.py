@@ -0,0 +1,101 @@
+import hashlib
+import os
+import urllib.request
+import pulumi
+import yaml
+from typing import Optional
+
+DEFAULT_CACHE_DIR = "charts"
+
+class ChartCacheError(Exception):
+    pass
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ChartCache:
+    """
+    Local store of pinned helm chart archives (<cache_dir>/<chart>-<version>.tgz).
+
+    A chart is rendered from the local archive whenever one is present, so previews don't touch the
+    network. The repo index and archive are only fetched on a cache miss. Every archive is checked
+    against a sha256 digest - the one pinned in stack config if given, otherwise the digest the
+    repo index published when the archive was first fetched (kept next to it as <archive>.sha256).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, timeout: int = 30):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+
+    def archive_path(self, chart: str, version: str) -> str:
+        return os.path.join(self.cache_dir, f"{chart}-{version}.tgz")
+
+    def get(self, chart: str, version: str, repo: str, digest: Optional[str] = None) -> str:
+        """Path to the verified archive for chart@version, fetching it from repo on a cache miss."""
+        if not version:
+            raise ChartCacheError(f"Chart '{chart}' must have a pinned version to be cached")
+
+        path = self.archive_path(chart, version)
+        if os.path.exists(path):
+            self._verify(path, digest or self._read_digest(path))
+            return path
+
+        pulumi.log.info(f"Chart cache miss for {chart}-{version}, fetching from {repo}")
+        url, index_digest = self._lookup(chart, version, repo)
+        if digest and index_digest and digest != index_digest:
+            raise ChartCacheError(f"Pinned digest for {chart}-{version} does not match the digest published by {repo}")
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.part"
+        try:
+            self._download(url, tmp_path)
+            self._verify(tmp_path, digest or index_digest)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with open(f"{path}.sha256", "w") as f:
+            f.write(f"{sha256_file(path)}\n")
+        return path
+
+    def _read_digest(self, path: str) -> Optional[str]:
+        if not os.path.exists(f"{path}.sha256"):
+            return None
+        with open(f"{path}.sha256") as f:
+            return f.read().strip()
+
+    def _verify(self, path: str, digest: Optional[str]) -> None:
+        if not digest:
+            raise ChartCacheError(f"No digest to verify {path} against. Pin one in stack config or re-fetch the chart.")
+        actual = sha256_file(path)
+        if actual != digest:
+            raise ChartCacheError(f"Digest mismatch for {path}: expected {digest}, got {actual}")
+
+    def _lookup(self, chart: str, version: str, repo: str) -> tuple:
+        index_url = f"{repo.rstrip('/')}/index.yaml"
+        try:
+            with urllib.request.urlopen(index_url, timeout=self.timeout) as response:
+                index = yaml.safe_load(response.read())
+        except OSError as e:
+            raise ChartCacheError(f"Could not fetch {index_url}: {e}") from e
+
+        for entry in (index.get("entries") or {}).get(chart, []):
+            if entry.get("version") == version:
+                url = entry["urls"][0]
+                if "://" not in url:
+                    url = f"{repo.rstrip('/')}/{url}"
+                return url, entry.get("digest")
+        raise ChartCacheError(f"Chart {chart} version {version} not found in {index_url}")
+
+    def _download(self, url: str, path: str) -> None:
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response, open(path, "wb") as f:
+                for chunk in iter(lambda: response.read(1 << 16), b""):
+                    f.write(chunk)
+        except OSError as e:
+            raise ChartCacheError(f"Could not download {url}: {e}") from e
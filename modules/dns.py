@@ -0,0 +1,265 @@
+import json
+import pulumi
+from pulumi import Input
+from typing import Optional, Sequence, TypedDict
+import pulumi_aws as aws
+import pulumi_kubernetes as k8s
+from modules.providers import Providers
+
+# Link-local address NodeLocal DNSCache listens on. Kubelet hands it to pods as their nameserver
+# (see node_user_data in eks_nodes_ec2), so lookups never leave the node on a cache hit and don't
+# go through kube-proxy's conntrack entries for the kube-dns service.
+NODE_LOCAL_DNS_IP = "169.254.20.10"
+NODE_LOCAL_DNS_IMAGE = "registry.k8s.io/dns/k8s-dns-node-cache:1.23.1"
+
+class CoreDnsSettings(TypedDict, total=False):
+    # Fixed replica count, used when autoscaling is off
+    replicas: int
+    # EKS scales CoreDNS with the number of nodes and CPU cores, between min_ and max_replicas
+    autoscaling: bool
+    min_replicas: int
+    max_replicas: int
+    # Seconds answers are cached, by CoreDNS and by NodeLocal DNSCache
+    cache_ttl: int
+    cpu_request: str
+    memory_request: str
+    memory_limit: str
+
+DEFAULT_COREDNS_SETTINGS: CoreDnsSettings = {
+    "replicas": 2,
+    "autoscaling": True,
+    "min_replicas": 2,
+    "max_replicas": 10,
+    "cache_ttl": 30,
+    "cpu_request": "100m",
+    "memory_request": "70Mi",
+    "memory_limit": "170Mi",
+}
+
+def validate_coredns_settings(settings: CoreDnsSettings) -> None:
+    unknown = [key for key in settings if key not in DEFAULT_COREDNS_SETTINGS]
+    if unknown:
+        raise ValueError(f"Unknown CoreDNS settings: {unknown}")
+    settings = {**DEFAULT_COREDNS_SETTINGS, **settings}
+    for key, (low, high) in {"replicas": (1, 100), "min_replicas": (1, 100), "max_replicas": (1, 1000), "cache_ttl": (0, 3600)}.items():
+        if not isinstance(settings[key], int) or isinstance(settings[key], bool) or not low <= settings[key] <= high:
+            raise ValueError(f"CoreDNS '{key}' must be an integer between {low} and {high}, got {settings[key]!r}")
+    if not isinstance(settings["autoscaling"], bool):
+        raise ValueError("CoreDNS 'autoscaling' must be a boolean")
+    if settings["min_replicas"] > settings["max_replicas"]:
+        raise ValueError("CoreDNS min_replicas must not be greater than max_replicas")
+
+def coredns_corefile(cache_ttl: int) -> str:
+    """The EKS default Corefile, with the cache TTL set."""
+    return "\n".join([
+        ".:53 {",
+        "    errors",
+        "    health {",
+        "        lameduck 5s",
+        "    }",
+        "    ready",
+        "    kubernetes cluster.local in-addr.arpa ip6.arpa {",
+        "        pods insecure",
+        "        fallthrough in-addr.arpa ip6.arpa",
+        "    }",
+        "    prometheus :9153",
+        "    forward . /etc/resolv.conf",
+        f"    cache {cache_ttl}",
+        "    loop",
+        "    reload",
+        "    loadbalance",
+        "}",
+        "",
+    ])
+
+def coredns_configuration_values(settings: CoreDnsSettings) -> str:
+    """configuration_values of the coredns addon, with unset settings taken from DEFAULT_COREDNS_SETTINGS."""
+    settings = {**DEFAULT_COREDNS_SETTINGS, **settings}
+    values = {
+        "replicaCount": settings["min_replicas"] if settings["autoscaling"] else settings["replicas"],
+        "resources": {
+            "requests": {"cpu": settings["cpu_request"], "memory": settings["memory_request"]},
+            "limits": {"memory": settings["memory_limit"]},
+        },
+        "corefile": coredns_corefile(settings["cache_ttl"]),
+    }
+    if settings["autoscaling"]:
+        values["autoScaling"] = {
+            "enabled": True,
+            "minReplicas": settings["min_replicas"],
+            "maxReplicas": settings["max_replicas"],
+        }
+    return json.dumps(values, sort_keys=True)
+
+NODE_LOCAL_DNS_COREFILE = """\
+cluster.local:53 {
+    errors
+    cache {
+        success 9984 __CACHE_TTL__
+        denial 9984 5
+    }
+    reload
+    loop
+    bind __LOCAL_IP__
+    forward . __PILLAR__CLUSTER__DNS__ {
+        force_tcp
+    }
+    prometheus :9253
+    health __LOCAL_IP__:8080
+}
+in-addr.arpa:53 {
+    errors
+    cache __CACHE_TTL__
+    reload
+    loop
+    bind __LOCAL_IP__
+    forward . __PILLAR__CLUSTER__DNS__ {
+        force_tcp
+    }
+    prometheus :9253
+}
+ip6.arpa:53 {
+    errors
+    cache __CACHE_TTL__
+    reload
+    loop
+    bind __LOCAL_IP__
+    forward . __PILLAR__CLUSTER__DNS__ {
+        force_tcp
+    }
+    prometheus :9253
+}
+.:53 {
+    errors
+    cache __CACHE_TTL__
+    reload
+    loop
+    bind __LOCAL_IP__
+    forward . __PILLAR__UPSTREAM__SERVERS__
+    prometheus :9253
+}
+"""
+
+def node_local_dns_corefile(cache_ttl: int) -> str:
+    """
+    Only binds the link-local address, so it works with kube-proxy in iptables and IPVS mode. The node-cache
+    binary fills in __PILLAR__CLUSTER__DNS__ (kube-dns-upstream's address) and __PILLAR__UPSTREAM__SERVERS__.
+    """
+    return NODE_LOCAL_DNS_COREFILE.replace("__CACHE_TTL__", str(cache_ttl)).replace("__LOCAL_IP__", NODE_LOCAL_DNS_IP)
+
+class ClusterDnsArgs(TypedDict, total=False):
+    cluster_name: Input[str]
+    # Manage the coredns addon; otherwise it is left as EKS installed it
+    manage_coredns: bool
+    coredns_addon_version: Input[str]
+    settings: CoreDnsSettings
+    # Run NodeLocal DNSCache on every node. The node groups must point kubelet at NODE_LOCAL_DNS_IP.
+    node_local_dns: bool
+
+class ClusterDns(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, node_dependencies: Sequence[pulumi.Resource], name: str, args: ClusterDnsArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:ClusterDns", name, args, opts)
+
+        validate_coredns_settings(args.get("settings") or {})
+        settings = {**DEFAULT_COREDNS_SETTINGS, **(args.get("settings") or {})}
+
+        self.coredns_addon = None
+        if args.get("manage_coredns"):
+            # Adopts the CoreDNS deployment EKS created with the cluster
+            self.coredns_addon = aws.eks.Addon(f"{name}-coredns",
+                cluster_name=args["cluster_name"],
+                addon_name="coredns",
+                addon_version=args.get("coredns_addon_version"),
+                configuration_values=coredns_configuration_values(settings),
+                resolve_conflicts_on_create="OVERWRITE",
+                resolve_conflicts_on_update="OVERWRITE",
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=node_dependencies)
+            )
+
+        self.node_local_dns = None
+        if args.get("node_local_dns"):
+            labels = {"k8s-app": "node-local-dns"}
+
+            node_local_dns_sa = k8s.core.v1.ServiceAccount(f"{name}-node-local-dns-sa",
+                metadata={"name": "node-local-dns", "namespace": "kube-system"},
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s)
+            )
+
+            # The cache's way to CoreDNS. Its address is what __PILLAR__CLUSTER__DNS__ resolves to.
+            upstream = k8s.core.v1.Service(f"{name}-kube-dns-upstream",
+                metadata={"name": "kube-dns-upstream", "namespace": "kube-system", "labels": {"k8s-app": "kube-dns"}},
+                spec={
+                    "selector": {"k8s-app": "kube-dns"},
+                    "ports": [
+                        {"name": "dns", "port": 53, "protocol": "UDP", "target_port": 53},
+                        {"name": "dns-tcp", "port": 53, "protocol": "TCP", "target_port": 53},
+                    ],
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=node_dependencies)
+            )
+
+            config = k8s.core.v1.ConfigMap(f"{name}-node-local-dns-config",
+                metadata={"name": "node-local-dns", "namespace": "kube-system"},
+                data={"Corefile": node_local_dns_corefile(settings["cache_ttl"])},
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s)
+            )
+
+            self.node_local_dns = k8s.apps.v1.DaemonSet(f"{name}-node-local-dns",
+                metadata={"name": "node-local-dns", "namespace": "kube-system", "labels": labels},
+                spec={
+                    "selector": {"match_labels": labels},
+                    # Replace pods a few nodes at a time; a node whose cache is down can't resolve names
+                    "update_strategy": {"rolling_update": {"max_unavailable": "10%"}},
+                    "template": {
+                        "metadata": {"labels": labels, "annotations": {"prometheus.io/port": "9253", "prometheus.io/scrape": "true"}},
+                        "spec": {
+                            "priority_class_name": "system-node-critical",
+                            "service_account_name": "node-local-dns",
+                            "host_network": True,
+                            "dns_policy": "Default",
+                            "tolerations": [
+                                {"key": "CriticalAddonsOnly", "operator": "Exists"},
+                                {"effect": "NoExecute", "operator": "Exists"},
+                                {"effect": "NoSchedule", "operator": "Exists"},
+                            ],
+                            "containers": [{
+                                "name": "node-cache",
+                                "image": NODE_LOCAL_DNS_IMAGE,
+                                "resources": {"requests": {"cpu": "25m", "memory": "5Mi"}},
+                                "args": ["-localip", NODE_LOCAL_DNS_IP, "-conf", "/etc/Corefile", "-upstreamsvc", "kube-dns-upstream"],
+                                "security_context": {"capabilities": {"add": ["NET_ADMIN"]}},
+                                "ports": [
+                                    {"container_port": 53, "name": "dns", "protocol": "UDP"},
+                                    {"container_port": 53, "name": "dns-tcp", "protocol": "TCP"},
+                                    {"container_port": 9253, "name": "metrics", "protocol": "TCP"},
+                                ],
+                                "liveness_probe": {
+                                    "http_get": {"host": NODE_LOCAL_DNS_IP, "path": "/health", "port": 8080},
+                                    "initial_delay_seconds": 60,
+                                    "timeout_seconds": 5,
+                                },
+                                "volume_mounts": [
+                                    {"mount_path": "/run/xtables.lock", "name": "xtables-lock", "read_only": False},
+                                    {"mount_path": "/etc/coredns", "name": "config-volume"},
+                                ],
+                            }],
+                            "volumes": [
+                                {"name": "xtables-lock", "host_path": {"path": "/run/xtables.lock", "type": "FileOrCreate"}},
+                                {"name": "config-volume", "config_map": {
+                                    "name": "node-local-dns",
+                                    "items": [{"key": "Corefile", "path": "Corefile.base"}],
+                                }},
+                            ],
+                        },
+                    },
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s,
+                    depends_on=[*node_dependencies, node_local_dns_sa, upstream, config])
+            )
+
+        self.settings = settings
+
+        self.register_outputs({
+            "coredns_configuration_values": coredns_configuration_values(settings) if self.coredns_addon else None,
+            "node_local_dns_ip": NODE_LOCAL_DNS_IP if self.node_local_dns else None,
+        })
@@ -2,24 +2,84 @@ import pulumi
 from pulumi import Input
 from typing import Optional, Dict, TypedDict, Any
 import pulumi_aws as aws
+from modules.providers import Providers
 
-class EfsArgs(TypedDict):
+EFS_THROUGHPUT_MODES = ["bursting", "elastic", "provisioned"]
+EFS_PERFORMANCE_MODES = ["generalPurpose", "maxIO"]
+EFS_TRANSITION_PERIODS = [
+    "AFTER_1_DAY", "AFTER_7_DAYS", "AFTER_14_DAYS", "AFTER_30_DAYS", "AFTER_60_DAYS",
+    "AFTER_90_DAYS", "AFTER_180_DAYS", "AFTER_270_DAYS", "AFTER_365_DAYS",
+]
+
+class EfsArgs(TypedDict, total=False):
     resource_prefix: Input[Any]
     private_subnet_ids: Input[Any]
+    # Optional: the AZ of each entry in private_subnet_ids (same order). When given, only one
+    # mount target is created per AZ - EFS rejects a second mount target in the same AZ.
+    private_subnet_azs: list
     vpc_id: Input[Any]
     vpc_cidr: Input[Any]
+    performance_mode: str
+    throughput_mode: str
+    provisioned_throughput_mibps: float
+    transition_to_ia: str
+    transition_to_archive: str
+    transition_to_primary_storage_class: str
+
+def validate_efs_args(args: EfsArgs) -> None:
+    performance_mode = args.get("performance_mode") or "generalPurpose"
+    throughput_mode = args.get("throughput_mode") or "bursting"
+    provisioned = args.get("provisioned_throughput_mibps")
+
+    if performance_mode not in EFS_PERFORMANCE_MODES:
+        raise ValueError(f"EFS performance_mode '{performance_mode}' is invalid. Use one of: {EFS_PERFORMANCE_MODES}")
+    if throughput_mode not in EFS_THROUGHPUT_MODES:
+        raise ValueError(f"EFS throughput_mode '{throughput_mode}' is invalid. Use one of: {EFS_THROUGHPUT_MODES}")
+    if throughput_mode == "provisioned" and not provisioned:
+        raise ValueError("EFS throughput_mode 'provisioned' requires provisioned_throughput_mibps")
+    if throughput_mode != "provisioned" and provisioned:
+        raise ValueError("EFS provisioned_throughput_mibps is only valid with throughput_mode 'provisioned'")
+    if throughput_mode == "elastic" and performance_mode == "maxIO":
+        raise ValueError("EFS elastic throughput is only supported with performance_mode 'generalPurpose'")
+
+    for key in ["transition_to_ia", "transition_to_archive"]:
+        if args.get(key) and args[key] not in EFS_TRANSITION_PERIODS:
+            raise ValueError(f"EFS {key} '{args[key]}' is invalid. Use one of: {EFS_TRANSITION_PERIODS}")
+    if args.get("transition_to_primary_storage_class") not in [None, "AFTER_1_ACCESS"]:
+        raise ValueError("EFS transition_to_primary_storage_class must be 'AFTER_1_ACCESS'")
+    if args.get("transition_to_archive"):
+        if not args.get("transition_to_ia"):
+            raise ValueError("EFS transition_to_archive requires transition_to_ia")
+        if throughput_mode != "elastic" or performance_mode != "generalPurpose":
+            raise ValueError("EFS transition_to_archive requires elastic throughput and generalPurpose performance mode")
 
 class Efs(pulumi.ComponentResource):
-    def __init__(self, provider: aws.Provider, name: str, args: EfsArgs, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, name: str, args: EfsArgs, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:Efs", name, args, opts)
 
+        validate_efs_args(args)
+
+        performance_mode = args.get("performance_mode") or "generalPurpose"
+        throughput_mode = args.get("throughput_mode") or "bursting"
+        provisioned_throughput = args.get("provisioned_throughput_mibps") if throughput_mode == "provisioned" else None
+
+        # Each transition must be its own lifecycle_policy block
+        lifecycle_policies = [
+            {key: args[key]}
+            for key in ["transition_to_ia", "transition_to_archive", "transition_to_primary_storage_class"]
+            if args.get(key)
+        ]
+
         main = aws.efs.FileSystem(f"{name}-main",
             creation_token=args["resource_prefix"],
-            performance_mode="generalPurpose",
+            performance_mode=performance_mode,
+            throughput_mode=throughput_mode,
+            provisioned_throughput_in_mibps=provisioned_throughput,
+            lifecycle_policies=lifecycle_policies,
             tags={
                 "Name": args["resource_prefix"],
             },
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         efs_sg = aws.ec2.SecurityGroup(f"{name}-efs_sg",
             name=f"{args['resource_prefix']}_efs_sg",
@@ -40,20 +100,35 @@ class Efs(pulumi.ComponentResource):
             tags={
                 "Name": f"{args['resource_prefix']}_efs_sg",
             },
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
+
+        # One mount target per AZ. The index of the first subnet seen in each AZ is kept in the
+        # resource name so existing mount targets are not replaced.
+        subnet_azs = args.get("private_subnet_azs") or list(range(len(args["private_subnet_ids"])))
+        mount_subnets: Dict[Any, int] = {}
+        for i, az in enumerate(subnet_azs):
+            mount_subnets.setdefault(az, i)
 
         main_mounts = []
-        for i in range(len(args["private_subnet_ids"])):
+        for i in mount_subnets.values():
             main_mounts.append(aws.efs.MountTarget(f"{name}-main_mounts-{i}",
                 file_system_id=main.id,
                 subnet_id=args["private_subnet_ids"][i],
                 security_groups=[efs_sg.id],
-                opts = pulumi.ResourceOptions(parent=self, provider=provider)))
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)))
 
         self.efs_mount_target = main.dns_name
         self.efs_file_system_id = main.id
+        self.efs_mount_target_ids = [__item.id for __item in main_mounts]
+        self.performance_mode = main.performance_mode
+        self.throughput_mode = main.throughput_mode
+        self.provisioned_throughput_mibps = main.provisioned_throughput_in_mibps
 
         self.register_outputs({
             'efs_mount_target': self.efs_mount_target, 
-            'efs_file_system_id': self.efs_file_system_id
-        })
\ No newline at end of file
+            'efs_file_system_id': self.efs_file_system_id,
+            'efs_mount_target_ids': self.efs_mount_target_ids,
+            'performance_mode': self.performance_mode,
+            'throughput_mode': self.throughput_mode,
+            'provisioned_throughput_mibps': self.provisioned_throughput_mibps,
+        })
@@ -8,23 +8,63 @@ import pulumi_aws as aws
 import pulumi_std as std
 import pulumi_tls as tls
 import pulumi_kubernetes as k8s
+from modules.providers import Providers
+from modules.service_account_role import irsa_trust_statement, validate_service_account_role_mode
+
+CONTROL_PLANE_LOG_TYPES = ["api", "audit", "authenticator", "controllerManager", "scheduler"]
+# The retention periods CloudWatch Logs accepts
+LOG_RETENTION_DAYS = [1, 3, 5, 7, 14, 30, 60, 90, 120, 150, 180, 365, 400, 545, 731, 1096, 1827, 2192, 2557, 2922, 3288, 3653]
+
+def validate_control_plane_logging(log_types: list, retention_days: int) -> None:
+    unknown = [log_type for log_type in log_types if log_type not in CONTROL_PLANE_LOG_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown control plane log types {unknown}. Use: {CONTROL_PLANE_LOG_TYPES}")
+    if retention_days not in LOG_RETENTION_DAYS:
+        raise ValueError(f"control_plane_log_retention_days must be one of {LOG_RETENTION_DAYS}, got {retention_days!r}")
+
+# Provisioned control plane tiers. Above 'standard' the API server and etcd get a fixed, larger capacity
+# (and an hourly charge) instead of scaling with the load.
+CONTROL_PLANE_SCALING_TIERS = ["standard", "tier-xl", "tier-2xl", "tier-4xl"]
+
+def validate_control_plane_scaling_tier(tier: str) -> None:
+    if tier not in CONTROL_PLANE_SCALING_TIERS:
+        raise ValueError(f"control_plane_scaling_tier must be one of {CONTROL_PLANE_SCALING_TIERS}, got {tier!r}")
+
+def scaling_tier_command(cluster_name: str, region: str, tier: str) -> str:
+    return (f"aws eks update-cluster-config --name {cluster_name} --region {region} --control-plane-scaling-config tier={tier}"
+            f" && aws eks wait cluster-active --name {cluster_name} --region {region}")
 
 class EksArgs(TypedDict):
     cluster_name: Input[str]
     k8s_version: Input[str]
+    # Upgrade policy support type: STANDARD, or EXTENDED to stay on a version past its standard support
     k8s_upgrade_policy: Input[str]
+    # See CONTROL_PLANE_SCALING_TIERS
+    control_plane_scaling_tier: str
     vpc_id: Input[str]
     private_subnet_ids: Input[list]
     vpc_cidr: Input[str]
     enable_private_access: Input[bool]
     enable_public_access: Input[bool]
     public_access_cidrs: Input[list]
+    # 'irsa' creates the cluster's OIDC provider, 'pod-identity' doesn't need one
+    service_account_role_mode: str
+    # Control plane logs sent to CloudWatch, kept for control_plane_log_retention_days
+    control_plane_log_types: list
+    control_plane_log_retention_days: int
+    # The stack's first cluster; its kubeconfig resources keep their names from before 'clusters'
+    primary: bool
 
 class Eks(pulumi.ComponentResource):
-    def __init__(self, provider: aws.Provider, stepparent: object, name: str, args: EksArgs, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, stepparent: object, name: str, args: EksArgs, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:Eks", name, args, opts)
 
-        current = aws.get_caller_identity_output()
+        validate_service_account_role_mode(args.get("service_account_role_mode") or "irsa")
+        scaling_tier = args.get("control_plane_scaling_tier") or "standard"
+        validate_control_plane_scaling_tier(scaling_tier)
+        pod_identity = args.get("service_account_role_mode") == "pod-identity"
+
+        current = aws.get_caller_identity_output(opts=pulumi.InvokeOptions(provider=providers.aws))
 
         main_cluster = aws.iam.Role(f"{name}-main-cluster",
             name=f"{args['cluster_name']}_role",
@@ -38,19 +78,19 @@ class Eks(pulumi.ComponentResource):
                     "Action": "sts:AssumeRole",
                 }],
             }),
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         # Cluster Policy Attachment
         cluster__amazon_eks_cluster_policy = aws.iam.RolePolicyAttachment(f"{name}-cluster-AmazonEKSClusterPolicy",
             policy_arn="arn:aws:iam::aws:policy/AmazonEKSClusterPolicy",
             role=main_cluster.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         # Service Policy Attachment
         cluster__amazon_eks_service_policy = aws.iam.RolePolicyAttachment(f"{name}-cluster-AmazonEKSServicePolicy",
             policy_arn="arn:aws:iam::aws:policy/AmazonEKSServicePolicy",
             role=main_cluster.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         eks_sg = aws.ec2.SecurityGroup(f"{name}-eks_sg",
             name=f"{args['cluster_name']}_eks_sg",
@@ -71,7 +111,19 @@ class Eks(pulumi.ComponentResource):
             tags={
                 "Name": f"{args['cluster_name']}_eks_sg",
             },
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
+
+        log_types = list(args.get("control_plane_log_types") or [])
+        log_retention_days = args.get("control_plane_log_retention_days") or 30
+        validate_control_plane_logging(log_types, log_retention_days)
+        log_dependencies = []
+        if log_types:
+            # EKS logs to this group. Created up front so it gets a retention instead of keeping logs forever.
+            log_dependencies.append(aws.cloudwatch.LogGroup(f"{name}-control-plane-logs",
+                name=f"/aws/eks/{args['cluster_name']}/cluster",
+                retention_in_days=log_retention_days,
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            ))
 
         main = aws.eks.Cluster(f"{name}-main",
             name=args["cluster_name"],
@@ -84,63 +136,62 @@ class Eks(pulumi.ComponentResource):
                 "endpoint_public_access": args["enable_public_access"],
                 "public_access_cidrs": args["public_access_cidrs"],
             },
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            upgrade_policy={
+                "support_type": args["k8s_upgrade_policy"],
+            },
+            enabled_cluster_log_types=log_types or None,
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=log_dependencies)
         )
 
         oidc_issuer_url = main.identities[0].oidcs[0].issuer
         oidc_url_no_proto = oidc_issuer_url.apply(lambda url: url.replace("https://", ""))
 
-        policy_doc = pulumi.Output.all(oidc_url_no_proto, current.account_id).apply(lambda args: json.dumps({
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                    "Effect": "Allow",
-                    "Principal": {"Service": "ec2.amazonaws.com"},
-                    "Action": "sts:AssumeRole",
-                },
-                {
-                    "Effect": "Allow",
-                    "Principal": {"Federated": f"arn:aws:iam::${args[1]}:oidc-provider/{args[0]}"},
-                    "Action": "sts:AssumeRoleWithWebIdentity",
-                    "Condition": {
-                        "StringEquals": {
-                            f"{args[0]}:aud": "sts.amazonaws.com",
-                            f"{args[0]}:sub": "system:serviceaccount:kube-system:ebs-csi-controller-sa",
-                        }
-                    },
-                },
-            ],
-        }))
+        node_trust = {
+            "Effect": "Allow",
+            "Principal": {"Service": "ec2.amazonaws.com"},
+            "Action": "sts:AssumeRole",
+        }
+        if pod_identity:
+            # Nothing federates through an OIDC provider, so there is none
+            policy_doc = json.dumps({"Version": "2012-10-17", "Statement": [node_trust]})
+        else:
+            policy_doc = pulumi.Output.all(oidc_url_no_proto, current.account_id).apply(lambda args: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [
+                    node_trust,
+                    irsa_trust_statement(f"arn:aws:iam::{args[1]}:oidc-provider/{args[0]}", args[0], "kube-system", "ebs-csi-controller-sa"),
+                ],
+            }))
 
         eks_nodes = aws.iam.Role(f"{name}-eks_nodes",
             name=f"{args['cluster_name']}-eks-node-group",
             assume_role_policy=policy_doc,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         amazon_ebscsi_driver_policy = aws.iam.RolePolicyAttachment(f"{name}-AmazonEBSCSIDriverPolicy",
             policy_arn="arn:aws:iam::aws:policy/service-role/AmazonEBSCSIDriverPolicy",
             role=eks_nodes.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         amazon_eks_worker_node_policy = aws.iam.RolePolicyAttachment(f"{name}-AmazonEKSWorkerNodePolicy",
             policy_arn="arn:aws:iam::aws:policy/AmazonEKSWorkerNodePolicy",
             role=eks_nodes.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         amazon_ekscni_policy = aws.iam.RolePolicyAttachment(f"{name}-AmazonEKS_CNI_Policy",
             policy_arn="arn:aws:iam::aws:policy/AmazonEKS_CNI_Policy",
             role=eks_nodes.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         amazon_ec2_container_registry_read_only = aws.iam.RolePolicyAttachment(f"{name}-AmazonEC2ContainerRegistryReadOnly",
             policy_arn="arn:aws:iam::aws:policy/AmazonEC2ContainerRegistryReadOnly",
             role=eks_nodes.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         amazon_ssm_managed_instance_core = aws.iam.RolePolicyAttachment(f"{name}-AmazonSSMManagedInstanceCore",
             policy_arn="arn:aws:iam::aws:policy/AmazonSSMManagedInstanceCore",
             role=eks_nodes.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         autoscaling = aws.iam.Policy(f"{name}-autoscaling",
             name=f"{args['cluster_name']}-autoscaling",
@@ -161,12 +212,12 @@ class Eks(pulumi.ComponentResource):
                     "Resource": "*",
                 }],
             }),
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         autoscaler = aws.iam.RolePolicyAttachment(f"{name}-autoscaler",
             policy_arn=autoscaling.arn,
             role=eks_nodes.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         amazon_eksefscsi_driver_policy = aws.iam.Policy(f"{name}-AmazonEKS_EFS_CSI_Driver_Policy",
             name=f"{args['cluster_name']}-efs-csi-driver-policy",
@@ -205,46 +256,77 @@ class Eks(pulumi.ComponentResource):
                     },
                 ],
             }),
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         efs_driver_attachment = aws.iam.RolePolicyAttachment(f"{name}-efs-driver-attachment",
             policy_arn=amazon_eksefscsi_driver_policy.arn,
             role=eks_nodes.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
-        # Fetch the TLS thumbprint (required for the OIDC provider)
-        tls_cert = tls.get_certificate_output(url=oidc_issuer_url)
+        if pod_identity:
+            oidc_provider = None
+        else:
+            # Fetch the TLS thumbprint (required for the OIDC provider)
+            tls_cert = tls.get_certificate_output(url=oidc_issuer_url, opts=pulumi.InvokeOptions(provider=providers.tls))
 
-        oidc_provider = aws.iam.OpenIdConnectProvider(f"{name}-oidc-provider",
-            client_id_lists=["sts.amazonaws.com"],
-            thumbprint_lists=[tls_cert.certificates[0].sha1_fingerprint],
-            url=oidc_issuer_url,
-            opts = pulumi.ResourceOptions(parent=self)
-        )
+            oidc_provider = aws.iam.OpenIdConnectProvider(f"{name}-oidc-provider",
+                client_id_lists=["sts.amazonaws.com"],
+                thumbprint_lists=[tls_cert.certificates[0].sha1_fingerprint],
+                url=oidc_issuer_url,
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
 
-        create_kubeconfig = null.Resource("create_kubeconfig", triggers={
+        create_kubeconfig = null.Resource(f"{name}-create_kubeconfig", triggers={
             #"always_run": std.timestamp_output().apply(lambda invoke: invoke.result),
             'cluster_name': main.name,
             'cluster_endpoint': main.endpoint,
-        }, opts=pulumi.ResourceOptions(provider=provider, parent=self, depends_on=[main]))
+        }, opts=pulumi.ResourceOptions(provider=providers.null, parent=self, depends_on=[main],
+            aliases=[pulumi.Alias(name="create_kubeconfig")] if args.get("primary") else None))
 
         create_kubeconfig_provisioner0 = command.local.Command(
-            "create_kubeconfig_provisioner_0", 
+            f"{name}-create_kubeconfig_provisioner_0",
             create=main.name.apply(
                 lambda cluster_name: f"aws eks update-kubeconfig --name {cluster_name} --alias {args['cluster_name']} --region {aws.config.region}"
             ),
-            opts = pulumi.ResourceOptions(depends_on=[create_kubeconfig], provider=provider, parent=self)
+            opts = pulumi.ResourceOptions(depends_on=[create_kubeconfig], provider=providers.command, parent=self,
+                aliases=[pulumi.Alias(name="create_kubeconfig_provisioner_0")] if args.get("primary") else None)
         )
 
-        self.oidc_provider_url = oidc_url_no_proto
-        self.oidc_provider_arn = oidc_provider.arn
+        if scaling_tier != "standard":
+            # The pinned pulumi-aws has no control_plane_scaling_config on the cluster yet, so the CLI sets the
+            # tier once the cluster exists. Removing the setting puts the cluster back on 'standard'.
+            command.local.Command(f"{name}-control-plane-scaling",
+                create=scaling_tier_command(args["cluster_name"], aws.config.region, scaling_tier),
+                update=scaling_tier_command(args["cluster_name"], aws.config.region, scaling_tier),
+                delete=scaling_tier_command(args["cluster_name"], aws.config.region, "standard"),
+                opts = pulumi.ResourceOptions(provider=providers.command, parent=self, depends_on=[main])
+            )
+
+        # None with Pod Identity
+        self.oidc_provider_url = None if pod_identity else oidc_url_no_proto
+        self.oidc_provider_arn = oidc_provider.arn if oidc_provider else None
         self.certificate_authority = main.certificate_authority.apply(lambda ca: ca.data if ca else "")
 
+        # Node groups wait for these rather than the whole component (OIDC provider, kubeconfig command, ...)
+        self.cluster = main
+        self.kubeconfig_command = create_kubeconfig_provisioner0
+        self.node_role_dependencies = [
+            amazon_eks_worker_node_policy,
+            amazon_ekscni_policy,
+            amazon_ec2_container_registry_read_only,
+            amazon_ssm_managed_instance_core,
+            amazon_ebscsi_driver_policy,
+            autoscaler,
+            efs_driver_attachment,
+        ]
+
         self.aws_iam_role_node_id = eks_nodes.id
         self.aws_iam_role_node_arn = eks_nodes.arn
         self.eks_node_role = eks_nodes
         self.eks_cluster_role_name = main_cluster.name
         self.eks_endpoint = main.endpoint
+        self.upgrade_support_type = main.upgrade_policy.apply(lambda policy: policy.support_type if policy else None)
+        self.control_plane_scaling_tier = scaling_tier
         
         self.status = main.status
         self.cluster_id = main.id
@@ -264,4 +346,6 @@ class Eks(pulumi.ComponentResource):
             'oidc_provider_arn': self.oidc_provider_arn,
             'oidc_provider_url': self.oidc_provider_url,
             'certificate_authority': self.certificate_authority,
+            'upgrade_support_type': self.upgrade_support_type,
+            'control_plane_scaling_tier': scaling_tier,
         })
\ No newline at end of file
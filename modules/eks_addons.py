@@ -1,79 +1,493 @@
 import pulumi
 import json
+import re
 from pulumi import Input
-from typing import Optional, TypedDict
+from typing import Optional, Sequence, TypedDict
 import pulumi_aws as aws
 import pulumi_kubernetes as k8s
+from modules.providers import Providers
+from modules.service_account_role import service_account_role
 
-class EfsAddonsArgs(TypedDict):
+# Flag options, and options that take a numeric value ("rsize=1048576")
+EFS_FLAG_MOUNT_OPTIONS = [
+    "tls", "iam", "noatime", "nodiratime", "_netdev", "async", "sync",
+    "noresvport", "hard", "soft", "ro", "rw", "noac",
+]
+EFS_VALUE_MOUNT_OPTIONS = {
+    "rsize": (1024, 1048576),
+    "wsize": (1024, 1048576),
+    "nconnect": (1, 16),
+    "actimeo": (0, 3600),
+    "acregmin": (0, 3600),
+    "acregmax": (0, 3600),
+    "acdirmin": (0, 3600),
+    "acdirmax": (0, 3600),
+    "timeo": (1, 6000),
+    "retrans": (0, 10),
+}
+EFS_CONFLICTING_MOUNT_OPTIONS = [
+    ("async", "sync"),
+    ("hard", "soft"),
+    ("ro", "rw"),
+    ("noac", "actimeo"),
+]
+
+class EfsStorageClass(TypedDict, total=False):
+    name: str
+    base_path: str
+    uid: int
+    gid: int
+    gid_range_start: int
+    gid_range_end: int
+    directory_perms: str
+    reuse_access_point: bool
+    # Directory each access point gets under base_path, e.g. "${.PVC.namespace}/${.PVC.name}";
+    # unset, the driver names it after the PV
+    sub_path_pattern: str
+    mount_options: list
+
+class EfsAddonsArgs(TypedDict, total=False):
     cluster_name: Input[str]
+    # 'irsa' (default, uses the OIDC provider below) or 'pod-identity'
+    service_account_role_mode: str
     oidc_provider_arn: Input[str]
     oidc_provider_url: Input[str]
-    storage_class_name: Input[str]
-    storage_mount_options: Input[list]
     efs_filesystem_id: Input[str]
+    storage_classes: list
+    addon_version: Input[str]
+
+def validate_efs_mount_options(mount_options: list) -> None:
+    seen = {}
+    for option in mount_options:
+        key, _, value = str(option).partition("=")
+        if key in seen:
+            raise ValueError(f"EFS mount option '{key}' is given more than once")
+        seen[key] = value
+
+        if key in EFS_FLAG_MOUNT_OPTIONS:
+            if value:
+                raise ValueError(f"EFS mount option '{key}' does not take a value")
+        elif key in EFS_VALUE_MOUNT_OPTIONS:
+            low, high = EFS_VALUE_MOUNT_OPTIONS[key]
+            if not value.isdigit() or not low <= int(value) <= high:
+                raise ValueError(f"EFS mount option '{key}' must be an integer between {low} and {high}, got '{value}'")
+            if key in ["rsize", "wsize"] and int(value) % 1024 != 0:
+                raise ValueError(f"EFS mount option '{key}' must be a multiple of 1024, got {value}")
+        else:
+            raise ValueError(f"EFS mount option '{key}' is not supported")
+
+    for a, b in EFS_CONFLICTING_MOUNT_OPTIONS:
+        if a in seen and b in seen:
+            raise ValueError(f"EFS mount options '{a}' and '{b}' conflict")
+    if "actimeo" in seen and [k for k in seen if k.startswith("ac") and k != "actimeo"]:
+        raise ValueError("EFS mount option 'actimeo' conflicts with acregmin/acregmax/acdirmin/acdirmax")
+    if "iam" in seen and "tls" not in seen:
+        raise ValueError("EFS mount option 'iam' requires 'tls'")
+
+def validate_efs_storage_classes(storage_classes: list) -> None:
+    names = [sc.get("name") for sc in storage_classes]
+    if not storage_classes:
+        raise ValueError("At least one EFS storage class must be defined")
+    if None in names or "" in names:
+        raise ValueError("Every EFS storage class needs a name")
+    if len(set(names)) != len(names):
+        raise ValueError(f"EFS storage class names must be unique, got: {names}")
+
+    for sc in storage_classes:
+        if ("gid_range_start" in sc) != ("gid_range_end" in sc):
+            raise ValueError(f"EFS storage class '{sc['name']}': gid_range_start and gid_range_end must be set together")
+        if "gid_range_start" in sc:
+            if "gid" in sc:
+                raise ValueError(f"EFS storage class '{sc['name']}': gid and a gid range are mutually exclusive")
+            if not 0 < int(sc["gid_range_start"]) < int(sc["gid_range_end"]):
+                raise ValueError(f"EFS storage class '{sc['name']}': gid_range_start must be lower than gid_range_end")
+        if not re.fullmatch(r"[0-7]{3}", str(sc.get("directory_perms", "700"))):
+            raise ValueError(f"EFS storage class '{sc['name']}': directory_perms must be an octal mode like '700'")
+        if sc.get("base_path") and not sc["base_path"].startswith("/"):
+            raise ValueError(f"EFS storage class '{sc['name']}': base_path must be absolute")
+        if "sub_path_pattern" in sc and (not sc["sub_path_pattern"] or str(sc["sub_path_pattern"]).startswith("/")):
+            raise ValueError(f"EFS storage class '{sc['name']}': sub_path_pattern must be a path relative to base_path")
+        try:
+            validate_efs_mount_options(sc.get("mount_options") or [])
+        except ValueError as e:
+            raise ValueError(f"EFS storage class '{sc['name']}': {e}") from e
 
 class EfsAddon(pulumi.ComponentResource):
-    def __init__(self, provider: k8s.Provider, stepparent: object, name: str, args: EfsAddonsArgs, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, node_dependencies: Sequence[pulumi.Resource], name: str, args: EfsAddonsArgs, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:EfsAddon", name, args, opts)
 
-        efs_csi_role = aws.iam.Role(f"{name}-role",
-            assume_role_policy=pulumi.Output.all(
-                args["oidc_provider_arn"],
-                args["oidc_provider_url"],
-            ).apply(lambda args: json.dumps({
-                "Version": "2012-10-17",
-                "Statement": [{
-                    "Effect": "Allow",
-                    "Principal": {"Federated": args[0]},
-                    "Action": "sts:AssumeRoleWithWebIdentity",
-                    "Condition": {
-                        "StringEquals": {
-                            f"{args[1]}:sub": "system:serviceaccount:kube-system:efs-csi-controller-sa",
-                            f"{args[1]}:aud": "sts.amazonaws.com",
-                        },
-                    },
-                }],
-            })),
-            opts = pulumi.ResourceOptions(parent=self)
-        )
+        validate_efs_storage_classes(args["storage_classes"])
+
+        efs_csi_role = service_account_role(providers, self, name, {
+            'mode': args.get("service_account_role_mode"),
+            'cluster_name': args["cluster_name"],
+            'namespace': "kube-system",
+            'service_account': "efs-csi-controller-sa",
+            'oidc_provider_arn': args.get("oidc_provider_arn"),
+            'oidc_provider_url': args.get("oidc_provider_url"),
+        }, policy_arns={
+            f"{name}-policy": "arn:aws:iam::aws:policy/service-role/AmazonEFSCSIDriverPolicy",
+        })
 
-        storage_class_resource = k8s.storage.v1.StorageClass(f"{name}-efs-sc",
-            provisioner="efs.csi.aws.com",
-            allow_volume_expansion=True,
-            kind="StorageClass",
-            metadata={
-                "name": args["storage_class_name"],
-            },
-            mount_options=args['storage_mount_options'],
-            parameters={
+        storage_classes = []
+        for i, sc in enumerate(args["storage_classes"]):
+            parameters = {
                 "provisioningMode": "efs-ap",
                 "fileSystemId": args["efs_filesystem_id"],
-                "directoryPerms": "700",
-                "gid": "1000",
-                "uid": "1000"
-            },
-            opts=pulumi.ResourceOptions(parent=self, provider=provider, depends_on=[stepparent])
-        )
+                "directoryPerms": str(sc.get("directory_perms", "700")),
+                "uid": str(sc.get("uid", 1000)),
+            }
+            if "gid_range_start" in sc:
+                parameters["gidRangeStart"] = str(sc["gid_range_start"])
+                parameters["gidRangeEnd"] = str(sc["gid_range_end"])
+            else:
+                parameters["gid"] = str(sc.get("gid", 1000))
+            if sc.get("base_path"):
+                parameters["basePath"] = sc["base_path"]
+            if sc.get("reuse_access_point"):
+                # Re-binding a PVC reuses its access point instead of creating a new one
+                parameters["reuseAccessPoint"] = "true"
+            if sc.get("sub_path_pattern"):
+                parameters["subPathPattern"] = sc["sub_path_pattern"]
 
-        aws.iam.RolePolicyAttachment(f"{name}-policy",
-            role=efs_csi_role.name,
-            policy_arn="arn:aws:iam::aws:policy/service-role/AmazonEFSCSIDriverPolicy",
-            opts = pulumi.ResourceOptions(parent=self)
-        )
+            # The first class keeps the original resource name so existing stacks don't replace it
+            storage_classes.append(k8s.storage.v1.StorageClass(f"{name}-efs-sc" if i == 0 else f"{name}-efs-sc-{sc['name']}",
+                provisioner="efs.csi.aws.com",
+                allow_volume_expansion=True,
+                kind="StorageClass",
+                metadata={
+                    "name": sc["name"],
+                },
+                mount_options=sc.get("mount_options") or [],
+                parameters=parameters,
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s)
+            ))
 
         efs_csi_addon = aws.eks.Addon(f"{name}-addon",
             cluster_name=args["cluster_name"],
             addon_name="aws-efs-csi-driver",
-            addon_version="v2.3.0-eksbuild.1",
-            service_account_role_arn=efs_csi_role.arn,
+            addon_version=args.get("addon_version"),
+            service_account_role_arn=efs_csi_role.addon_role_arn,
             resolve_conflicts_on_create="OVERWRITE",
             resolve_conflicts_on_update="PRESERVE",
-            opts = pulumi.ResourceOptions(parent=self, provider=provider, depends_on=[stepparent])
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=[*node_dependencies, *efs_csi_role.dependencies])
         )
 
+        self.storage_class_names = [sc["name"] for sc in args["storage_classes"]]
+
         self.register_outputs({
-            "storage_class_id": storage_class_resource.id,
+            "storage_class_ids": [__item.id for __item in storage_classes],
+            "storage_class_names": self.storage_class_names,
             "efs_csi_role_arn": efs_csi_role.arn,
             "efs_csi_addon_name": efs_csi_addon.addon_name,
-        })
\ No newline at end of file
+        })
+
+class EbsStorageClass(TypedDict, total=False):
+    name: str
+    iops: int
+    throughput: int
+    encrypted: bool
+    kms_key_id: str
+    fs_type: str
+    is_default: bool
+
+class EbsAddonArgs(TypedDict, total=False):
+    cluster_name: Input[str]
+    # 'irsa' (default, uses the OIDC provider below) or 'pod-identity'
+    service_account_role_mode: str
+    oidc_provider_arn: Input[str]
+    oidc_provider_url: Input[str]
+    addon_version: Input[str]
+    storage_classes: list
+
+def validate_ebs_storage_classes(storage_classes: list) -> None:
+    names = [sc.get("name") for sc in storage_classes]
+    if not storage_classes:
+        raise ValueError("At least one EBS storage class must be defined")
+    if None in names or "" in names:
+        raise ValueError("Every EBS storage class needs a name")
+    if len(set(names)) != len(names):
+        raise ValueError(f"EBS storage class names must be unique, got: {names}")
+    if len([sc for sc in storage_classes if sc.get("is_default")]) > 1:
+        raise ValueError("Only one EBS storage class can be the default")
+
+    for sc in storage_classes:
+        iops = int(sc.get("iops") or 3000)
+        throughput = int(sc.get("throughput") or 125)
+        if not 3000 <= iops <= 16000:
+            raise ValueError(f"EBS storage class '{sc['name']}': gp3 iops must be between 3000 and 16000, got {iops}")
+        if not 125 <= throughput <= 1000:
+            raise ValueError(f"EBS storage class '{sc['name']}': gp3 throughput must be between 125 and 1000 MiB/s, got {throughput}")
+        if throughput > iops / 4:
+            raise ValueError(f"EBS storage class '{sc['name']}': gp3 throughput of {throughput} MiB/s needs at least {throughput * 4} iops")
+        if sc.get("kms_key_id") and sc.get("encrypted") is False:
+            raise ValueError(f"EBS storage class '{sc['name']}': kms_key_id requires encrypted to be true")
+
+class EbsAddon(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, node_dependencies: Sequence[pulumi.Resource], name: str, args: EbsAddonArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:EbsAddon", name, args, opts)
+
+        validate_ebs_storage_classes(args["storage_classes"])
+
+        ebs_csi_role = service_account_role(providers, self, name, {
+            'mode': args.get("service_account_role_mode"),
+            'cluster_name': args["cluster_name"],
+            'namespace': "kube-system",
+            'service_account': "ebs-csi-controller-sa",
+            'oidc_provider_arn': args.get("oidc_provider_arn"),
+            'oidc_provider_url': args.get("oidc_provider_url"),
+        }, policy_arns={
+            f"{name}-policy": "arn:aws:iam::aws:policy/service-role/AmazonEBSCSIDriverPolicy",
+        })
+
+        ebs_csi_addon = aws.eks.Addon(f"{name}-addon",
+            cluster_name=args["cluster_name"],
+            addon_name="aws-ebs-csi-driver",
+            addon_version=args.get("addon_version"),
+            service_account_role_arn=ebs_csi_role.addon_role_arn,
+            resolve_conflicts_on_create="OVERWRITE",
+            resolve_conflicts_on_update="PRESERVE",
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=[*node_dependencies, *ebs_csi_role.dependencies])
+        )
+
+        storage_classes = []
+        for sc in args["storage_classes"]:
+            parameters = {
+                "type": "gp3",
+                "iops": str(sc.get("iops") or 3000),
+                "throughput": str(sc.get("throughput") or 125),
+                "encrypted": "false" if sc.get("encrypted") is False else "true",
+                "csi.storage.k8s.io/fstype": sc.get("fs_type") or "ext4",
+            }
+            if sc.get("kms_key_id"):
+                parameters["kmsKeyId"] = sc["kms_key_id"]
+
+            storage_classes.append(k8s.storage.v1.StorageClass(f"{name}-{sc['name']}",
+                provisioner="ebs.csi.aws.com",
+                allow_volume_expansion=True,
+                # Volumes are created in the AZ the pod lands in, not wherever the PVC happened to be bound
+                volume_binding_mode="WaitForFirstConsumer",
+                reclaim_policy="Delete",
+                metadata={
+                    "name": sc["name"],
+                    "annotations": {
+                        "storageclass.kubernetes.io/is-default-class": "true" if sc.get("is_default") else "false",
+                    },
+                },
+                parameters=parameters,
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[ebs_csi_addon])
+            ))
+
+        self.ebs_csi_role_arn = ebs_csi_role.arn
+        self.ebs_csi_addon_name = ebs_csi_addon.addon_name
+        self.storage_class_names = [sc["name"] for sc in args["storage_classes"]]
+
+        self.register_outputs({
+            "storage_class_ids": [__item.id for __item in storage_classes],
+            "storage_class_names": self.storage_class_names,
+            "ebs_csi_role_arn": self.ebs_csi_role_arn,
+            "ebs_csi_addon_name": self.ebs_csi_addon_name,
+        })
+
+
+class FsxAddonArgs(TypedDict, total=False):
+    cluster_name: Input[str]
+    # 'irsa' (default, uses the OIDC provider below) or 'pod-identity'
+    service_account_role_mode: str
+    oidc_provider_arn: Input[str]
+    oidc_provider_url: Input[str]
+    storage_class_name: Input[str]
+    file_system_type: str
+    file_system_id: Input[str]
+    dns_name: Input[str]
+    storage_capacity: Input[int]
+    # OpenZFS only: child volumes are provisioned under this volume
+    root_volume_id: Input[str]
+    vpc_cidr: Input[str]
+    # Lustre only; the shared claim goes in claim_namespace, where the build pods run
+    mount_name: Input[str]
+    claim_namespace: str
+    addon_version: Input[str]
+    chart_version: Input[str]
+
+class FsxAddon(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, node_dependencies: Sequence[pulumi.Resource], name: str, args: FsxAddonArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:FsxAddon", name, args, opts)
+
+        if args["file_system_type"] == "openzfs":
+            # Service account name used by the aws-fsx-openzfs-csi-driver chart
+            service_account_name = "fsx-openzfs-csi-controller-sa"
+        else:
+            service_account_name = "fsx-csi-controller-sa"
+        role_args = {
+            'mode': args.get("service_account_role_mode"),
+            'cluster_name': args["cluster_name"],
+            'namespace': "kube-system",
+            'service_account': service_account_name,
+            'oidc_provider_arn': args.get("oidc_provider_arn"),
+            'oidc_provider_url': args.get("oidc_provider_url"),
+        }
+
+        if args["file_system_type"] == "openzfs":
+            fsx_csi_policy = aws.iam.Policy(f"{name}-openzfs-policy",
+                description="policy to enable fsx-openzfs-csi",
+                policy=json.dumps({
+                    "Version": "2012-10-17",
+                    "Statement": [{
+                        "Effect": "Allow",
+                        "Action": [
+                            "fsx:CreateVolume",
+                            "fsx:DeleteVolume",
+                            "fsx:UpdateVolume",
+                            "fsx:DescribeVolumes",
+                            "fsx:DescribeFileSystems",
+                            "fsx:CreateSnapshot",
+                            "fsx:DeleteSnapshot",
+                            "fsx:DescribeSnapshots",
+                            "fsx:TagResource",
+                            "fsx:ListTagsForResource",
+                        ],
+                        "Resource": "*",
+                    }],
+                }),
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            fsx_csi_role = service_account_role(providers, self, name, role_args, policy_arns={
+                f"{name}-policy": fsx_csi_policy.arn,
+            })
+
+            # There is no managed EKS addon for the OpenZFS driver, so it comes from its helm chart
+            csi_driver = k8s.helm.v4.Chart(f"{name}-chart",
+                chart="aws-fsx-openzfs-csi-driver",
+                version=args.get("chart_version"),
+                repository_opts=k8s.helm.v4.RepositoryOptsArgs(
+                    repo="https://kubernetes-sigs.github.io/aws-fsx-openzfs-csi-driver",
+                ),
+                namespace="kube-system",
+                values={
+                    "controller": {
+                        "serviceAccount": {
+                            "create": True,
+                            "name": service_account_name,
+                            "annotations": fsx_csi_role.annotations,
+                        },
+                    },
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[*node_dependencies, *fsx_csi_role.dependencies])
+            )
+
+            # Each PVC gets a child volume of the root volume; build pods share it via ReadWriteMany
+            storage_class_resource = k8s.storage.v1.StorageClass(f"{name}-fsx-sc",
+                provisioner="fsx.openzfs.csi.aws.com",
+                allow_volume_expansion=True,
+                metadata={
+                    "name": args["storage_class_name"],
+                },
+                mount_options=["nfsvers=4.1", "rsize=1048576", "wsize=1048576", "timeo=600", "nconnect=16"],
+                parameters={
+                    "ResourceType": "volume",
+                    # The driver expects these parameters JSON-encoded
+                    "ParentVolumeId": pulumi.Output.from_input(args["root_volume_id"]).apply(json.dumps),
+                    "DataCompressionType": '"LZ4"',
+                    "NfsExports": pulumi.Output.from_input(args["vpc_cidr"]).apply(lambda cidr: json.dumps([{
+                        "ClientConfigurations": [{"Clients": cidr, "Options": ["rw", "crossmnt", "no_root_squash"]}],
+                    }])),
+                    "ReadOnly": "false",
+                    "RecordSizeKiB": "128",
+                    "OptionsOnDeletion": '["DELETE_CHILD_VOLUMES_AND_SNAPSHOTS"]',
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[csi_driver])
+            )
+        else:
+            fsx_csi_role = service_account_role(providers, self, name, role_args, policy_arns={
+                f"{name}-policy": "arn:aws:iam::aws:policy/AmazonFSxFullAccess",
+            })
+
+            csi_driver = aws.eks.Addon(f"{name}-addon",
+                cluster_name=args["cluster_name"],
+                addon_name="aws-fsx-csi-driver",
+                addon_version=args.get("addon_version"),
+                service_account_role_arn=fsx_csi_role.addon_role_arn,
+                resolve_conflicts_on_create="OVERWRITE",
+                resolve_conflicts_on_update="PRESERVE",
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=[*node_dependencies, *fsx_csi_role.dependencies])
+            )
+
+            # The Lustre filesystem is provisioned by Pulumi, so it is bound statically. A volume binds to
+            # one claim, so there is no storage class: build pods share the cache by mounting claim_name.
+            capacity = pulumi.Output.from_input(args["storage_capacity"]).apply(lambda gib: f"{gib}Gi")
+
+            # The CI chart must not create it too (see helm_values_env's create_agent_namespace)
+            namespace = k8s.core.v1.Namespace(f"{name}-claim-namespace",
+                metadata={
+                    "name": args["claim_namespace"],
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s)
+            )
+
+            volume = k8s.core.v1.PersistentVolume(f"{name}-fsx-pv",
+                metadata={
+                    "name": args["storage_class_name"],
+                },
+                spec={
+                    "capacity": {
+                        "storage": capacity,
+                    },
+                    "volume_mode": "Filesystem",
+                    "access_modes": ["ReadWriteMany"],
+                    # Empty, so only the claim below can bind it
+                    "storage_class_name": "",
+                    "claim_ref": {
+                        "namespace": args["claim_namespace"],
+                        "name": args["storage_class_name"],
+                    },
+                    "persistent_volume_reclaim_policy": "Retain",
+                    "mount_options": ["flock"],
+                    "csi": {
+                        "driver": "fsx.csi.aws.com",
+                        "volume_handle": args["file_system_id"],
+                        "volume_attributes": {
+                            "dnsname": args["dns_name"],
+                            "mountname": args["mount_name"],
+                        },
+                    },
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[csi_driver])
+            )
+
+            claim = k8s.core.v1.PersistentVolumeClaim(f"{name}-fsx-pvc",
+                metadata={
+                    "name": args["storage_class_name"],
+                    "namespace": namespace.metadata.name,
+                },
+                spec={
+                    "access_modes": ["ReadWriteMany"],
+                    "storage_class_name": "",
+                    "volume_name": volume.metadata.name,
+                    "resources": {
+                        "requests": {
+                            "storage": capacity,
+                        },
+                    },
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s)
+            )
+
+        self.fsx_csi_role_arn = fsx_csi_role.arn
+        # OpenZFS provisions a volume per claim through the storage class; Lustre has the one shared claim
+        if args["file_system_type"] == "openzfs":
+            self.storage_class_name = args["storage_class_name"]
+            self.claim_name = None
+            self.claim_namespace = None
+        else:
+            self.storage_class_name = None
+            self.claim_name = claim.metadata.name
+            self.claim_namespace = claim.metadata.namespace
+
+        self.register_outputs({
+            "storage_class_name": self.storage_class_name,
+            "claim_name": self.claim_name,
+            "claim_namespace": self.claim_namespace,
+            "fsx_csi_role_arn": self.fsx_csi_role_arn,
+        })
@@ -1,7 +1,9 @@
+import base64
 import pulumi
+from modules.providers import Providers
 from modules.scheduling import Scheduling
 from pulumi import Input
-from typing import Optional, Dict, TypedDict, Any
+from typing import Optional, Dict, Sequence, TypedDict, Any
 import pulumi_aws as aws
 import pulumi_null as null
 import pulumiverse_time as time
@@ -10,6 +12,63 @@ import pulumiverse_time as time
 def not_implemented(msg):
     raise NotImplementedError(msg)
 
+# AMI families whose kubelet settings can be set from the launch template's user data, which managed
+# node groups merge with their own: nodeadm NodeConfig on AL2023, TOML settings on Bottlerocket
+NODE_CONFIG_AMI_PREFIXES = ["AL2023", "BOTTLEROCKET"]
+
+def validate_node_config_ami_type(ami_type: str) -> None:
+    if not any(ami_type.startswith(prefix) for prefix in NODE_CONFIG_AMI_PREFIXES):
+        raise ValueError(f"Node settings (the NodeLocal DNSCache address, IPVS kernel modules) need an AL2023 or "
+                         f"Bottlerocket AMI, {ami_type} is neither")
+
+def node_user_data(ami_type: str, cluster_dns_ip: Optional[str] = None, kernel_modules: Sequence[str] = ()) -> Optional[str]:
+    """
+    Base64 launch template user data with the kubelet settings and the kernel modules to load at boot,
+    or None if there is nothing to set.
+    """
+    if not cluster_dns_ip and not kernel_modules:
+        return None
+    validate_node_config_ami_type(ami_type)
+    if ami_type.startswith("BOTTLEROCKET"):
+        lines = []
+        if cluster_dns_ip:
+            lines += ["[settings.kubernetes]", f'cluster-dns-ip = "{cluster_dns_ip}"', ""]
+        for module in kernel_modules:
+            lines += [f"[settings.kernel.modules.{module}]", "allowed = true", "autoload = true", ""]
+        user_data = "\n".join(lines)
+    else:
+        lines = ["MIME-Version: 1.0", 'Content-Type: multipart/mixed; boundary="BOUNDARY"', ""]
+        if kernel_modules:
+            # Runs before nodeadm starts kubelet, so kube-proxy finds the modules when it starts
+            lines += [
+                "--BOUNDARY",
+                'Content-Type: text/x-shellscript; charset="us-ascii"',
+                "",
+                "#!/bin/bash",
+                "set -euo pipefail",
+                *[f"modprobe {module}" for module in kernel_modules],
+                f"printf '%s\\n' {' '.join(kernel_modules)} > /etc/modules-load.d/ipvs.conf",
+                "",
+            ]
+        if cluster_dns_ip:
+            lines += [
+                "--BOUNDARY",
+                "Content-Type: application/node.eks.aws",
+                "",
+                "---",
+                "apiVersion: node.eks.aws/v1alpha1",
+                "kind: NodeConfig",
+                "spec:",
+                "  kubelet:",
+                "    config:",
+                "      clusterDNS:",
+                f"      - {cluster_dns_ip}",
+                "",
+            ]
+        lines += ["--BOUNDARY--", ""]
+        user_data = "\n".join(lines)
+    return base64.b64encode(user_data.encode()).decode()
+
 class EksNodesEc2Args(TypedDict):
     cluster_name: Input[Any]
     private_subnet_ids: Input[Any]
@@ -24,9 +83,13 @@ class EksNodesEc2Args(TypedDict):
     vcpu_min: Input[Any]
     tags: Input[Any]
     asg_schedule: dict
+    # Pods resolve through this address instead of the kube-dns service, e.g. NodeLocal DNSCache's
+    cluster_dns_ip: str
+    # Loaded on boot, e.g. the IPVS modules kube-proxy needs in ipvs mode
+    kernel_modules: list
 
 class EksNodesEc2(pulumi.ComponentResource):
-    def __init__(self, provider: aws.Provider, stepparent: object, vpc_parent: object, name: str, args: EksNodesEc2Args, opts: Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, cluster_dependencies: Sequence[pulumi.Resource], network_dependencies: Sequence[pulumi.Resource], name: str, args: EksNodesEc2Args, opts: Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:EksNodesEc2", name, args, opts)
 
         asgs_created = False
@@ -47,6 +110,7 @@ class EksNodesEc2(pulumi.ComponentResource):
                 "http_put_response_hop_limit": 2,
                 "http_endpoint": "enabled",
             },
+            user_data=node_user_data(args["eks_nodegroup_ami_type"], args.get("cluster_dns_ip"), args.get("kernel_modules") or []),
             tag_specifications=[{
                 "resource_type": "instance",
                 "tags": {
@@ -54,7 +118,7 @@ class EksNodesEc2(pulumi.ComponentResource):
                     "Name": f"{args['cluster_name']}-node"
                 },
             }],
-            opts=pulumi.ResourceOptions(parent=self, provider=provider))
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         node = []
         for i in range(len(args["private_subnet_ids"])):
@@ -79,7 +143,8 @@ class EksNodesEc2(pulumi.ComponentResource):
                     f"k8s.io/cluster-autoscaler/{args['cluster_name']}": "owned",
                     f"k8s.io/cluster/{args['cluster_name']}": "owned",
                 },
-                opts=pulumi.ResourceOptions(parent=self, provider=provider, depends_on=[stepparent, vpc_parent]))
+                # Only the cluster, the node role's policies and the private routing - not the whole Eks/Vpc components
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=[*cluster_dependencies, *network_dependencies]))
             node.append(ng)
 
             # Tag the underlying ASG with all tags
@@ -94,14 +159,14 @@ class EksNodesEc2(pulumi.ComponentResource):
                         "value": val,
                         "propagate_at_launch": True,
                     },
-                    opts=pulumi.ResourceOptions(parent=ng, provider=provider),
+                    opts=pulumi.ResourceOptions(parent=ng, provider=providers.aws),
                 )
 
             # Apply schedules to the ASG if all required schedule keys are present
             asg_schedule = args["asg_schedule"]
             required_schedule_keys = ["weekday_config_down", "weekday_config_up", "weekend_config", "timezone"]
             if asg_schedule and all(k in asg_schedule for k in required_schedule_keys):
-                Scheduling(provider, f"scheduling-{i}", {
+                Scheduling(providers, f"scheduling-{i}", {
                     'autoscaling_group_name': ng.resources.apply(
                         lambda r: str(r[0].autoscaling_groups[0].name)
                         if r and r[0].autoscaling_groups else ""
@@ -111,7 +176,7 @@ class EksNodesEc2(pulumi.ComponentResource):
                     'weekday_config_up': asg_schedule["weekday_config_up"],
                     'weekend_config': asg_schedule["weekend_config"],
                     'timezone': asg_schedule["timezone"]},
-                    opts=pulumi.ResourceOptions(parent=ng, provider=provider)
+                    opts=pulumi.ResourceOptions(parent=ng, provider=providers.aws)
                 )
                 asgs_created = True
                 
@@ -133,6 +198,8 @@ class EksNodesEc2(pulumi.ComponentResource):
         self.eks_nodegroup_asgs = asg_names
         self.eks_nodegroup_arns = [__item.arn for __item in node]
         self.eks_nodegroup_ids = [__item.id for __item in node]
+        # What workloads (CSI drivers, controllers) need before their pods can be scheduled
+        self.node_groups = node
 
         self.register_outputs({
             'eks_nodegroup_arns': self.eks_nodegroup_arns, 
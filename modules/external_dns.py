@@ -0,0 +1,169 @@
+import json
+import pulumi
+from pulumi import Input
+from typing import Optional, Sequence, TypedDict
+import pulumi_aws as aws
+import pulumi_kubernetes as k8s
+from modules.chart_cache import ChartCache
+from modules.providers import Providers
+from modules.service_account_role import service_account_role
+
+EXTERNAL_DNS_CHART_NAME = "external-dns"
+EXTERNAL_DNS_CHART_REPO = "https://kubernetes-sigs.github.io/external-dns"
+EXTERNAL_DNS_POLICIES = ["upsert-only", "sync"]
+EXTERNAL_DNS_REGISTRIES = ["txt", "noop"]
+
+class ExternalDnsSettings(TypedDict, total=False):
+    policy: str
+    registry: str
+    txt_owner_id: str
+    txt_prefix: str
+    sources: list
+    # How often a full sync runs; changes to watched resources also trigger a sync right away
+    interval: str
+    # Route53 changes are sent in batches of up to this many records, at most once per batch_change_interval
+    batch_change_size: int
+    batch_change_interval: str
+
+DEFAULT_EXTERNAL_DNS_SETTINGS: ExternalDnsSettings = {
+    "policy": "upsert-only",
+    "registry": "txt",
+    "txt_prefix": "external-dns-",
+    "sources": ["ingress", "service"],
+    "interval": "1m",
+    "batch_change_size": 1000,
+    "batch_change_interval": "1s",
+}
+
+def validate_external_dns_settings(settings: ExternalDnsSettings) -> None:
+    unknown = [key for key in settings if key not in DEFAULT_EXTERNAL_DNS_SETTINGS and key != "txt_owner_id"]
+    if unknown:
+        raise ValueError(f"Unknown ExternalDNS settings: {unknown}")
+    settings = {**DEFAULT_EXTERNAL_DNS_SETTINGS, **settings}
+    if settings["policy"] not in EXTERNAL_DNS_POLICIES:
+        raise ValueError(f"ExternalDNS policy must be one of {EXTERNAL_DNS_POLICIES}, got {settings['policy']!r}")
+    if settings["registry"] not in EXTERNAL_DNS_REGISTRIES:
+        raise ValueError(f"ExternalDNS registry must be one of {EXTERNAL_DNS_REGISTRIES}, got {settings['registry']!r}")
+    if settings["policy"] == "sync" and settings["registry"] != "txt":
+        # Without ownership records, sync would delete records it didn't create
+        raise ValueError("ExternalDNS policy 'sync' requires the 'txt' registry")
+    if not isinstance(settings["batch_change_size"], int) or not 1 <= settings["batch_change_size"] <= 1000:
+        raise ValueError(f"ExternalDNS batch_change_size must be between 1 and 1000, got {settings['batch_change_size']!r}")
+    if not settings["sources"]:
+        raise ValueError("ExternalDNS needs at least one source")
+
+class ExternalDnsArgs(TypedDict, total=False):
+    cluster_name: Input[str]
+    # 'irsa' (default, uses the OIDC provider below) or 'pod-identity'
+    service_account_role_mode: str
+    oidc_provider_arn: Input[str]
+    oidc_provider_url: Input[str]
+    hosted_zone_id: Input[str]
+    zone_name: Input[str]
+    region: Input[str]
+    service_account_namespace: str
+    service_account_name: str
+    chart_version: str
+    chart_digest: str
+    chart_cache_dir: str
+    settings: ExternalDnsSettings
+
+class ExternalDns(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, node_dependencies: Sequence[pulumi.Resource], name: str, args: ExternalDnsArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:ExternalDns", name, args, opts)
+
+        validate_external_dns_settings(args.get("settings") or {})
+        settings = {**DEFAULT_EXTERNAL_DNS_SETTINGS, **(args.get("settings") or {})}
+        sa_namespace = args.get("service_account_namespace") or "kube-system"
+        sa_name = args.get("service_account_name") or "external-dns"
+
+        # Record changes are only allowed in the child zone
+        external_dns_policy = aws.iam.Policy(f"{name}-policy",
+            description="IAM policy for ExternalDNS",
+            policy=pulumi.Output.from_input(args["hosted_zone_id"]).apply(lambda zone_id: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Effect": "Allow",
+                        "Action": ["route53:ChangeResourceRecordSets"],
+                        "Resource": [f"arn:aws:route53:::hostedzone/{zone_id}"],
+                    },
+                    {
+                        "Effect": "Allow",
+                        "Action": [
+                            "route53:ListHostedZones",
+                            "route53:ListResourceRecordSets",
+                            "route53:ListTagsForResource",
+                        ],
+                        "Resource": ["*"],
+                    },
+                ],
+            })),
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.aws)
+        )
+        external_dns_role = service_account_role(providers, self, name, {
+            'mode': args.get("service_account_role_mode"),
+            'cluster_name': args["cluster_name"],
+            'namespace': sa_namespace,
+            'service_account': sa_name,
+            'oidc_provider_arn': args.get("oidc_provider_arn"),
+            'oidc_provider_url': args.get("oidc_provider_url"),
+        }, policy_arns={
+            f"{name}-policy-attachment": external_dns_policy.arn,
+        })
+
+        external_dns_sa = k8s.core.v1.ServiceAccount(f"{name}-sa",
+            metadata=k8s.meta.v1.ObjectMetaArgs(
+                name=sa_name,
+                namespace=sa_namespace,
+                annotations=external_dns_role.annotations,
+            ),
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[*node_dependencies, *external_dns_role.dependencies])
+        )
+
+        chart_path = ChartCache(args.get("chart_cache_dir") or "charts").get(
+            EXTERNAL_DNS_CHART_NAME, args["chart_version"], EXTERNAL_DNS_CHART_REPO, digest=args.get("chart_digest"),
+        )
+
+        k8s.helm.v4.Chart(f"{name}-chart",
+            chart=chart_path,
+            namespace=sa_namespace,
+            values={
+                "provider": {
+                    "name": "aws",
+                },
+                "env": [{
+                    "name": "AWS_DEFAULT_REGION",
+                    "value": args["region"],
+                }],
+                "serviceAccount": {
+                    "create": False,  # We created it above
+                    "name": sa_name,
+                },
+                "sources": settings["sources"],
+                "policy": settings["policy"],
+                "registry": settings["registry"],
+                "txtOwnerId": settings.get("txt_owner_id") or args["cluster_name"],
+                "txtPrefix": settings["txt_prefix"],
+                "domainFilters": [args["zone_name"]],
+                "interval": settings["interval"],
+                # React to ingress/service events instead of waiting for the next interval
+                "triggerLoopOnEvent": True,
+                "extraArgs": [
+                    pulumi.Output.from_input(args["hosted_zone_id"]).apply(lambda zone_id: f"--zone-id-filter={zone_id}"),
+                    "--aws-zone-type=public",
+                    f"--aws-batch-change-size={settings['batch_change_size']}",
+                    f"--aws-batch-change-interval={settings['batch_change_interval']}",
+                    "--aws-zones-cache-duration=1h",
+                ],
+            },
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[external_dns_sa])
+        )
+
+        self.external_dns_role_arn = external_dns_role.arn
+        self.policy = settings["policy"]
+
+        self.register_outputs({
+            "external_dns_role_arn": self.external_dns_role_arn,
+            "policy": self.policy,
+        })
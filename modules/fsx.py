@@ -0,0 +1,163 @@
+import pulumi
+from pulumi import Input
+from typing import Optional, TypedDict, Any
+import pulumi_aws as aws
+from modules.providers import Providers
+
+FSX_TYPES = ["openzfs", "lustre"]
+
+# Valid throughput capacity (MB/s) per OpenZFS deployment type
+FSX_OPENZFS_THROUGHPUT = {
+    "SINGLE_AZ_1": [64, 128, 256, 512, 1024, 2048, 3072, 4096],
+    "SINGLE_AZ_2": [160, 320, 640, 1280, 2560, 3840, 5120, 7680, 10240],
+    "SINGLE_AZ_HA_1": [128, 256, 512, 1024, 2048, 3072, 4096],
+    "SINGLE_AZ_HA_2": [320, 640, 1280, 2560, 3840, 5120, 7680, 10240],
+    "MULTI_AZ_1": [160, 320, 640, 1280, 2560, 3840, 5120, 7680, 10240],
+}
+
+# Valid per-unit storage throughput (MB/s/TiB) per Lustre deployment type. Scratch has none.
+FSX_LUSTRE_THROUGHPUT = {
+    "SCRATCH_1": [],
+    "SCRATCH_2": [],
+    "PERSISTENT_1": [50, 100, 200],
+    "PERSISTENT_2": [125, 250, 500, 1000],
+}
+
+class FsxArgs(TypedDict, total=False):
+    resource_prefix: Input[Any]
+    file_system_type: str
+    deployment_type: str
+    throughput_capacity: int
+    storage_capacity: int
+    data_compression_type: str
+    private_subnet_ids: Input[Any]
+    # Only used by OpenZFS MULTI_AZ_1, so FSx can route to the active file server
+    route_table_ids: Input[Any]
+    vpc_id: Input[Any]
+    vpc_cidr: Input[Any]
+
+def validate_fsx_args(args: FsxArgs) -> None:
+    fs_type = args.get("file_system_type") or "openzfs"
+    deployment_type = args.get("deployment_type")
+    throughput = args.get("throughput_capacity")
+    storage_capacity = args.get("storage_capacity")
+
+    if fs_type not in FSX_TYPES:
+        raise ValueError(f"FSx file_system_type '{fs_type}' is invalid. Use one of: {FSX_TYPES}")
+
+    if fs_type == "openzfs":
+        deployment_type = deployment_type or "SINGLE_AZ_2"
+        if deployment_type not in FSX_OPENZFS_THROUGHPUT:
+            raise ValueError(f"FSx OpenZFS deployment_type '{deployment_type}' is invalid. Use one of: {list(FSX_OPENZFS_THROUGHPUT)}")
+        if throughput not in FSX_OPENZFS_THROUGHPUT[deployment_type]:
+            raise ValueError(f"FSx OpenZFS {deployment_type} throughput_capacity must be one of {FSX_OPENZFS_THROUGHPUT[deployment_type]}, got {throughput}")
+        if storage_capacity is not None and not 64 <= storage_capacity <= 524288:
+            raise ValueError(f"FSx OpenZFS storage_capacity must be between 64 and 524288 GiB, got {storage_capacity}")
+        if deployment_type == "MULTI_AZ_1" and len(args["private_subnet_ids"]) < 2:
+            raise ValueError("FSx OpenZFS MULTI_AZ_1 needs at least 2 private subnets")
+    else:
+        deployment_type = deployment_type or "PERSISTENT_2"
+        if deployment_type not in FSX_LUSTRE_THROUGHPUT:
+            raise ValueError(f"FSx Lustre deployment_type '{deployment_type}' is invalid. Use one of: {list(FSX_LUSTRE_THROUGHPUT)}")
+        if FSX_LUSTRE_THROUGHPUT[deployment_type] and throughput not in FSX_LUSTRE_THROUGHPUT[deployment_type]:
+            raise ValueError(f"FSx Lustre {deployment_type} throughput_capacity must be one of {FSX_LUSTRE_THROUGHPUT[deployment_type]}, got {throughput}")
+        if not FSX_LUSTRE_THROUGHPUT[deployment_type] and throughput:
+            raise ValueError(f"FSx Lustre {deployment_type} does not take a throughput_capacity")
+        if storage_capacity is not None and storage_capacity != 1200 and storage_capacity % 2400 != 0:
+            raise ValueError(f"FSx Lustre storage_capacity must be 1200 or a multiple of 2400 GiB, got {storage_capacity}")
+
+class Fsx(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, name: str, args: FsxArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:Fsx", name, args, opts)
+
+        validate_fsx_args(args)
+
+        fs_type = args.get("file_system_type") or "openzfs"
+
+        fsx_sg = aws.ec2.SecurityGroup(f"{name}-fsx_sg",
+            name=f"{args['resource_prefix']}_fsx_sg",
+            description="Cluster communication with the FSx build cache",
+            vpc_id=args["vpc_id"],
+            ingress=[{
+                "protocol": "-1",
+                "from_port": 0,
+                "to_port": 0,
+                "cidr_blocks": [args["vpc_cidr"]],
+            }],
+            egress=[{
+                "from_port": 0,
+                "to_port": 0,
+                "protocol": "-1",
+                "cidr_blocks": ["0.0.0.0/0"],
+            }],
+            tags={
+                "Name": f"{args['resource_prefix']}_fsx_sg",
+            },
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
+
+        if fs_type == "openzfs":
+            deployment_type = args.get("deployment_type") or "SINGLE_AZ_2"
+            multi_az = deployment_type == "MULTI_AZ_1"
+
+            main = aws.fsx.OpenZfsFileSystem(f"{name}-main",
+                deployment_type=deployment_type,
+                throughput_capacity=args["throughput_capacity"],
+                storage_capacity=args.get("storage_capacity") or 64,
+                storage_type="SSD",
+                subnet_ids=args["private_subnet_ids"][:2] if multi_az else [args["private_subnet_ids"][0]],
+                preferred_subnet_id=args["private_subnet_ids"][0] if multi_az else None,
+                route_table_ids=args.get("route_table_ids") if multi_az else None,
+                security_group_ids=[fsx_sg.id],
+                skip_final_backup=True,
+                delete_options=["DELETE_CHILD_VOLUMES_AND_SNAPSHOTS"],
+                root_volume_configuration={
+                    "data_compression_type": args.get("data_compression_type") or "LZ4",
+                    "nfs_exports": {
+                        "client_configurations": [{
+                            "clients": args["vpc_cidr"],
+                            "options": ["rw", "crossmnt", "no_root_squash"],
+                        }],
+                    },
+                },
+                tags={
+                    "Name": f"{args['resource_prefix']}-build-cache",
+                },
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
+
+            self.root_volume_id = main.root_volume_id
+            self.mount_name = None
+        else:
+            deployment_type = args.get("deployment_type") or "PERSISTENT_2"
+
+            main = aws.fsx.LustreFileSystem(f"{name}-main",
+                deployment_type=deployment_type,
+                per_unit_storage_throughput=args.get("throughput_capacity") or None,
+                storage_capacity=args.get("storage_capacity") or 1200,
+                storage_type="SSD",
+                data_compression_type=args.get("data_compression_type") or "LZ4",
+                subnet_ids=args["private_subnet_ids"][0],
+                security_group_ids=[fsx_sg.id],
+                skip_final_backup=True,
+                tags={
+                    "Name": f"{args['resource_prefix']}-build-cache",
+                },
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
+
+            self.root_volume_id = None
+            self.mount_name = main.mount_name
+
+        self.file_system_type = fs_type
+        self.deployment_type = deployment_type
+        self.file_system_id = main.id
+        self.dns_name = main.dns_name
+        self.storage_capacity = main.storage_capacity
+
+        self.register_outputs({
+            'file_system_type': self.file_system_type,
+            'deployment_type': self.deployment_type,
+            'file_system_id': self.file_system_id,
+            'dns_name': self.dns_name,
+            'storage_capacity': self.storage_capacity,
+            'root_volume_id': self.root_volume_id,
+            'mount_name': self.mount_name,
+        })
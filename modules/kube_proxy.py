@@ -0,0 +1,79 @@
+import json
+import pulumi
+from pulumi import Input
+from typing import List, Optional, Sequence, TypedDict
+import pulumi_aws as aws
+from modules.providers import Providers
+
+KUBE_PROXY_MODES = ["iptables", "ipvs"]
+# Schedulers kube-proxy's ipvs mode accepts, each backed by the ip_vs_<scheduler> kernel module
+IPVS_SCHEDULERS = ["rr", "wrr", "lc", "wlc", "lblc", "lblcr", "sh", "dh", "sed", "nq"]
+
+class KubeProxySettings(TypedDict, total=False):
+    # ipvs looks services up in a hash table; iptables walks a rule chain that grows with every endpoint
+    mode: str
+    ipvs_scheduler: str
+
+DEFAULT_KUBE_PROXY_SETTINGS: KubeProxySettings = {
+    "mode": "ipvs",
+    "ipvs_scheduler": "rr",
+}
+
+def validate_kube_proxy_settings(settings: KubeProxySettings) -> None:
+    unknown = [key for key in settings if key not in DEFAULT_KUBE_PROXY_SETTINGS]
+    if unknown:
+        raise ValueError(f"Unknown kube-proxy settings: {unknown}")
+    settings = {**DEFAULT_KUBE_PROXY_SETTINGS, **settings}
+    if settings["mode"] not in KUBE_PROXY_MODES:
+        raise ValueError(f"kube-proxy mode must be one of {KUBE_PROXY_MODES}, got {settings['mode']!r}")
+    if settings["ipvs_scheduler"] not in IPVS_SCHEDULERS:
+        raise ValueError(f"kube-proxy ipvs_scheduler must be one of {IPVS_SCHEDULERS}, got {settings['ipvs_scheduler']!r}")
+
+def ipvs_kernel_modules(settings: KubeProxySettings) -> List[str]:
+    """The kernel modules the nodes load on boot for these settings; none in iptables mode."""
+    settings = {**DEFAULT_KUBE_PROXY_SETTINGS, **settings}
+    if settings["mode"] != "ipvs":
+        return []
+    return ["ip_vs", f"ip_vs_{settings['ipvs_scheduler']}", "nf_conntrack"]
+
+def kube_proxy_configuration_values(settings: KubeProxySettings) -> str:
+    """configuration_values of the kube-proxy addon, with unset settings taken from DEFAULT_KUBE_PROXY_SETTINGS."""
+    settings = {**DEFAULT_KUBE_PROXY_SETTINGS, **settings}
+    values = {"mode": settings["mode"]}
+    if settings["mode"] == "ipvs":
+        values["ipvs"] = {"scheduler": settings["ipvs_scheduler"]}
+    return json.dumps(values, sort_keys=True)
+
+class KubeProxyAddonArgs(TypedDict, total=False):
+    cluster_name: Input[str]
+    addon_version: Input[str]
+    settings: KubeProxySettings
+
+class KubeProxyAddon(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, node_dependencies: Sequence[pulumi.Resource], name: str, args: KubeProxyAddonArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:KubeProxyAddon", name, args, opts)
+
+        validate_kube_proxy_settings(args.get("settings") or {})
+        settings = {**DEFAULT_KUBE_PROXY_SETTINGS, **(args.get("settings") or {})}
+
+        # Adopts the kube-proxy DaemonSet EKS created with the cluster. In ipvs mode the nodes must load the
+        # IPVS modules on boot (EksNodesEc2's kernel_modules).
+        kube_proxy_addon = aws.eks.Addon(f"{name}-addon",
+            cluster_name=args["cluster_name"],
+            addon_name="kube-proxy",
+            addon_version=args.get("addon_version"),
+            configuration_values=kube_proxy_configuration_values(settings),
+            resolve_conflicts_on_create="OVERWRITE",
+            resolve_conflicts_on_update="OVERWRITE",
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=node_dependencies)
+        )
+
+        self.addon = kube_proxy_addon
+        self.mode = settings["mode"]
+        self.ipvs_scheduler = settings["ipvs_scheduler"] if settings["mode"] == "ipvs" else None
+
+        self.register_outputs({
+            "kube_proxy_addon_name": kube_proxy_addon.addon_name,
+            "mode": self.mode,
+            "ipvs_scheduler": self.ipvs_scheduler,
+        })
@@ -1,85 +1,146 @@
-import json
 import pulumi
 import base64
 from pulumi import Input
-from typing import Optional, TypedDict
+from typing import Dict, Optional, Sequence, TypedDict
 import pulumi_aws as aws
 import pulumi_kubernetes as k8s
 import pulumi_tls as tls
+from modules.chart_cache import ChartCache
+from modules.providers import Providers
+from modules.service_account_role import service_account_role
 
+ALB_CHART_NAME = "aws-load-balancer-controller"
+ALB_CHART_REPO = "https://aws.github.io/eks-charts"
+
+class AlbControllerProfile(TypedDict, total=False):
+    replicas: int
+    feature_gates: Dict[str, bool]
+    aws_max_retries: int
+    targetgroupbinding_max_concurrent_reconciles: int
+    ingress_max_concurrent_reconciles: int
+    pod_readiness_gate_inject: bool
+    default_target_type: str
+
+DEFAULT_ALB_CONTROLLER_PROFILE: AlbControllerProfile = {
+    "replicas": 2,
+    "feature_gates": {},
+    "aws_max_retries": 10,
+    "targetgroupbinding_max_concurrent_reconciles": 3,
+    "ingress_max_concurrent_reconciles": 3,
+    "pod_readiness_gate_inject": True,
+    "default_target_type": "ip",
+}
+
+def validate_alb_controller_profile(profile: AlbControllerProfile) -> None:
+    unknown = [key for key in profile if key not in DEFAULT_ALB_CONTROLLER_PROFILE]
+    if unknown:
+        raise ValueError(f"Unknown ALB controller profile settings: {unknown}")
+
+    ranges = {
+        "replicas": (1, 10),
+        "aws_max_retries": (0, 50),
+        "targetgroupbinding_max_concurrent_reconciles": (1, 100),
+        "ingress_max_concurrent_reconciles": (1, 100),
+    }
+    for key, (low, high) in ranges.items():
+        if key in profile and (not isinstance(profile[key], int) or isinstance(profile[key], bool) or not low <= profile[key] <= high):
+            raise ValueError(f"ALB controller profile '{key}' must be an integer between {low} and {high}, got {profile[key]!r}")
+
+    if profile.get("default_target_type", "ip") not in ["ip", "instance"]:
+        raise ValueError(f"ALB controller profile 'default_target_type' must be 'ip' or 'instance', got {profile['default_target_type']!r}")
+    if not isinstance(profile.get("pod_readiness_gate_inject", True), bool):
+        raise ValueError("ALB controller profile 'pod_readiness_gate_inject' must be a boolean")
+    for gate, enabled in (profile.get("feature_gates") or {}).items():
+        if not isinstance(enabled, bool):
+            raise ValueError(f"ALB controller feature gate '{gate}' must be a boolean, got {enabled!r}")
+
+def alb_controller_profile_values(profile: AlbControllerProfile) -> dict:
+    """Chart values for a profile, with unset settings taken from DEFAULT_ALB_CONTROLLER_PROFILE."""
+    profile = {**DEFAULT_ALB_CONTROLLER_PROFILE, **profile}
+    return {
+        "replicaCount": profile["replicas"],
+        "controllerConfig": {
+            "featureGates": profile["feature_gates"],
+        },
+        "awsMaxRetries": profile["aws_max_retries"],
+        "targetgroupbindingMaxConcurrentReconciles": profile["targetgroupbinding_max_concurrent_reconciles"],
+        "ingressMaxConcurrentReconciles": profile["ingress_max_concurrent_reconciles"],
+        # Injection only happens in namespaces labelled elbv2.k8s.aws/pod-readiness-gate-inject=enabled
+        "enablePodReadinessGateInject": profile["pod_readiness_gate_inject"],
+        # ip targets route straight to pod IPs instead of hopping through a NodePort
+        "defaultTargetType": profile["default_target_type"],
+    }
 
 class LBArgs(TypedDict, total=False):
     resource_prefix: Input[str]
+    # 'irsa' (default, uses the OIDC provider below) or 'pod-identity'
+    service_account_role_mode: str
     oidc_provider_arn: Input[str]
     oidc_provider_url: Input[str]
     cluster_name: Input[str]
     lb_service_account_namespace: Input[str]
     lb_service_account_name: Input[str]
+    chart_version: str
+    chart_digest: str
+    chart_cache_dir: str
+    controller_profile: AlbControllerProfile
+    # Key algorithm, validity and renewal window for the webhook certs, see TlsArgs
+    webhook_tls: dict
 
 class LoadBalancer(pulumi.ComponentResource):
-    def __init__(self, k8s_provider: k8s.Provider, stepparent: object, name: str, args: LBArgs, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, cluster_dependencies: Sequence[pulumi.Resource], name: str, args: LBArgs, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:LoadBalancer", name, args, opts)
 
-        # 1. IAM role with OIDC trust policy
-        lb_controller_role = aws.iam.Role(f"{name}-role",
-            assume_role_policy=pulumi.Output.all(args["oidc_provider_arn"], args["oidc_provider_url"]).apply(
-                lambda _args: json.dumps({
-                    "Version": "2012-10-17",
-                    "Statement": [{
-                        "Effect": "Allow",
-                        "Principal": {"Federated": _args[0]},
-                        "Action": "sts:AssumeRoleWithWebIdentity",
-                        "Condition": {
-                            "StringEquals": {
-                                f"{_args[1]}:sub": "system:serviceaccount:kube-system:aws-load-balancer-controller",
-                                f"{_args[1]}:aud": "sts.amazonaws.com",
-                            }
-                        },
-                    }],
-                })
-            ),
-            opts=pulumi.ResourceOptions(parent=self)
-        )
+        validate_alb_controller_profile(args.get("controller_profile") or {})
+        validate_tls_settings(args.get("webhook_tls") or {})
 
+        # 1. IAM policy, and the controller's role (IRSA or Pod Identity) with it attached
         with open("support/iam_policy.json") as f:
             lb_policy_json = f.read()
 
         alb_policy = aws.iam.Policy(f"{name}-alb-policy",
             description="IAM policy for AWS Load Balancer Controller",
             policy=lb_policy_json,
-            opts=pulumi.ResourceOptions(parent=self)
-        )
-        aws.iam.RolePolicyAttachment(f"{name}-alb-policy-attachment",
-            role=lb_controller_role.name,
-            policy_arn=alb_policy.arn,
-            opts=pulumi.ResourceOptions(parent=self)
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
+        lb_controller_role = service_account_role(providers, self, name, {
+            'mode': args.get("service_account_role_mode"),
+            'cluster_name': args["cluster_name"],
+            'namespace': args['lb_service_account_namespace'],
+            'service_account': args['lb_service_account_name'],
+            'oidc_provider_arn': args.get("oidc_provider_arn"),
+            'oidc_provider_url': args.get("oidc_provider_url"),
+        }, policy_arns={
+            f"{name}-alb-policy-attachment": alb_policy.arn,
+        })
 
-        # 3. Kubernetes service account annotated with the role ARN
+        # 2. Kubernetes service account, annotated with the role ARN for IRSA
         lb_sa = k8s.core.v1.ServiceAccount(f"{name}-sa",
             metadata=k8s.meta.v1.ObjectMetaArgs(
                 name=args['lb_service_account_name'],
                 namespace=args['lb_service_account_namespace'],
-                annotations={
-                    "eks.amazonaws.com/role-arn": lb_controller_role.arn,
-                },
+                annotations=lb_controller_role.annotations,
             ),
-            opts=pulumi.ResourceOptions(parent=self, provider=k8s_provider, depends_on=[stepparent])
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[*cluster_dependencies, *lb_controller_role.dependencies])
         )
 
         # If we allow the chart to create the TLS certs, they will be regenerated on every update, 
         # causing unnecessary LB controller restarts.
-        local_tls = Tls(k8s_provider, stepparent, f"{name}-tls", {
+        local_tls = Tls(providers, cluster_dependencies, f"{name}-tls", {
+            **(args.get("webhook_tls") or {}),
             "sa_namespace": args['lb_service_account_namespace'],
         })
 
+        # Render from the pinned, digest-checked local archive; the repo is only hit on a cache miss.
+        chart_path = ChartCache(args.get("chart_cache_dir") or "charts").get(
+            ALB_CHART_NAME, args["chart_version"], ALB_CHART_REPO, digest=args.get("chart_digest"),
+        )
+
         alb_controller = k8s.helm.v4.Chart(f"{name}-chart",
-            chart="aws-load-balancer-controller",
-            repository_opts=k8s.helm.v4.RepositoryOptsArgs(
-                repo="https://aws.github.io/eks-charts",
-            ),
+            chart=chart_path,
             namespace=args['lb_service_account_namespace'],
             values={
+                **alb_controller_profile_values(args.get("controller_profile") or {}),
                 "clusterName": args["cluster_name"],
                 "serviceAccount": {
                     "create": False,  # We created it above
@@ -96,52 +157,102 @@ class LoadBalancer(pulumi.ComponentResource):
                     },
                 },
             },
-            opts=pulumi.ResourceOptions(parent=self, provider=k8s_provider, depends_on=[lb_sa, local_tls])
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=[lb_sa, local_tls.secret])
         )
 
+        self.chart = alb_controller
         self.lb_controller_role_arn = lb_controller_role.arn
         self.service_account_name = args['lb_service_account_name']
+        self.webhook_tls = {
+            "key_algorithm": local_tls.key_algorithm,
+            "ca_cert_fingerprint": local_tls.ca_cert_fingerprint,
+            "ca_cert_expiry": local_tls.ca_cert_expiry,
+            "server_cert_fingerprint": local_tls.server_cert_fingerprint,
+            "server_cert_expiry": local_tls.server_cert_expiry,
+        }
 
         self.register_outputs({
             "lb_controller_role_arn": self.lb_controller_role_arn,
             "service_account_name": self.service_account_name,
+            "webhook_tls": self.webhook_tls,
         })
 
+TLS_KEY_ALGORITHMS = ["ECDSA", "RSA"]
+TLS_ECDSA_CURVES = ["P256", "P384"]
+
 class TlsArgs(TypedDict, total=False):
     sa_namespace: Input[str]
+    key_algorithm: str
+    ecdsa_curve: str
+    rsa_bits: int
+    ca_validity_hours: int
+    server_validity_hours: int
+    # The server cert is re-issued on the first update inside this window before it expires
+    server_early_renewal_hours: int
+
+DEFAULT_TLS_SETTINGS: TlsArgs = {
+    "key_algorithm": "ECDSA",
+    "ecdsa_curve": "P256",
+    "rsa_bits": 2048,
+    "ca_validity_hours": 87600,  # 10 years
+    "server_validity_hours": 8760,  # 1 year
+    "server_early_renewal_hours": 720,  # 30 days
+}
+
+def validate_tls_settings(settings: TlsArgs) -> None:
+    settings = {**DEFAULT_TLS_SETTINGS, **settings}
+    if settings["key_algorithm"] not in TLS_KEY_ALGORITHMS:
+        raise ValueError(f"Webhook TLS key_algorithm must be one of {TLS_KEY_ALGORITHMS}, got {settings['key_algorithm']!r}")
+    if settings["ecdsa_curve"] not in TLS_ECDSA_CURVES:
+        raise ValueError(f"Webhook TLS ecdsa_curve must be one of {TLS_ECDSA_CURVES}, got {settings['ecdsa_curve']!r}")
+    if settings["rsa_bits"] not in [2048, 3072, 4096]:
+        raise ValueError(f"Webhook TLS rsa_bits must be 2048, 3072 or 4096, got {settings['rsa_bits']!r}")
+    if not 0 <= settings["server_early_renewal_hours"] < settings["server_validity_hours"]:
+        raise ValueError("Webhook TLS server_early_renewal_hours must be shorter than server_validity_hours")
+    if settings["server_validity_hours"] > settings["ca_validity_hours"]:
+        raise ValueError("Webhook TLS server_validity_hours can't outlive ca_validity_hours")
 
 class Tls(pulumi.ComponentResource):
-    def __init__(self, k8s_provider: k8s.Provider, stepparent: object, name: str, args: TlsArgs, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, cluster_dependencies: Sequence[pulumi.Resource], name: str, args: TlsArgs, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:Tls", name, args, opts)
 
+        validate_tls_settings(args)
+        settings = {**DEFAULT_TLS_SETTINGS, **args}
+
+        # ECDSA keys make the TLS handshake on every admission webhook call cheaper than RSA
+        key_args = {"algorithm": settings["key_algorithm"]}
+        if settings["key_algorithm"] == "ECDSA":
+            key_args["ecdsa_curve"] = settings["ecdsa_curve"]
+        else:
+            key_args["rsa_bits"] = settings["rsa_bits"]
+        # key_encipherment only applies to RSA key exchange
+        key_uses = ["key_encipherment", "digital_signature"] if settings["key_algorithm"] == "RSA" else ["digital_signature"]
+
         # Create a stable private key for the CA (stored in state, never regenerated)
         ca_key = tls.PrivateKey(f"{name}-ca-key",
-            algorithm="RSA",
-            rsa_bits=2048,
-            opts=pulumi.ResourceOptions(parent=self)
+            **key_args,
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.tls)
         )
 
         # Create a stable private key for the server cert
         server_key = tls.PrivateKey(f"{name}-server-key",
-            algorithm="RSA",
-            rsa_bits=2048,
-            opts=pulumi.ResourceOptions(parent=self)
+            **key_args,
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.tls)
         )
 
         # Create a self-signed CA certificate
         ca_cert = tls.SelfSignedCert(f"{name}-ca-cert",
             private_key_pem=ca_key.private_key_pem,
             is_ca_certificate=True,
-            validity_period_hours=87600,  # 10 years
+            validity_period_hours=settings["ca_validity_hours"],
             allowed_uses=[
                 "cert_signing",
-                "key_encipherment",
-                "digital_signature",
+                *key_uses,
             ],
             subject=tls.SelfSignedCertSubjectArgs(
                 common_name="aws-load-balancer-controller-ca",
             ),
-            opts=pulumi.ResourceOptions(parent=self)
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.tls)
         )
 
         # Create a CSR for the server cert
@@ -155,21 +266,22 @@ class Tls(pulumi.ComponentResource):
                 f"aws-load-balancer-webhook-service.{args['sa_namespace']}",
                 f"aws-load-balancer-webhook-service.{args['sa_namespace']}.svc",
             ],
-            opts=pulumi.ResourceOptions(parent=self)
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.tls)
         )
 
-        # Sign the server cert with the CA
+        # Sign the server cert with the CA. Inside the renewal window the cert is replaced on the next
+        # update; the CA (and so the caBundle in the webhook config) stays the same.
         server_cert = tls.LocallySignedCert(f"{name}-server-cert",
             cert_request_pem=server_csr.cert_request_pem,
             ca_private_key_pem=ca_key.private_key_pem,
             ca_cert_pem=ca_cert.cert_pem,
-            validity_period_hours=87600,  # 10 years
+            validity_period_hours=settings["server_validity_hours"],
+            early_renewal_hours=settings["server_early_renewal_hours"],
             allowed_uses=[
-                "key_encipherment",
-                "digital_signature",
+                *key_uses,
                 "server_auth",
             ],
-            opts=pulumi.ResourceOptions(parent=self)
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.tls)
         )
 
         self.secret_name = "aws-load-balancer-tls-ci"
@@ -191,7 +303,7 @@ class Tls(pulumi.ComponentResource):
                 "tls.key": server_key.private_key_pem,
                 "ca.crt": ca_cert.cert_pem,
             },
-            opts=pulumi.ResourceOptions(parent=self, depends_on=[stepparent], provider=k8s_provider, transformations=[skip_tls_secret])
+            opts=pulumi.ResourceOptions(parent=self, depends_on=cluster_dependencies, provider=providers.k8s, transformations=[skip_tls_secret])
         )
 
         # Pass the CA bundle to the Helm chart so webhooks use it
@@ -199,9 +311,20 @@ class Tls(pulumi.ComponentResource):
             lambda pem: base64.b64encode(pem.encode()).decode()
         )
 
+        self.secret = tls_secret
         self.ca_bundle = ca_bundle
+        self.key_algorithm = settings["key_algorithm"]
+        self.ca_cert_fingerprint = tls.get_certificate_output(content=ca_cert.cert_pem, opts=pulumi.InvokeOptions(provider=providers.tls)).certificates[0].sha1_fingerprint
+        self.server_cert_fingerprint = tls.get_certificate_output(content=server_cert.cert_pem, opts=pulumi.InvokeOptions(provider=providers.tls)).certificates[0].sha1_fingerprint
+        self.ca_cert_expiry = ca_cert.validity_end_time
+        self.server_cert_expiry = server_cert.validity_end_time
 
         self.register_outputs({
             "ca_bundle": self.ca_bundle,
             "secret_name": self.secret_name,
+            "key_algorithm": self.key_algorithm,
+            "ca_cert_fingerprint": self.ca_cert_fingerprint,
+            "server_cert_fingerprint": self.server_cert_fingerprint,
+            "ca_cert_expiry": self.ca_cert_expiry,
+            "server_cert_expiry": self.server_cert_expiry,
         })
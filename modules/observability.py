@@ -0,0 +1,154 @@
+import json
+import pulumi
+from pulumi import Input
+from typing import Optional, Sequence, TypedDict
+import pulumi_aws as aws
+import pulumi_kubernetes as k8s
+from modules.chart_cache import ChartCache
+from modules.providers import Providers
+from modules.service_account_role import service_account_role
+
+METRICS_SERVER_CHART_NAME = "metrics-server"
+METRICS_SERVER_CHART_REPO = "https://kubernetes-sigs.github.io/metrics-server"
+CLOUDWATCH_OBSERVABILITY_ADDON = "amazon-cloudwatch-observability"
+
+# EKS publishes the API server's latency per verb to the AWS/EKS namespace, no agent needed
+API_SERVER_VERBS = ["GET", "LIST", "POST", "PUT", "PATCH", "DELETE"]
+
+def _metrics(namespace: str, cluster_name: str, metric_names: Sequence[str]) -> list:
+    return [[namespace, metric, "ClusterName", cluster_name] for metric in metric_names]
+
+def _widget(title: str, region: str, metrics: list, x: int, y: int, stat: str = "Average") -> dict:
+    return {
+        "type": "metric",
+        "x": x,
+        "y": y,
+        "width": 12,
+        "height": 6,
+        "properties": {
+            "title": title,
+            "region": region,
+            "metrics": metrics,
+            "stat": stat,
+            "period": 60,
+            "view": "timeSeries",
+        },
+    }
+
+def dashboard_body(cluster_name: str, region: str, container_insights: bool) -> str:
+    """
+    API server latency, request load and scheduling from the EKS control plane metrics, and with Container
+    Insights (the CloudWatch Observability addon) node and pod utilization.
+    """
+    widgets = [
+        _widget("API server request latency p99 (s)", region,
+            _metrics("AWS/EKS", cluster_name, [f"apiserver_request_duration_seconds_{verb}_P99" for verb in API_SERVER_VERBS]), 0, 0),
+        _widget("API server requests", region,
+            _metrics("AWS/EKS", cluster_name, [
+                "apiserver_request_total", "apiserver_request_total_4XX", "apiserver_request_total_5XX",
+                "apiserver_request_total_429", "apiserver_current_inflight_requests_MUTATING",
+                "apiserver_current_inflight_requests_READONLY",
+            ]), 12, 0, stat="Sum"),
+        _widget("Scheduling", region,
+            _metrics("AWS/EKS", cluster_name, [
+                "scheduler_pending_pods", "scheduler_schedule_attempts_SCHEDULED",
+                "scheduler_schedule_attempts_UNSCHEDULABLE", "scheduler_schedule_attempts_ERROR",
+            ]), 0, 6),
+    ]
+    if container_insights:
+        widgets += [
+            _widget("Nodes", region,
+                _metrics("ContainerInsights", cluster_name, [
+                    "node_cpu_utilization", "node_memory_utilization", "cluster_node_count", "cluster_failed_node_count",
+                ]), 12, 6),
+            _widget("Pods", region,
+                _metrics("ContainerInsights", cluster_name, [
+                    "pod_cpu_utilization", "pod_memory_utilization", "node_number_of_running_pods",
+                ]), 0, 12),
+        ]
+    return json.dumps({"widgets": widgets})
+
+class ObservabilityArgs(TypedDict, total=False):
+    cluster_name: Input[str]
+    region: Input[str]
+    # metrics-server, for HPAs and `kubectl top`
+    metrics_server: bool
+    chart_version: str
+    chart_digest: str
+    chart_cache_dir: str
+    # CloudWatch agent and Container Insights, through the EKS addon
+    cloudwatch_observability: bool
+    cloudwatch_addon_version: Input[str]
+    # Ship container logs with Fluent Bit too; build logs make this expensive, so it is off by default
+    container_logs: bool
+    service_account_role_mode: str
+    oidc_provider_arn: Input[str]
+    oidc_provider_url: Input[str]
+    dashboard: bool
+
+class Observability(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, node_dependencies: Sequence[pulumi.Resource], name: str, args: ObservabilityArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:Observability", name, args, opts)
+
+        if args.get("metrics_server"):
+            chart_path = ChartCache(args.get("chart_cache_dir") or "charts").get(
+                METRICS_SERVER_CHART_NAME, args["chart_version"], METRICS_SERVER_CHART_REPO, digest=args.get("chart_digest"),
+            )
+
+            k8s.helm.v4.Chart(f"{name}-metrics-server",
+                chart=chart_path,
+                namespace="kube-system",
+                values={
+                    # The metrics API stays up while a replica is rescheduled, so HPAs don't stall
+                    "replicas": 2,
+                    "podDisruptionBudget": {
+                        "enabled": True,
+                        "minAvailable": 1,
+                    },
+                },
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s, depends_on=node_dependencies)
+            )
+
+        self.cloudwatch_agent_role_arn = None
+        if args.get("cloudwatch_observability"):
+            cloudwatch_agent_role = service_account_role(providers, self, f"{name}-cloudwatch-agent", {
+                'mode': args.get("service_account_role_mode"),
+                'cluster_name': args["cluster_name"],
+                'namespace': "amazon-cloudwatch",
+                'service_account': "cloudwatch-agent",
+                'oidc_provider_arn': args.get("oidc_provider_arn"),
+                'oidc_provider_url': args.get("oidc_provider_url"),
+            }, policy_arns={
+                f"{name}-cloudwatch-agent-policy": "arn:aws:iam::aws:policy/CloudWatchAgentServerPolicy",
+            })
+
+            aws.eks.Addon(f"{name}-cloudwatch-observability",
+                cluster_name=args["cluster_name"],
+                addon_name=CLOUDWATCH_OBSERVABILITY_ADDON,
+                addon_version=args.get("cloudwatch_addon_version"),
+                service_account_role_arn=cloudwatch_agent_role.addon_role_arn,
+                configuration_values=json.dumps({
+                    "containerLogs": {"enabled": bool(args.get("container_logs"))},
+                }),
+                resolve_conflicts_on_create="OVERWRITE",
+                resolve_conflicts_on_update="PRESERVE",
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.aws,
+                    depends_on=[*node_dependencies, *cloudwatch_agent_role.dependencies])
+            )
+            self.cloudwatch_agent_role_arn = cloudwatch_agent_role.arn
+
+        self.dashboard_name = None
+        if args.get("dashboard"):
+            dashboard = aws.cloudwatch.Dashboard(f"{name}-dashboard",
+                dashboard_name=pulumi.Output.from_input(args["cluster_name"]).apply(lambda cluster_name: f"{cluster_name}-performance"),
+                dashboard_body=pulumi.Output.all(args["cluster_name"], args["region"]).apply(
+                    lambda _args: dashboard_body(_args[0], _args[1], bool(args.get("cloudwatch_observability")))
+                ),
+                opts=pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+            self.dashboard_name = dashboard.dashboard_name
+
+        self.register_outputs({
+            "cloudwatch_agent_role_arn": self.cloudwatch_agent_role_arn,
+            "dashboard_name": self.dashboard_name,
+        })
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pulumi_aws as aws
+import pulumi_command as command
+import pulumi_kubernetes as k8s
+import pulumi_null as null
+import pulumi_random as random
+import pulumi_std as std
+import pulumi_tls as tls
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+# The stacks set pulumi:disable-default-providers to ["*"], so a resource or invoke without an
+# explicit provider fails instead of silently getting a default one (for AWS, one without common_tags).
+
+@dataclass(frozen=True)
+class Providers:
+    """
+    The configured provider for each target. Components take this and pick the provider each
+    resource or invoke needs. There is one AWS provider (the stack's region and account, tagged with
+    common_tags) and one Kubernetes provider per cluster, set with for_cluster().
+    """
+    aws: aws.Provider
+    tls: tls.Provider
+    command: command.Provider
+    null: null.Provider
+    random: random.Provider
+    std: std.Provider
+    k8s: Optional[k8s.Provider] = None
+
+    def for_cluster(self, k8s_provider: k8s.Provider) -> "Providers":
+        return replace(self, k8s=k8s_provider)
+
+def create_providers(common_tags: Dict[str, str]) -> Providers:
+    return Providers(
+        # Passing the provider to each resource adopts the tags
+        aws=aws.Provider("aws-provider",
+            default_tags=aws.ProviderDefaultTagsArgs(
+                tags=common_tags
+            )
+        ),
+        tls=tls.Provider("tls-provider"),
+        command=command.Provider("command-provider"),
+        null=null.Provider("null-provider"),
+        random=random.Provider("random-provider"),
+        std=std.Provider("std-provider"),
+    )
@@ -1,9 +1,69 @@
+import json
 import pulumi
 from pulumi import Input
 from typing import Optional, Dict, TypedDict, Any
 import pulumi_aws as aws
 import pulumi_random as random
 import pulumi_std as std
+from modules.providers import Providers
+
+RDS_MODES = ["instance", "aurora-serverless"]
+RDS_MONITORING_INTERVALS = [0, 1, 5, 10, 15, 30, 60]
+
+# Parameter profiles keyed by parameter group family. Values in {} are RDS formulas evaluated per instance
+# class, so the buffer pool and connection limits follow the instance size. '{buffer_pool_percent}' is
+# filled in from the component args.
+RDS_PARAMETER_PROFILES = {
+    "mysql8.0": {
+        "instance": {
+            "character_set_server": "utf8mb4",
+            "character_set_client": "utf8mb4",
+            "collation_server": "utf8mb4_0900_ai_ci",
+            "innodb_buffer_pool_size": "{{DBInstanceClassMemory*{buffer_pool_percent}/100}}",
+            "max_connections": "{{DBInstanceClassMemory/12582880}}",
+            "slow_query_log": "1",
+            "long_query_time": "1",
+            "log_output": "FILE",
+        },
+    },
+    "aurora-mysql8.0": {
+        "cluster": {
+            "character_set_server": "utf8mb4",
+            "character_set_client": "utf8mb4",
+            "collation_server": "utf8mb4_0900_ai_ci",
+        },
+        "instance": {
+            "innodb_buffer_pool_size": "{{DBInstanceClassMemory*{buffer_pool_percent}/100}}",
+            "max_connections": "{{DBInstanceClassMemory/12582880}}",
+            "slow_query_log": "1",
+            "long_query_time": "1",
+            "log_output": "FILE",
+        },
+    },
+}
+
+# Changing these needs a reboot; everything else is applied immediately
+RDS_STATIC_PARAMETERS = ["innodb_buffer_pool_size"]
+
+def rds_parameters(family: str, level: str, buffer_pool_percent: int = 75, overrides: Optional[Dict[str, str]] = None) -> list:
+    """Parameter group entries for a family/level ('cluster' or 'instance'), with overrides applied."""
+    profile = {
+        key: value.format(buffer_pool_percent=buffer_pool_percent)
+        for key, value in RDS_PARAMETER_PROFILES[family].get(level, {}).items()
+    }
+    if overrides:
+        # Overrides land on the instance level unless the cluster level already owns the parameter
+        for key, value in overrides.items():
+            if level == "cluster" and key in profile or level == "instance" and key not in RDS_PARAMETER_PROFILES[family].get("cluster", {}):
+                profile[key] = str(value)
+    return [
+        {
+            "name": key,
+            "value": value,
+            "apply_method": "pending-reboot" if key in RDS_STATIC_PARAMETERS else "immediate",
+        }
+        for key, value in sorted(profile.items())
+    ]
 
 class RdsArgs(TypedDict, total=False):
     rds_instance_identifier: Input[str]
@@ -19,16 +79,69 @@ class RdsArgs(TypedDict, total=False):
     allocated_storage: Input[float]
     db_port: Input[str]
     internal_domain: Input[str]
+    # 'instance' (a single aws.rds.Instance) or 'aurora-serverless' (Aurora Serverless v2 cluster)
+    mode: str
+    min_acu: float
+    max_acu: float
+    # RDS Proxy in front of the database, pooling connections from many short-lived build pods
+    create_proxy: bool
+    # innodb_buffer_pool_size as a percentage of instance memory, and extra/overridden parameters
+    buffer_pool_percent: int
+    parameters: Dict[str, str]
+    # 'instance' mode only: gp3 storage with explicit iops/throughput (needs >= 400 GiB on MySQL)
+    storage_iops: int
+    storage_throughput: int
+    performance_insights: bool
+    performance_insights_retention_days: int
+    # Enhanced Monitoring interval in seconds, 0 disables it
+    monitoring_interval: int
+    read_replica_count: int
+
+def validate_rds_args(args: RdsArgs) -> None:
+    mode = args.get("mode") or "instance"
+    if mode not in RDS_MODES:
+        raise ValueError(f"RDS mode '{mode}' is invalid. Use one of: {RDS_MODES}")
+    if mode == "aurora-serverless":
+        min_acu = args.get("min_acu", 0.5)
+        max_acu = args.get("max_acu", 4)
+        for acu in [min_acu, max_acu]:
+            if not 0 <= acu <= 256 or (acu * 2) % 1 != 0:
+                raise ValueError(f"Aurora Serverless v2 capacity must be between 0 and 256 in steps of 0.5, got {acu}")
+        if min_acu > max_acu:
+            raise ValueError(f"Aurora Serverless v2 min_acu ({min_acu}) must not be greater than max_acu ({max_acu})")
+
+    if not 1 <= args.get("buffer_pool_percent", 75) <= 90:
+        raise ValueError(f"RDS buffer_pool_percent must be between 1 and 90, got {args['buffer_pool_percent']}")
+    if args.get("monitoring_interval", 0) not in RDS_MONITORING_INTERVALS:
+        raise ValueError(f"RDS monitoring_interval must be one of {RDS_MONITORING_INTERVALS}, got {args['monitoring_interval']}")
+    retention = args.get("performance_insights_retention_days", 7)
+    if retention != 7 and (retention % 31 != 0 or not 31 <= retention <= 731):
+        raise ValueError(f"RDS performance_insights_retention_days must be 7 or a multiple of 31 up to 731, got {retention}")
+    if not 0 <= args.get("read_replica_count", 0) <= 5:
+        raise ValueError(f"RDS read_replica_count must be between 0 and 5, got {args['read_replica_count']}")
+
+    if args.get("storage_iops") or args.get("storage_throughput"):
+        if mode != "instance":
+            raise ValueError("RDS storage_iops/storage_throughput only apply to 'instance' mode")
+        if (args.get("allocated_storage") or 0) < 400:
+            raise ValueError("RDS gp3 storage_iops/storage_throughput can only be set with allocated_storage >= 400 GiB")
+        if not 12000 <= (args.get("storage_iops") or 12000) <= 64000:
+            raise ValueError(f"RDS gp3 storage_iops must be between 12000 and 64000, got {args['storage_iops']}")
+        if not 500 <= (args.get("storage_throughput") or 500) <= 4000:
+            raise ValueError(f"RDS gp3 storage_throughput must be between 500 and 4000 MiB/s, got {args['storage_throughput']}")
 
 class Rds(pulumi.ComponentResource):
-    def __init__(self, provider: aws.Provider, name: str, args: RdsArgs, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, name: str, args: RdsArgs, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:Rds", name, args, opts)
 
+        validate_rds_args(args)
+        mode = args.get("mode") or "instance"
+
         default_sg = aws.rds.SubnetGroup(f"{name}-default-db",
             name=f"{args['rds_instance_identifier']}-subnet-group",
             description="Terraform RDS subnet group",
             subnet_ids=args["private_subnet_ids"],
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
         rds_sg = aws.ec2.SecurityGroup(f"{name}-rds",
@@ -38,7 +151,7 @@ class Rds(pulumi.ComponentResource):
             tags={
                 "Name": f"{args['rds_instance_identifier']}-rds-security-group",
             },
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
         rds_ingress = aws.ec2.SecurityGroupRule(f"{name}-rds-ingress",
@@ -48,7 +161,7 @@ class Rds(pulumi.ComponentResource):
             protocol=aws.ec2.ProtocolType.TCP,
             cidr_blocks=[args["vpc_cidr_block"]],
             security_group_id=rds_sg.id,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
         nfs_egress_efs = aws.ec2.SecurityGroupRule(f"{name}-nfs-egress-efs",
@@ -58,50 +171,277 @@ class Rds(pulumi.ComponentResource):
             protocol="-1",
             cidr_blocks=["0.0.0.0/0"],
             security_group_id=rds_sg.id,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
-        )
-
-        default_parameter_group = aws.rds.ParameterGroup(f"{name}-default",
-            name=f"{args['rds_instance_identifier']}-param-group",
-            description="Terraform parameter group for mysql 8.0",
-            family="mysql8.0",
-            parameters=[
-                {
-                    "name": "character_set_server",
-                    "value": "utf8",
-                },
-                {
-                    "name": "character_set_client",
-                    "value": "utf8",
-                },
-            ],
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
         db_pw = random.RandomPassword(f"{name}-db",
             length=32,
             special=False,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.random)
         )
 
-        default_instance = aws.rds.Instance(f"{name}-default",
-            identifier=args["rds_instance_identifier"],
-            allocated_storage=args["allocated_storage"],
-            engine=args["engine"],
-            instance_class=args["instance_class"],
-            engine_version=args["engine_version"],
-            port=args["db_port"],
-            db_name=args["database_name"],
-            username=args["database_user"],
-            password=db_pw.result,
-            db_subnet_group_name=default_sg.id,
-            vpc_security_group_ids=[rds_sg.id],
-            skip_final_snapshot=True,
-            final_snapshot_identifier="Ignore",
-            parameter_group_name=default_parameter_group.name,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+        monitoring_interval = args.get("monitoring_interval", 0)
+        if monitoring_interval:
+            monitoring_role = aws.iam.Role(f"{name}-monitoring-role",
+                assume_role_policy=json.dumps({
+                    "Version": "2012-10-17",
+                    "Statement": [{
+                        "Effect": "Allow",
+                        "Principal": {"Service": "monitoring.rds.amazonaws.com"},
+                        "Action": "sts:AssumeRole",
+                    }],
+                }),
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            aws.iam.RolePolicyAttachment(f"{name}-monitoring-role",
+                role=monitoring_role.name,
+                policy_arn="arn:aws:iam::aws:policy/service-role/AmazonRDSEnhancedMonitoringRole",
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+            monitoring_role_arn = monitoring_role.arn
+        else:
+            monitoring_role_arn = None
+
+        # Shared by the writer and every replica
+        instance_monitoring = {
+            "performance_insights_enabled": bool(args.get("performance_insights")),
+            "performance_insights_retention_period": args.get("performance_insights_retention_days", 7) if args.get("performance_insights") else None,
+            "monitoring_interval": monitoring_interval,
+            "monitoring_role_arn": monitoring_role_arn,
+        }
+        buffer_pool_percent = args.get("buffer_pool_percent", 75)
+        replica_count = args.get("read_replica_count", 0)
+        replicas = []
+
+        if mode == "aurora-serverless":
+            cluster_parameter_group = aws.rds.ClusterParameterGroup(f"{name}-cluster",
+                name=f"{args['rds_instance_identifier']}-cluster-param-group",
+                description="Aurora MySQL 8.0 cluster parameter group",
+                family="aurora-mysql8.0",
+                parameters=rds_parameters("aurora-mysql8.0", "cluster", buffer_pool_percent, args.get("parameters")),
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            instance_parameter_group = aws.rds.ParameterGroup(f"{name}-instance",
+                name=f"{args['rds_instance_identifier']}-instance-param-group",
+                description="Aurora MySQL 8.0 instance parameter group",
+                family="aurora-mysql8.0",
+                parameters=rds_parameters("aurora-mysql8.0", "instance", buffer_pool_percent, args.get("parameters")),
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            db_cluster = aws.rds.Cluster(f"{name}-cluster",
+                cluster_identifier=args["rds_instance_identifier"],
+                engine="aurora-mysql",
+                engine_mode="provisioned",
+                engine_version=args.get("engine_version"),
+                port=args["db_port"],
+                database_name=args["database_name"],
+                master_username=args["database_user"],
+                master_password=db_pw.result,
+                db_subnet_group_name=default_sg.name,
+                vpc_security_group_ids=[rds_sg.id],
+                db_cluster_parameter_group_name=cluster_parameter_group.name,
+                storage_encrypted=True,
+                skip_final_snapshot=True,
+                serverlessv2_scaling_configuration={
+                    "min_capacity": args.get("min_acu", 0.5),
+                    "max_capacity": args.get("max_acu", 4),
+                },
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            writer = aws.rds.ClusterInstance(f"{name}-cluster-writer",
+                identifier=f"{args['rds_instance_identifier']}-writer",
+                cluster_identifier=db_cluster.id,
+                instance_class="db.serverless",
+                engine=db_cluster.engine,
+                engine_version=db_cluster.engine_version,
+                db_subnet_group_name=default_sg.name,
+                db_parameter_group_name=instance_parameter_group.name,
+                promotion_tier=0,
+                **instance_monitoring,
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            for i in range(replica_count):
+                replicas.append(aws.rds.ClusterInstance(f"{name}-cluster-reader-{i}",
+                    identifier=f"{args['rds_instance_identifier']}-reader-{i}",
+                    cluster_identifier=db_cluster.id,
+                    instance_class="db.serverless",
+                    engine=db_cluster.engine,
+                    engine_version=db_cluster.engine_version,
+                    db_subnet_group_name=default_sg.name,
+                    db_parameter_group_name=instance_parameter_group.name,
+                    promotion_tier=1,
+                    **instance_monitoring,
+                    opts = pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=[writer])
+                ))
+
+            db_name = db_cluster.database_name
+            db_user = db_cluster.master_username
+            db_address = db_cluster.endpoint
+            db_port = db_cluster.port
+            db_endpoint = pulumi.Output.concat(db_cluster.endpoint, ":", db_cluster.port.apply(str))
+            # The cluster reader endpoint balances over all readers
+            reader_targets = [db_cluster.reader_endpoint] if replica_count else []
+        else:
+            default_parameter_group = aws.rds.ParameterGroup(f"{name}-default",
+                name=f"{args['rds_instance_identifier']}-param-group",
+                description="Terraform parameter group for mysql 8.0",
+                family="mysql8.0",
+                parameters=rds_parameters("mysql8.0", "instance", buffer_pool_percent, args.get("parameters")),
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            default_instance = aws.rds.Instance(f"{name}-default",
+                identifier=args["rds_instance_identifier"],
+                allocated_storage=args["allocated_storage"],
+                storage_type="gp3",
+                iops=args.get("storage_iops"),
+                storage_throughput=args.get("storage_throughput"),
+                engine=args["engine"],
+                instance_class=args["instance_class"],
+                engine_version=args["engine_version"],
+                port=args["db_port"],
+                db_name=args["database_name"],
+                username=args["database_user"],
+                password=db_pw.result,
+                db_subnet_group_name=default_sg.id,
+                vpc_security_group_ids=[rds_sg.id],
+                skip_final_snapshot=True,
+                final_snapshot_identifier="Ignore",
+                parameter_group_name=default_parameter_group.name,
+                **instance_monitoring,
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            for i in range(replica_count):
+                replicas.append(aws.rds.Instance(f"{name}-replica-{i}",
+                    identifier=f"{args['rds_instance_identifier']}-replica-{i}",
+                    replicate_source_db=default_instance.identifier,
+                    instance_class=args["instance_class"],
+                    storage_type="gp3",
+                    iops=args.get("storage_iops"),
+                    storage_throughput=args.get("storage_throughput"),
+                    vpc_security_group_ids=[rds_sg.id],
+                    parameter_group_name=default_parameter_group.name,
+                    skip_final_snapshot=True,
+                    **instance_monitoring,
+                    opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+                ))
+
+            db_name = default_instance.db_name
+            db_user = default_instance.username
+            db_address = default_instance.address
+            db_port = default_instance.port
+            db_endpoint = default_instance.endpoint
+            reader_targets = [replica.address for replica in replicas]
+
+        # Credentials live in Secrets Manager; RDS Proxy reads them from there too
+        db_secret = aws.secretsmanager.Secret(f"{name}-credentials",
+            name_prefix=f"{args['rds_instance_identifier']}-credentials-",
+            description=f"Credentials for {args['rds_instance_identifier']}",
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+        )
+
+        db_secret_version = aws.secretsmanager.SecretVersion(f"{name}-credentials",
+            secret_id=db_secret.id,
+            secret_string=pulumi.Output.secret(pulumi.Output.all(db_user, db_pw.result, db_address, db_port, db_name).apply(
+                lambda values: json.dumps({
+                    "engine": "mysql",
+                    "username": values[0],
+                    "password": values[1],
+                    "host": values[2],
+                    "port": values[3],
+                    "dbname": values[4],
+                })
+            )),
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
+        dns_target = std.trimsuffix_output(input=db_endpoint,
+            suffix=f":{args['db_port']}",
+            opts=pulumi.InvokeOptions(provider=providers.std)).apply(lambda invoke: invoke.result)
+
+        if args.get("create_proxy"):
+            proxy_role = aws.iam.Role(f"{name}-proxy-role",
+                assume_role_policy=json.dumps({
+                    "Version": "2012-10-17",
+                    "Statement": [{
+                        "Effect": "Allow",
+                        "Principal": {"Service": "rds.amazonaws.com"},
+                        "Action": "sts:AssumeRole",
+                    }],
+                }),
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            aws.iam.RolePolicy(f"{name}-proxy-secret-access",
+                role=proxy_role.id,
+                policy=db_secret.arn.apply(lambda arn: json.dumps({
+                    "Version": "2012-10-17",
+                    "Statement": [{
+                        "Effect": "Allow",
+                        "Action": ["secretsmanager:GetSecretValue"],
+                        "Resource": arn,
+                    }],
+                })),
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            db_proxy = aws.rds.Proxy(f"{name}-proxy",
+                name=f"{args['rds_instance_identifier']}-proxy",
+                engine_family="MYSQL",
+                role_arn=proxy_role.arn,
+                vpc_subnet_ids=args["private_subnet_ids"],
+                vpc_security_group_ids=[rds_sg.id],
+                require_tls=True,
+                idle_client_timeout=1800,
+                auths=[{
+                    "auth_scheme": "SECRETS",
+                    "iam_auth": "DISABLED",
+                    "secret_arn": db_secret.arn,
+                }],
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws, depends_on=[db_secret_version])
+            )
+
+            aws.rds.ProxyDefaultTargetGroup(f"{name}-proxy",
+                db_proxy_name=db_proxy.name,
+                connection_pool_config={
+                    "max_connections_percent": 90,
+                    "max_idle_connections_percent": 10,
+                    "connection_borrow_timeout": 120,
+                },
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            aws.rds.ProxyTarget(f"{name}-proxy",
+                db_proxy_name=db_proxy.name,
+                target_group_name="default",
+                db_cluster_identifier=db_cluster.cluster_identifier if mode == "aurora-serverless" else None,
+                db_instance_identifier=default_instance.identifier if mode == "instance" else None,
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
+
+            if mode == "aurora-serverless" and replica_count:
+                reader_proxy_endpoint = aws.rds.ProxyEndpoint(f"{name}-proxy-reader",
+                    db_proxy_name=db_proxy.name,
+                    db_proxy_endpoint_name=f"{args['rds_instance_identifier']}-proxy-ro",
+                    vpc_subnet_ids=args["private_subnet_ids"],
+                    vpc_security_group_ids=[rds_sg.id],
+                    target_role="READ_ONLY",
+                    opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+                )
+                reader_targets = [reader_proxy_endpoint.endpoint]
+
+            # Clients go through the proxy
+            dns_target = db_proxy.endpoint
+            self.proxy_endpoint = db_proxy.endpoint
+        else:
+            self.proxy_endpoint = None
+
         # Create a private hosted zone associated with the VPC
         private_zone = aws.route53.Zone("rds-private-zone",
             name=args['internal_domain'],  # Your internal domain
@@ -109,7 +449,7 @@ class Rds(pulumi.ComponentResource):
                 "vpc_id": args["vpc_id"],
             }],
             comment="Private zone for RDS endpoints",
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
         rds_record = aws.route53.Record(f"{name}-rds",
@@ -117,18 +457,34 @@ class Rds(pulumi.ComponentResource):
             name=args["db_dns_name"],
             type=aws.route53.RecordType.CNAME,
             ttl=300,
-            records=[std.trimsuffix_output(input=default_instance.endpoint,
-                suffix=f":{args['db_port']}").apply(lambda invoke: invoke.result)],
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            records=[dns_target],
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
-        self.name = default_instance.db_name
-        self.user = default_instance.username
-        self.password = default_instance.password
-        self.endpoint = default_instance.endpoint
+        # Reader record next to the writer one. Several instance replicas share it with equal weights.
+        reader_records = []
+        for i, target in enumerate(reader_targets):
+            reader_records.append(aws.route53.Record(f"{name}-rds-reader-{i}",
+                zone_id=private_zone.id,
+                name=f"{args['db_dns_name']}-ro",
+                type=aws.route53.RecordType.CNAME,
+                ttl=60,
+                records=[target],
+                set_identifier=f"reader-{i}" if len(reader_targets) > 1 else None,
+                weighted_routing_policies=[{"weight": 1}] if len(reader_targets) > 1 else None,
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            ))
+
+        self.name = db_name
+        self.user = db_user
+        self.password = pulumi.Output.secret(db_pw.result)
+        self.endpoint = db_endpoint
         self.dns_name = rds_record.fqdn
-        self.address = default_instance.address
-        self.port = default_instance.port
+        self.address = db_address
+        self.port = db_port
+        self.secret_arn = db_secret.arn
+        self.reader_dns_name = reader_records[0].fqdn if reader_records else None
+        self.parameter_family = "aurora-mysql8.0" if mode == "aurora-serverless" else "mysql8.0"
 
         self.register_outputs({
             'name': self.name, 
@@ -137,5 +493,9 @@ class Rds(pulumi.ComponentResource):
             'endpoint': self.endpoint, 
             'dns_name': self.dns_name,
             'address': self.address, 
-            'port': self.port
-        })
\ No newline at end of file
+            'port': self.port,
+            'secret_arn': self.secret_arn,
+            'proxy_endpoint': self.proxy_endpoint,
+            'reader_dns_name': self.reader_dns_name,
+            'parameter_family': self.parameter_family,
+        })
@@ -2,26 +2,34 @@ import pulumi
 from pulumi import Input
 from typing import Optional, TypedDict
 import pulumi_aws as aws
+import pulumi_kubernetes as k8s
+from modules.providers import Providers
 
 class Route53Args(TypedDict, total=False):
     resource_prefix: Input[str]
     zone_name: Input[str]
     wait_for_validation: Input[bool]
+    # Extra names on the certificate, e.g. the zone apex. Each must be in the child zone or its parent.
+    subject_alternative_names: list
+
+def validation_domain(domain: str) -> str:
+    """ACM validates '*.example.com' and 'example.com' with the same record."""
+    return domain[2:] if domain.startswith("*.") else domain
 
 class Route53(pulumi.ComponentResource):
-    def __init__(self, provider: aws.Provider, name: str, args: Route53Args, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, name: str, args: Route53Args, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:Route53", name, args, opts)
 
         # 1. Create the NEW child zone (e.g., dev.example.com)
         child_zone = aws.route53.Zone(f"{name}-child-zone",
             name=args['zone_name'],
-            opts=pulumi.ResourceOptions(parent=self, provider=provider)
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
         # 2. Look up your EXISTING parent zone (e.g., example.com)
         # We split the name to get the parent (dev.example.com -> example.com)
         parent_domain = args['zone_name'].split('.', 1)[-1]
-        parent_zone = aws.route53.get_zone(name=parent_domain)
+        parent_zone = aws.route53.get_zone(name=parent_domain, opts=pulumi.InvokeOptions(provider=providers.aws))
 
         # 3. AUTOMATIC DELEGATION:
         # Create an NS record in the Parent Zone pointing to the Child Zone's nameservers
@@ -32,37 +40,58 @@ class Route53(pulumi.ComponentResource):
             ttl=172800,
             # This is the "secret sauce": link the child servers to the parent record
             records=child_zone.name_servers, 
-            opts=pulumi.ResourceOptions(parent=self, provider=provider)
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
+        domain_name = f"*.{args['zone_name']}"
+        sans = [san for san in dict.fromkeys(args.get('subject_alternative_names') or []) if san != domain_name]
+
         cert = aws.acm.Certificate(f"{name}-cert",
-            domain_name=f"*.{args['zone_name']}",
+            domain_name=domain_name,
+            subject_alternative_names=sans,
             validation_method="DNS",
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         )
 
-        dvo = cert.domain_validation_options.apply(
-            lambda opts: {
-                "name": opts[0].resource_record_name,
-                "type": opts[0].resource_record_type,
-                "value": opts[0].resource_record_value,
-            } if opts else {"name": "", "type": "", "value": ""}
-        )
+        # One validation record per distinct validation domain. The set of domains is known up front,
+        # so the records can be declared now and each one picks its DVO out of the certificate output.
+        validation_domains = list(dict.fromkeys(validation_domain(d) for d in [domain_name, *sans]))
 
-        validation_record = aws.route53.Record(f"{name}-cert-validation-record",
-            zone_id=child_zone.id,
-            name=dvo["name"],
-            type=dvo["type"],
-            records=[dvo["value"]],
-            ttl=300,
-            opts = pulumi.ResourceOptions(parent=self, provider=provider)
-        )
+        validation_records = {}
+        for i, domain in enumerate(validation_domains):
+            if domain == args['zone_name'] or domain.endswith(f".{args['zone_name']}"):
+                zone_id = child_zone.id
+            elif domain == parent_domain or domain.endswith(f".{parent_domain}"):
+                zone_id = parent_zone.id
+            else:
+                raise ValueError(f"Certificate name '{domain}' is not in {args['zone_name']} or {parent_domain}")
+
+            dvo = cert.domain_validation_options.apply(
+                lambda opts, domain=domain: next(({
+                    "name": o.resource_record_name,
+                    "type": o.resource_record_type,
+                    "value": o.resource_record_value,
+                } for o in (opts or []) if validation_domain(o.domain_name) == domain), {"name": "", "type": "", "value": ""})
+            )
+
+            # The first record keeps its original name so existing stacks don't replace it
+            validation_records[domain] = aws.route53.Record(
+                f"{name}-cert-validation-record" if i == 0 else f"{name}-cert-validation-record-{domain}",
+                zone_id=zone_id,
+                name=dvo["name"],
+                type=dvo["type"],
+                records=[dvo["value"]],
+                ttl=300,
+                allow_overwrite=True,
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
+            )
 
         if args.get('wait_for_validation'):
+            # A single validation covering every name, so all of them validate in one round
             cert_validation = aws.acm.CertificateValidation(f"{name}-cert-validation",
                 certificate_arn=cert.arn,
-                validation_record_fqdns=[validation_record.fqdn],
-                opts = pulumi.ResourceOptions(parent=self, provider=provider)
+                validation_record_fqdns=[record.fqdn for record in validation_records.values()],
+                opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
             )
         else:
             pulumi.log.info("Skipping ACM certificate validation as 'wait_for_validation' is not true.")  
@@ -70,10 +99,66 @@ class Route53(pulumi.ComponentResource):
         self.hosted_zone_id = child_zone.id
         self.certificate_arn = cert.arn
         self.nameservers = child_zone.name_servers
+        self.validation_records = {domain: record.fqdn for domain, record in validation_records.items()}
 
         self.register_outputs({
             "hosted_zone_id": self.hosted_zone_id,
             "certificate_arn": self.certificate_arn,
             "nameservers": self.nameservers,
+            "validation_records": self.validation_records,
+        })
+
+
+class IngressDnsAliasArgs(TypedDict, total=False):
+    zone_id: Input[str]
+    zone_name: str
+    ingress_namespace: str
+    # Ingresses sharing an ALB group all resolve to the same ALB, so any of them will do
+    ingress_name: str
+    record_name: str
+
+def ingress_hostname(status: Optional[k8s.networking.v1.outputs.IngressStatus], ingress: str) -> str:
+    """The ALB hostname the aws-load-balancer-controller published on the Ingress."""
+    addresses = (status.load_balancer.ingress if status and status.load_balancer else None) or []
+    if not addresses or not addresses[0].hostname:
+        raise ValueError(f"The aws-load-balancer-controller has not published an ALB for ingress {ingress} yet. "
+                         "Check the ingress events and run `pulumi up` again.")
+    return addresses[0].hostname
+
+class IngressDnsAlias(pulumi.ComponentResource):
+    def __init__(self, providers: Providers, name: str, args: IngressDnsAliasArgs, opts:Optional[pulumi.ResourceOptions] = None):
+        super().__init__("components:index:IngressDnsAlias", name, args, opts)
+
+        ingress_ref = f"{args['ingress_namespace']}/{args['ingress_name']}"
+
+        # Read through the cluster's API on every update, so the alias follows the ALB when it is replaced
+        ingress = k8s.networking.v1.Ingress.get(f"{name}-ingress", ingress_ref,
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.k8s)
+        )
+        alb_hostname = ingress.status.apply(lambda status: ingress_hostname(status, ingress_ref))
+
+        # Canonical hosted zone of ALBs in this region - no describe-load-balancers call needed
+        alb_zone = aws.lb.get_hosted_zone_id_output(load_balancer_type="application",
+            opts=pulumi.InvokeOptions(provider=providers.aws))
+
+        alias_record = aws.route53.Record(f"{name}-alias",
+            zone_id=args["zone_id"],
+            name=args.get("record_name") or f"*.{args['zone_name']}",
+            type="A",
+            aliases=[{
+                "name": alb_hostname.apply(lambda hostname: f"dualstack.{hostname}"),
+                "zone_id": alb_zone.id,
+                "evaluate_target_health": True,
+            }],
+            # Take over a record created by the old install-helper.sh
+            allow_overwrite=True,
+            opts=pulumi.ResourceOptions(parent=self, provider=providers.aws)
+        )
+
+        self.alb_dns_name = alb_hostname
+        self.record_fqdn = alias_record.fqdn
+
+        self.register_outputs({
+            "alb_dns_name": self.alb_dns_name,
+            "record_fqdn": self.record_fqdn,
         })
-        
\ No newline at end of file
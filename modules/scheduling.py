@@ -2,6 +2,7 @@ import pulumi
 from pulumi import Input
 from typing import Optional, Dict, TypedDict, Any
 import pulumi_aws as aws
+from modules.providers import Providers
 
 class SchedulingArgs(TypedDict):
     timezone: Input[str]
@@ -11,7 +12,7 @@ class SchedulingArgs(TypedDict):
     weekend_config: Input[dict]
 
 class Scheduling(pulumi.ComponentResource):
-    def __init__(self, provider: aws.Provider, name: str, args: SchedulingArgs, opts:Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, name: str, args: SchedulingArgs, opts:Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:Scheduling", name, args, opts)
 
         eks_nodes_up_morning = aws.autoscaling.Schedule(f"{name}-eks-nodes-up-morning",
@@ -22,7 +23,7 @@ class Scheduling(pulumi.ComponentResource):
             recurrence=args["weekday_config_up"]["cron_schedule"],
             time_zone=args["timezone"],
             autoscaling_group_name=args["autoscaling_group_name"],
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         eks_nodes_down_evening = aws.autoscaling.Schedule(f"{name}-eks-nodes-down-evening",
             scheduled_action_name=args["autoscaling_group_name"].apply(lambda n: f"{n}-down"),
@@ -32,7 +33,7 @@ class Scheduling(pulumi.ComponentResource):
             recurrence=args["weekday_config_down"]["cron_schedule"],
             time_zone=args["timezone"],
             autoscaling_group_name=args["autoscaling_group_name"],
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         eks_nodes_down_weekend = aws.autoscaling.Schedule(f"{name}-eks-nodes-down-weekend",
             scheduled_action_name=args["autoscaling_group_name"].apply(lambda n: f"{n}-weekend"),
@@ -42,7 +43,7 @@ class Scheduling(pulumi.ComponentResource):
             recurrence=args["weekend_config"]["cron_schedule"],
             time_zone=args["timezone"],
             autoscaling_group_name=args["autoscaling_group_name"],
-            opts = pulumi.ResourceOptions(parent=self, provider=provider))
+            opts = pulumi.ResourceOptions(parent=self, provider=providers.aws))
 
         self.register_outputs({
             "eks_nodes_up_morning": eks_nodes_up_morning.id,
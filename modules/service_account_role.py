@@ -0,0 +1,125 @@
+import json
+import pulumi
+from dataclasses import dataclass
+from functools import lru_cache
+from pulumi import Input
+from typing import Dict, Optional, Sequence, TypedDict
+import pulumi_aws as aws
+from modules.providers import Providers
+
+# irsa: the role trusts the cluster's OIDC provider (sts:AssumeRoleWithWebIdentity) and the service
+# account is annotated with the role ARN.
+# pod-identity: the role trusts the EKS Pod Identity service and an association maps the service account
+# to it. The eks-pod-identity-agent on each node hands out the credentials, so there is no OIDC provider
+# and no per-pod STS federation call.
+SERVICE_ACCOUNT_ROLE_MODES = ["irsa", "pod-identity"]
+POD_IDENTITY_AGENT_ADDON = "eks-pod-identity-agent"
+POD_IDENTITY_PRINCIPAL = "pods.eks.amazonaws.com"
+IRSA_ROLE_ARN_ANNOTATION = "eks.amazonaws.com/role-arn"
+
+def validate_service_account_role_mode(mode: str) -> None:
+    if mode not in SERVICE_ACCOUNT_ROLE_MODES:
+        raise ValueError(f"service_account_role_mode must be one of {SERVICE_ACCOUNT_ROLE_MODES}, got {mode!r}")
+
+def irsa_trust_statement(oidc_provider_arn: str, oidc_provider_url: str, namespace: str, service_account: str) -> dict:
+    return {
+        "Effect": "Allow",
+        "Principal": {"Federated": oidc_provider_arn},
+        "Action": "sts:AssumeRoleWithWebIdentity",
+        "Condition": {
+            "StringEquals": {
+                f"{oidc_provider_url}:sub": f"system:serviceaccount:{namespace}:{service_account}",
+                f"{oidc_provider_url}:aud": "sts.amazonaws.com",
+            },
+        },
+    }
+
+@lru_cache(maxsize=None)
+def trust_policy(mode: str, namespace: str, service_account: str, oidc_provider_arn: Optional[str] = None, oidc_provider_url: Optional[str] = None) -> str:
+    """
+    The assume-role policy for a service account's role. Every controller of every cluster asks for one,
+    so the documents are built once per distinct input. The Pod Identity one doesn't depend on the
+    cluster at all.
+    """
+    validate_service_account_role_mode(mode)
+    if mode == "pod-identity":
+        statement = {
+            "Effect": "Allow",
+            "Principal": {"Service": POD_IDENTITY_PRINCIPAL},
+            "Action": ["sts:AssumeRole", "sts:TagSession"],
+        }
+    else:
+        statement = irsa_trust_statement(oidc_provider_arn, oidc_provider_url, namespace, service_account)
+    return json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [statement],
+    })
+
+class ServiceAccountRoleArgs(TypedDict, total=False):
+    # 'irsa' (default) or 'pod-identity', see SERVICE_ACCOUNT_ROLE_MODES
+    mode: str
+    cluster_name: Input[str]
+    namespace: str
+    service_account: str
+    # irsa only
+    oidc_provider_arn: Input[str]
+    oidc_provider_url: Input[str]
+
+@dataclass(frozen=True)
+class ServiceAccountRole:
+    role: aws.iam.Role
+    arn: pulumi.Output
+    # Set on the service account; empty with Pod Identity
+    annotations: Dict[str, Input[str]]
+    # For aws.eks.Addon's service_account_role_arn; None with Pod Identity, where the association does it
+    addon_role_arn: Optional[pulumi.Output]
+    # What the workload waits for before it starts: the Pod Identity association, if there is one
+    dependencies: Sequence[pulumi.Resource]
+
+def service_account_role(providers: Providers, parent: pulumi.Resource, name: str, args: ServiceAccountRoleArgs,
+                         policy_arns: Optional[Dict[str, Input[str]]] = None) -> ServiceAccountRole:
+    """
+    The IAM role a Kubernetes service account runs as, with its policy attachments (keyed by resource
+    name) and, for Pod Identity, the association. The resources are children of `parent`.
+    """
+    mode = args.get("mode") or "irsa"
+    validate_service_account_role_mode(mode)
+    namespace = args["namespace"]
+    service_account = args["service_account"]
+
+    if mode == "pod-identity":
+        assume_role_policy = trust_policy(mode, namespace, service_account)
+    else:
+        assume_role_policy = pulumi.Output.all(args["oidc_provider_arn"], args["oidc_provider_url"]).apply(
+            lambda oidc: trust_policy(mode, namespace, service_account, oidc[0], oidc[1])
+        )
+
+    role = aws.iam.Role(f"{name}-role",
+        assume_role_policy=assume_role_policy,
+        opts=pulumi.ResourceOptions(parent=parent, provider=providers.aws)
+    )
+
+    for attachment_name, policy_arn in (policy_arns or {}).items():
+        aws.iam.RolePolicyAttachment(attachment_name,
+            role=role.name,
+            policy_arn=policy_arn,
+            opts=pulumi.ResourceOptions(parent=parent, provider=providers.aws)
+        )
+
+    if mode == "pod-identity":
+        association = aws.eks.PodIdentityAssociation(f"{name}-pod-identity",
+            cluster_name=args["cluster_name"],
+            namespace=namespace,
+            service_account=service_account,
+            role_arn=role.arn,
+            opts=pulumi.ResourceOptions(parent=parent, provider=providers.aws)
+        )
+        return ServiceAccountRole(role=role, arn=role.arn, annotations={}, addon_role_arn=None, dependencies=[association])
+
+    return ServiceAccountRole(
+        role=role,
+        arn=role.arn,
+        annotations={IRSA_ROLE_ARN_ANNOTATION: role.arn},
+        addon_role_arn=role.arn,
+        dependencies=[],
+    )
@@ -0,0 +1,583 @@
+import ipaddress
+import re
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pulumi
+
+from modules.efs import validate_efs_args
+from modules.fsx import validate_fsx_args
+from modules.rds import validate_rds_args
+from modules.external_dns import validate_external_dns_settings
+from modules.lb import validate_alb_controller_profile, validate_tls_settings
+from modules.eks_addons import validate_ebs_storage_classes, validate_efs_storage_classes
+from modules.service_account_role import validate_service_account_role_mode
+from modules.dns import validate_coredns_settings
+from modules.kube_proxy import ipvs_kernel_modules, validate_kube_proxy_settings
+from modules.api_priority import validate_api_priority_settings
+from modules.eks import validate_control_plane_logging, validate_control_plane_scaling_tier
+from modules.eks_nodes_ec2 import validate_node_config_ami_type
+
+KUBERNETES_UPGRADE_POLICIES = ["STANDARD", "EXTENDED"]
+
+# 'all' deploys everything in one stack. The others split it into stacks that change at different
+# rates: network (VPC, hosted zone), cluster (EKS, nodes, EFS, RDS, FSx) and platform (CSI drivers,
+# ALB controller, ExternalDNS). Upper layers read lower ones through StackReferences.
+STACK_LAYERS = ["all", "network", "cluster", "platform"]
+ASG_SCHEDULE_KEYS = ["weekday_config_down", "weekday_config_up", "weekend_config", "timezone"]
+ASG_SCHEDULE_ACTION_KEYS = ["cron_schedule", "min", "max", "desired"]
+
+# What an entry of `clusters` may set. Anything it leaves out comes from the stack-wide setting.
+CLUSTER_KEYS = ["name", "kubernetes_version", "eks_node_group_instance_types", "eks_nodes_per_nodegroup",
+                "eks_max_nodes_per_nodegroup", "eks_nodegroup_ami_type"]
+CLUSTER_NAME_PATTERN = re.compile(r"^[a-z0-9]([-a-z0-9]*[a-z0-9])?$")
+# '<cluster name>-eks-node-group' is an IAM role name, which is limited to 64 characters
+CLUSTER_NAME_MAX_LENGTH = 49
+
+# Vpc carves /20 subnets out of the VPC CIDR, private ones first, at <first two octets>.<n*16>.0/20
+SUBNET_PREFIX_LENGTH = 20
+
+DEFAULT_COMMON_TAGS = {
+    "cb-environment": "development",
+    "cb-expiry": "2027-2-30",
+    "cb-owner": "professional-services",
+    "cb-purpose": "local testing cluster",
+    "cb-user": "kshenk",
+}
+
+DEFAULT_EBS_STORAGE_CLASSES = [
+    {"name": "gp3", "iops": 3000, "throughput": 125, "encrypted": True},
+]
+
+@dataclass(frozen=True, slots=True)
+class ClusterConfig:
+    """One EKS cluster in the shared VPC, with its node groups and platform components."""
+    name: str
+    # The EKS cluster name, also the prefix of its resource names and its kubectl context
+    cluster_name: str
+    kubernetes_version: str
+    eks_node_group_instance_types: Tuple[str, ...]
+    eks_nodes_per_nodegroup: int
+    eks_max_nodes_per_nodegroup: int
+    eks_nodegroup_ami_type: str
+
+class StackConfigError(ValueError):
+    """Every problem found in the stack configuration, reported together."""
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("Invalid stack configuration:\n" + "\n".join(f"  - {e}" for e in errors))
+
+@dataclass(frozen=True, slots=True)
+class StackConfig:
+    # Required
+    resource_prefix: str
+    vpc_cidr_block: str
+    kubernetes_version: str
+    zone_name: str
+    storage_class_name: str
+    eks_node_group_instance_types: Tuple[str, ...]
+    storage_mount_options: Tuple[str, ...]
+
+    # Layering
+    layer: str = "all"
+    # Fully qualified stack names (org/project/stack) of the lower layers
+    network_stack: Optional[str] = None
+    cluster_stack: Optional[str] = None
+
+    # Network
+    public_subnet_count: int = 2
+    # Also the number of node groups - one per private subnet
+    private_subnet_count: int = 2
+    # Pins the AZs instead of using every available one in the region
+    availability_zones: Tuple[str, ...] = ()
+    enable_dns_support: bool = True
+    enable_dns_hostnames: bool = True
+
+    # Cluster and nodes
+    kubernetes_upgrade_policy: str = "STANDARD"
+    # See CONTROL_PLANE_SCALING_TIERS
+    control_plane_scaling_tier: str = "standard"
+    cluster_enable_private_access: bool = False
+    cluster_enable_public_access: bool = True
+    # 'myip' followed by additional_eks_access_cidrs
+    cluster_access_cidrs: Tuple[str, ...] = ()
+    eks_nodes_per_nodegroup: int = 1
+    eks_max_nodes_per_nodegroup: int = 10
+    eks_instance_min_mem: int = 4096
+    eks_instance_min_vcpu: int = 1
+    eks_nodegroup_ami_type: str = "AL2023_x86_64_STANDARD"
+    common_tags: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_COMMON_TAGS))
+    create_asg_schedule: bool = False
+    asg_schedule: Dict[str, Any] = field(default_factory=dict)
+    addon_versions: Dict[str, str] = field(default_factory=dict)
+    addon_version_cache: str = ".addon-versions.json"
+    # How controllers get their AWS credentials, see SERVICE_ACCOUNT_ROLE_MODES
+    service_account_role_mode: str = "irsa"
+
+    # Feature switches
+    create_eks_cluster: bool = False
+    create_alb_controller: bool = False
+    create_efs_filesystem: bool = False
+    create_ebs_csi: bool = False
+    create_fsx_cache: bool = False
+    create_database: bool = False
+    create_r53_zone: bool = False
+    create_ingress_dns_alias: bool = False
+    create_external_dns: bool = False
+    create_coredns_addon: bool = False
+    create_node_local_dns: bool = False
+    create_kube_proxy_addon: bool = False
+    create_metrics_server: bool = False
+    create_cloudwatch_observability: bool = False
+    create_observability_dashboard: bool = False
+    create_api_priority_and_fairness: bool = False
+
+    # Observability
+    control_plane_log_types: Tuple[str, ...] = ()
+    control_plane_log_retention_days: int = 30
+    metrics_server_chart_version: str = "3.12.2"
+    metrics_server_chart_digest: Optional[str] = None
+    cloudwatch_container_logs: bool = False
+
+    # EFS
+    efs_performance_mode: str = "generalPurpose"
+    efs_throughput_mode: str = "bursting"
+    efs_provisioned_throughput_mibps: Optional[float] = None
+    efs_lifecycle: Dict[str, str] = field(default_factory=dict)
+    efs_storage_classes: Tuple[Dict[str, Any], ...] = ()
+
+    # EBS / FSx
+    ebs_storage_classes: Tuple[Dict[str, Any], ...] = ()
+    fsx_file_system_type: str = "openzfs"
+    fsx_deployment_type: Optional[str] = None
+    fsx_throughput_capacity: Optional[int] = None
+    fsx_storage_capacity: Optional[int] = None
+    fsx_storage_class_name: str = "fsx-build-cache"
+
+    # ALB controller
+    alb_chart_version: str = "1.13.0"
+    alb_chart_digest: Optional[str] = None
+    chart_cache_dir: str = "charts"
+    alb_controller_profile: Dict[str, Any] = field(default_factory=dict)
+    alb_webhook_tls: Dict[str, Any] = field(default_factory=dict)
+
+    # DNS
+    route53_wait_for_validation: bool = False
+    subject_alternative_names: Tuple[str, ...] = ()
+    ci_namespace: str = "core"
+    # The operations center's ingress in the CloudBees CI chart
+    ci_ingress_name: str = "cjoc"
+    external_dns_settings: Dict[str, Any] = field(default_factory=dict)
+    # Cluster DNS: the coredns addon's replicas, autoscaling and cache, see DEFAULT_COREDNS_SETTINGS
+    coredns_settings: Dict[str, Any] = field(default_factory=dict)
+    # kube-proxy mode and IPVS scheduler, see DEFAULT_KUBE_PROXY_SETTINGS
+    kube_proxy_settings: Dict[str, Any] = field(default_factory=dict)
+    api_priority_settings: Dict[str, Any] = field(default_factory=dict)
+    external_dns_chart_version: str = "1.15.0"
+    external_dns_chart_digest: Optional[str] = None
+
+    # Database, passed to Rds as-is
+    database_settings: Dict[str, Any] = field(default_factory=dict)
+
+    # Without a `clusters` list, a single cluster named resource_prefix built from the settings above.
+    # The first cluster's outputs are also the stack's top-level outputs.
+    clusters: Tuple[ClusterConfig, ...] = ()
+
+    @property
+    def private_subnet_az_count(self) -> int:
+        """How many AZs the private subnets land in, when the AZs are pinned."""
+        if self.availability_zones:
+            return min(self.private_subnet_count, len(self.availability_zones))
+        return self.private_subnet_count
+
+
+class _Reader:
+    """Reads keys from pulumi.Config, recording type errors instead of raising on the first one."""
+    def __init__(self, config: pulumi.Config, errors: List[str]):
+        self.config = config
+        self.errors = errors
+
+    def _read(self, getter: Callable[[str], Any], key: str, default: Any = None, required: bool = False) -> Any:
+        try:
+            value = getter(key)
+        except (pulumi.ConfigTypeError, ValueError) as e:
+            self.errors.append(f"'{key}': {e}")
+            return default
+        if value is None:
+            if required:
+                self.errors.append(f"'{key}' is required")
+            return default
+        return value
+
+    def str(self, key: str, default: Optional[str] = None, required: bool = False) -> Any:
+        return self._read(self.config.get, key, default, required)
+
+    def int(self, key: str, default: Optional[int] = None) -> Any:
+        return self._read(self.config.get_int, key, default)
+
+    def float(self, key: str, default: Optional[float] = None) -> Any:
+        return self._read(self.config.get_float, key, default)
+
+    def bool(self, key: str, default: bool) -> bool:
+        # Unlike `get_bool(key) or default`, an explicit false is kept
+        return self._read(self.config.get_bool, key, default)
+
+    def object(self, key: str, default: Any = None, required: bool = False) -> Any:
+        return self._read(self.config.get_object, key, default, required)
+
+
+def load_stack_config(config: pulumi.Config) -> StackConfig:
+    """
+    Reads and validates the whole stack configuration before any provider or resource exists.
+    Raises StackConfigError listing every problem found.
+    """
+    errors: List[str] = []
+    read = _Reader(config, errors)
+
+    resource_prefix = read.str("resource_prefix", required=True) or ""
+    storage_class_name = read.str("storage_class_name", required=True) or ""
+    storage_mount_options = tuple(read.object("storage_mount_options", [], required=True))
+
+    # 'myip' is optional, but without it (or additional_eks_access_cidrs) only the NAT gateway can reach the API
+    myip = read.str("myip")
+    cluster_access_cidrs = tuple(([myip] if myip else []) + list(read.object("additional_eks_access_cidrs", [])))
+
+    cfg = StackConfig(
+        resource_prefix=resource_prefix,
+        vpc_cidr_block=read.str("vpc_cidr_block", required=True) or "",
+        kubernetes_version=read.str("kubernetes_version", required=True) or "",
+        zone_name=read.str("zone_name", required=True) or "",
+        storage_class_name=storage_class_name,
+        eks_node_group_instance_types=tuple(read.object("eks_node_group_instance_types", [], required=True)),
+        storage_mount_options=storage_mount_options,
+        layer=read.str("layer", "all"),
+        network_stack=read.str("network_stack"),
+        cluster_stack=read.str("cluster_stack"),
+        public_subnet_count=read.int("public_subnet_count", 2),
+        private_subnet_count=read.int("private_subnet_count", 2),
+        availability_zones=tuple(read.object("availability_zones", [])),
+        enable_dns_support=read.bool("enable_dns_support", True),
+        enable_dns_hostnames=read.bool("enable_dns_host_name", True),
+        kubernetes_upgrade_policy=read.str("kubernetes_upgrade_policy", "STANDARD"),
+        control_plane_scaling_tier=read.str("control_plane_scaling_tier", "standard"),
+        cluster_enable_private_access=read.bool("cluster_enable_private_access", False),
+        cluster_enable_public_access=read.bool("cluster_enable_public_access", True),
+        cluster_access_cidrs=cluster_access_cidrs,
+        eks_nodes_per_nodegroup=read.int("eks_nodes_per_nodegroup", 1),
+        eks_max_nodes_per_nodegroup=read.int("eks_max_nodes_per_nodegroup", 10),
+        eks_instance_min_mem=read.int("eks_instance_min_mem", 4096),
+        eks_instance_min_vcpu=read.int("eks_instance_min_vcpu", 1),
+        eks_nodegroup_ami_type=read.str("eks_nodegroup_ami_type", "AL2023_x86_64_STANDARD"),
+        common_tags=read.object("common_tags", dict(DEFAULT_COMMON_TAGS)),
+        create_asg_schedule=read.bool("create_asg_schedule", False),
+        asg_schedule=read.object("asg_schedule", {}),
+        addon_versions=read.object("addon_versions", {}),
+        addon_version_cache=read.str("addon_version_cache", ".addon-versions.json"),
+        service_account_role_mode=read.str("service_account_role_mode", "irsa"),
+        create_eks_cluster=read.bool("create_eks_cluster", False),
+        create_alb_controller=read.bool("create_alb_controller", False),
+        create_efs_filesystem=read.bool("create_efs_filesystem", False),
+        create_ebs_csi=read.bool("create_ebs_csi", False),
+        create_fsx_cache=read.bool("create_fsx_cache", False),
+        create_database=read.bool("create_database", False),
+        create_r53_zone=read.bool("create_r53_zone", False),
+        create_ingress_dns_alias=read.bool("create_ingress_dns_alias", False),
+        create_external_dns=read.bool("create_external_dns", False),
+        create_coredns_addon=read.bool("create_coredns_addon", False),
+        create_node_local_dns=read.bool("create_node_local_dns", False),
+        create_kube_proxy_addon=read.bool("create_kube_proxy_addon", False),
+        create_metrics_server=read.bool("create_metrics_server", False),
+        create_cloudwatch_observability=read.bool("create_cloudwatch_observability", False),
+        create_observability_dashboard=read.bool("create_observability_dashboard", False),
+        create_api_priority_and_fairness=read.bool("create_api_priority_and_fairness", False),
+        control_plane_log_types=tuple(read.object("control_plane_log_types", [])),
+        control_plane_log_retention_days=read.int("control_plane_log_retention_days", 30),
+        metrics_server_chart_version=read.str("metrics_server_chart_version", "3.12.2"),
+        metrics_server_chart_digest=read.str("metrics_server_chart_digest"),
+        cloudwatch_container_logs=read.bool("cloudwatch_container_logs", False),
+        efs_performance_mode=read.str("efs_performance_mode", "generalPurpose"),
+        efs_throughput_mode=read.str("efs_throughput_mode", "bursting"),
+        efs_provisioned_throughput_mibps=read.float("efs_provisioned_throughput_mibps"),
+        efs_lifecycle=read.object("efs_lifecycle", {}),
+        efs_storage_classes=tuple(read.object("efs_storage_classes", [
+            {"name": storage_class_name, "mount_options": list(storage_mount_options)},
+        ])),
+        ebs_storage_classes=tuple(read.object("ebs_storage_classes", [dict(c) for c in DEFAULT_EBS_STORAGE_CLASSES])),
+        fsx_file_system_type=read.str("fsx_file_system_type", "openzfs"),
+        fsx_deployment_type=read.str("fsx_deployment_type"),
+        fsx_throughput_capacity=read.int("fsx_throughput_capacity"),
+        fsx_storage_capacity=read.int("fsx_storage_capacity"),
+        fsx_storage_class_name=read.str("fsx_storage_class_name", "fsx-build-cache"),
+        alb_chart_version=read.str("alb_chart_version", "1.13.0"),
+        alb_chart_digest=read.str("alb_chart_digest"),
+        chart_cache_dir=read.str("chart_cache_dir", "charts"),
+        alb_controller_profile=read.object("alb_controller_profile", {}),
+        alb_webhook_tls=read.object("alb_webhook_tls", {}),
+        route53_wait_for_validation=read.bool("route53_wait_for_validation", False),
+        subject_alternative_names=tuple(read.object("subject_alternative_names", [])),
+        ci_namespace=read.str("ci_namespace", "core"),
+        ci_ingress_name=read.str("ci_ingress_name", "cjoc"),
+        external_dns_settings=read.object("external_dns", {}),
+        coredns_settings=read.object("coredns", {}),
+        kube_proxy_settings=read.object("kube_proxy", {}),
+        api_priority_settings=read.object("api_priority", {}),
+        external_dns_chart_version=read.str("external_dns_chart_version", "1.15.0"),
+        external_dns_chart_digest=read.str("external_dns_chart_digest"),
+        # Plugin/analytics database. 'aurora-serverless' scales between database_min_acu and database_max_acu;
+        # an RDS Proxy pools the connections from short-lived build pods.
+        database_settings={
+            'mode': read.str("database_mode", "aurora-serverless"),
+            'database_name': read.str("database_name", "cloudbees"),
+            'database_user': read.str("database_user", "cloudbees"),
+            'engine': read.str("database_engine", "mysql"),
+            'engine_version': read.str("database_engine_version"),
+            'instance_class': read.str("database_instance_class", "db.t4g.medium"),
+            'allocated_storage': read.int("database_allocated_storage", 20),
+            'db_port': read.int("database_port", 3306),
+            'min_acu': read.float("database_min_acu", 0.5),
+            'max_acu': read.float("database_max_acu", 4),
+            'create_proxy': read.bool("database_create_proxy", True),
+            'internal_domain': read.str("database_internal_domain", f"{resource_prefix}.internal"),
+            'buffer_pool_percent': read.int("database_buffer_pool_percent", 75),
+            'parameters': read.object("database_parameters", {}),
+            'storage_iops': read.int("database_storage_iops"),
+            'storage_throughput': read.int("database_storage_throughput"),
+            'performance_insights': read.bool("database_performance_insights", False),
+            'performance_insights_retention_days': read.int("database_performance_insights_retention_days", 7),
+            'monitoring_interval': read.int("database_monitoring_interval", 0),
+            'read_replica_count': read.int("database_read_replica_count", 0),
+        },
+    )
+
+    cfg = replace(cfg, clusters=_read_clusters(read.object("clusters"), cfg, errors))
+
+    # Type errors make the cross-field checks meaningless
+    if not errors:
+        errors.extend(validate_stack_config(cfg))
+    if errors:
+        raise StackConfigError(errors)
+    return cfg
+
+
+def _read_clusters(entries: Any, cfg: StackConfig, errors: List[str]) -> Tuple[ClusterConfig, ...]:
+    defaults = {
+        "kubernetes_version": cfg.kubernetes_version,
+        "eks_node_group_instance_types": cfg.eks_node_group_instance_types,
+        "eks_nodes_per_nodegroup": cfg.eks_nodes_per_nodegroup,
+        "eks_max_nodes_per_nodegroup": cfg.eks_max_nodes_per_nodegroup,
+        "eks_nodegroup_ami_type": cfg.eks_nodegroup_ami_type,
+    }
+    if entries is None:
+        return (ClusterConfig(name=cfg.resource_prefix, cluster_name=cfg.resource_prefix, **defaults),)
+    if not isinstance(entries, list) or not entries:
+        errors.append("'clusters' must be a non-empty list of objects")
+        return ()
+
+    clusters = []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not isinstance(entry.get("name"), str):
+            errors.append(f"clusters[{i}] must be an object with a 'name'")
+            continue
+        unknown = [key for key in entry if key not in CLUSTER_KEYS]
+        if unknown:
+            errors.append(f"clusters[{i}] ({entry['name']}) has unknown keys {unknown}. Use: {CLUSTER_KEYS}")
+            continue
+        settings = {**defaults, **{key: value for key, value in entry.items() if key != "name"}}
+        wrong_type = [key for key in ["eks_nodes_per_nodegroup", "eks_max_nodes_per_nodegroup"]
+                      if not isinstance(settings[key], int) or isinstance(settings[key], bool)]
+        if wrong_type or not isinstance(settings["eks_node_group_instance_types"], (list, tuple)):
+            errors.append(f"clusters[{i}] ({entry['name']}): node counts must be integers and "
+                          f"eks_node_group_instance_types a list")
+            continue
+        settings["kubernetes_version"] = str(settings["kubernetes_version"])
+        settings["eks_node_group_instance_types"] = tuple(settings["eks_node_group_instance_types"])
+        clusters.append(ClusterConfig(name=entry["name"], cluster_name=f"{cfg.resource_prefix}-{entry['name']}", **settings))
+    return tuple(clusters)
+
+
+def _check(errors: List[str], validate: Callable[..., None], *args: Any) -> None:
+    try:
+        validate(*args)
+    except ValueError as e:
+        errors.append(str(e))
+
+
+def _subnet_cidrs(cfg: StackConfig) -> List[str]:
+    prefix = ".".join(cfg.vpc_cidr_block.split(".")[:2])
+    count = cfg.private_subnet_count + cfg.public_subnet_count
+    return [f"{prefix}.{n * 16}.0/{SUBNET_PREFIX_LENGTH}" for n in range(count)]
+
+
+def validate_stack_config(cfg: StackConfig) -> List[str]:
+    """Cross-field checks. Returns every error instead of stopping at the first."""
+    errors: List[str] = []
+
+    # Layers
+    if cfg.layer not in STACK_LAYERS:
+        errors.append(f"layer '{cfg.layer}' is invalid. Use one of: {STACK_LAYERS}")
+    if cfg.layer in ["cluster", "platform"] and not cfg.network_stack:
+        errors.append(f"network_stack is required for the '{cfg.layer}' layer")
+    if cfg.layer == "platform" and not cfg.cluster_stack:
+        errors.append("cluster_stack is required for the 'platform' layer")
+
+    # Subnets
+    if cfg.public_subnet_count < 1:
+        errors.append(f"public_subnet_count must be at least 1, got {cfg.public_subnet_count}")
+    if cfg.private_subnet_count < 1:
+        errors.append(f"private_subnet_count must be at least 1, got {cfg.private_subnet_count}")
+
+    try:
+        vpc_network = ipaddress.ip_network(cfg.vpc_cidr_block)
+    except ValueError as e:
+        errors.append(f"vpc_cidr_block: {e}")
+    else:
+        if vpc_network.version != 4:
+            errors.append(f"vpc_cidr_block must be an IPv4 CIDR, got {cfg.vpc_cidr_block}")
+        elif cfg.private_subnet_count + cfg.public_subnet_count > 16:
+            errors.append(f"private_subnet_count + public_subnet_count must not exceed 16 /{SUBNET_PREFIX_LENGTH} subnets")
+        else:
+            outside = [c for c in _subnet_cidrs(cfg) if not ipaddress.ip_network(c).subnet_of(vpc_network)]
+            if outside:
+                errors.append(f"vpc_cidr_block {cfg.vpc_cidr_block} is too small for {cfg.private_subnet_count} private and "
+                              f"{cfg.public_subnet_count} public /{SUBNET_PREFIX_LENGTH} subnets ({', '.join(outside)} fall outside it)")
+
+    for cidr in cfg.cluster_access_cidrs:
+        try:
+            ipaddress.ip_network(cidr)
+        except ValueError as e:
+            errors.append(f"cluster access CIDR '{cidr}' (myip/additional_eks_access_cidrs): {e}")
+
+    if len(set(cfg.availability_zones)) != len(cfg.availability_zones):
+        errors.append(f"availability_zones contains duplicates: {list(cfg.availability_zones)}")
+
+    # Cluster and nodes
+    if cfg.kubernetes_upgrade_policy not in KUBERNETES_UPGRADE_POLICIES:
+        errors.append(f"kubernetes_upgrade_policy '{cfg.kubernetes_upgrade_policy}' is invalid. Use one of: {KUBERNETES_UPGRADE_POLICIES}")
+    if not cfg.cluster_enable_private_access and not cfg.cluster_enable_public_access:
+        errors.append("At least one of cluster_enable_private_access and cluster_enable_public_access must be true")
+    if cfg.create_eks_cluster and cfg.private_subnet_az_count < 2:
+        errors.append(f"EKS needs private subnets in at least 2 availability zones, "
+                      f"private_subnet_count={cfg.private_subnet_count} covers {cfg.private_subnet_az_count}")
+    if not cfg.eks_node_group_instance_types:
+        errors.append("eks_node_group_instance_types must list at least one instance type")
+    if cfg.eks_nodes_per_nodegroup < 0:
+        errors.append(f"eks_nodes_per_nodegroup must not be negative, got {cfg.eks_nodes_per_nodegroup}")
+    if cfg.eks_max_nodes_per_nodegroup < 1:
+        errors.append(f"eks_max_nodes_per_nodegroup must be at least 1, got {cfg.eks_max_nodes_per_nodegroup}")
+    if cfg.eks_max_nodes_per_nodegroup < cfg.eks_nodes_per_nodegroup:
+        errors.append("eks_max_nodes_per_nodegroup must be greater than eks_nodes_per_nodegroup!")
+    if cfg.eks_instance_min_mem < 1 or cfg.eks_instance_min_vcpu < 1:
+        errors.append("eks_instance_min_mem and eks_instance_min_vcpu must be positive")
+
+    if cfg.create_asg_schedule:
+        missing = [k for k in ASG_SCHEDULE_KEYS if k not in cfg.asg_schedule]
+        if missing:
+            errors.append(f"asg_schedule is missing {missing} (create_asg_schedule is true)")
+        for key in ASG_SCHEDULE_KEYS[:3]:
+            action = cfg.asg_schedule.get(key)
+            if not isinstance(action, dict):
+                continue
+            action_missing = [k for k in ASG_SCHEDULE_ACTION_KEYS if k not in action]
+            if action_missing:
+                errors.append(f"asg_schedule.{key} is missing {action_missing}")
+            elif len(str(action["cron_schedule"]).split()) != 5:
+                errors.append(f"asg_schedule.{key}.cron_schedule '{action['cron_schedule']}' must have 5 fields")
+
+    # Clusters sharing the VPC
+    names = [c.name for c in cfg.clusters]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        errors.append(f"clusters names must be unique, {duplicates} appear more than once")
+    for cluster in cfg.clusters:
+        if not CLUSTER_NAME_PATTERN.match(cluster.cluster_name) or len(cluster.cluster_name) > CLUSTER_NAME_MAX_LENGTH:
+            errors.append(f"cluster name '{cluster.cluster_name}' must be lowercase letters, digits and '-', "
+                          f"at most {CLUSTER_NAME_MAX_LENGTH} characters")
+        if cluster.cluster_name == cfg.resource_prefix:
+            continue  # The implicit cluster uses the stack-wide settings, already checked above
+        if not cluster.eks_node_group_instance_types:
+            errors.append(f"clusters.{cluster.name}: eks_node_group_instance_types must list at least one instance type")
+        if not 0 <= cluster.eks_nodes_per_nodegroup <= cluster.eks_max_nodes_per_nodegroup:
+            errors.append(f"clusters.{cluster.name}: eks_nodes_per_nodegroup must be between 0 and eks_max_nodes_per_nodegroup")
+    if len(cfg.clusters) > 1:
+        if cfg.layer != "all":
+            errors.append(f"Several clusters can only be deployed by an 'all' stack, this is a '{cfg.layer}' stack")
+        if cfg.external_dns_settings.get("txt_owner_id"):
+            errors.append("external_dns.txt_owner_id would be shared by every cluster. Leave it unset so each cluster owns its own records")
+
+    # Feature dependencies
+    if cfg.create_alb_controller and not cfg.create_eks_cluster:
+        errors.append("create_eks_cluster must be true if create_alb_controller is true")
+    if cfg.create_ingress_dns_alias and not (cfg.create_eks_cluster and cfg.create_r53_zone):
+        errors.append("create_eks_cluster and create_r53_zone must be true if create_ingress_dns_alias is true")
+    if cfg.create_external_dns and not (cfg.create_eks_cluster and cfg.create_r53_zone):
+        errors.append("create_eks_cluster and create_r53_zone must be true if create_external_dns is true")
+    if cfg.create_ebs_csi and not cfg.create_eks_cluster:
+        errors.append("create_eks_cluster must be true if create_ebs_csi is true")
+    if (cfg.create_coredns_addon or cfg.create_node_local_dns) and not cfg.create_eks_cluster:
+        errors.append("create_eks_cluster must be true if create_coredns_addon or create_node_local_dns is true")
+    if cfg.create_node_local_dns and cfg.layer != "all":
+        # The cluster layer points kubelet at the cache, the platform layer runs it; split across two
+        # stacks, nothing keeps pods from pointing at an address nothing listens on
+        errors.append(f"create_node_local_dns needs an 'all' stack, this is a '{cfg.layer}' stack")
+    if cfg.create_kube_proxy_addon and not cfg.create_eks_cluster:
+        errors.append("create_eks_cluster must be true if create_kube_proxy_addon is true")
+    if cfg.create_kube_proxy_addon and ipvs_kernel_modules(cfg.kube_proxy_settings) and cfg.layer != "all":
+        # Same split as NodeLocal DNSCache: the cluster layer loads the IPVS modules, the platform layer switches the mode
+        errors.append(f"create_kube_proxy_addon in IPVS mode needs an 'all' stack, this is a '{cfg.layer}' stack")
+    if (cfg.create_metrics_server or cfg.create_cloudwatch_observability or cfg.create_observability_dashboard) and not cfg.create_eks_cluster:
+        errors.append("create_eks_cluster must be true if create_metrics_server, create_cloudwatch_observability or "
+                      "create_observability_dashboard is true")
+    if cfg.create_api_priority_and_fairness and not cfg.create_eks_cluster:
+        errors.append("create_eks_cluster must be true if create_api_priority_and_fairness is true")
+
+    # Component settings
+    if cfg.create_efs_filesystem:
+        _check(errors, validate_efs_args, {
+            'performance_mode': cfg.efs_performance_mode,
+            'throughput_mode': cfg.efs_throughput_mode,
+            'provisioned_throughput_mibps': cfg.efs_provisioned_throughput_mibps,
+            **cfg.efs_lifecycle,
+        })
+    _check(errors, validate_efs_storage_classes, list(cfg.efs_storage_classes))
+    if cfg.create_ebs_csi:
+        _check(errors, validate_ebs_storage_classes, list(cfg.ebs_storage_classes))
+    if cfg.create_fsx_cache:
+        _check(errors, validate_fsx_args, {
+            'file_system_type': cfg.fsx_file_system_type,
+            'deployment_type': cfg.fsx_deployment_type,
+            'throughput_capacity': cfg.fsx_throughput_capacity,
+            'storage_capacity': cfg.fsx_storage_capacity,
+        })
+    _check(errors, validate_alb_controller_profile, cfg.alb_controller_profile)
+    _check(errors, validate_tls_settings, cfg.alb_webhook_tls)
+    _check(errors, validate_external_dns_settings, cfg.external_dns_settings)
+    _check(errors, validate_rds_args, cfg.database_settings)
+    _check(errors, validate_service_account_role_mode, cfg.service_account_role_mode)
+    _check(errors, validate_coredns_settings, cfg.coredns_settings)
+    _check(errors, validate_kube_proxy_settings, cfg.kube_proxy_settings)
+    _check(errors, validate_control_plane_scaling_tier, cfg.control_plane_scaling_tier)
+    _check(errors, validate_api_priority_settings, cfg.api_priority_settings)
+    _check(errors, validate_control_plane_logging, list(cfg.control_plane_log_types), cfg.control_plane_log_retention_days)
+    if cfg.create_node_local_dns or (cfg.create_kube_proxy_addon and ipvs_kernel_modules(cfg.kube_proxy_settings)):
+        # Kubelet on every node is pointed at the cache, or the nodes load the IPVS modules
+        for ami_type in sorted({cluster.eks_nodegroup_ami_type for cluster in cfg.clusters}):
+            _check(errors, validate_node_config_ami_type, ami_type)
+
+    return errors
+
+
+def check_availability_zones(cfg: StackConfig, available: Sequence[str]) -> Tuple[str, ...]:
+    """
+    The AZs to lay subnets out over: the pinned ones, or every available one.
+    Run once the region's AZs are known, since only then can the AZ count be checked.
+    """
+    errors = []
+    zones = tuple(cfg.availability_zones) or tuple(available)
+    unknown = [az for az in cfg.availability_zones if az not in available]
+    if unknown:
+        errors.append(f"availability_zones {unknown} are not available in this region ({list(available)})")
+    if cfg.create_eks_cluster and min(len(zones), cfg.private_subnet_count) < 2:
+        errors.append(f"EKS needs private subnets in at least 2 availability zones, only {list(zones)} can be used")
+    if errors:
+        raise StackConfigError(errors)
+    return zones
@@ -0,0 +1,141 @@
+import json
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from pulumi.automation import events
+
+COMPONENT_TYPE_PREFIX = "components:index:"
+
+@dataclass
+class ResourceTiming:
+    urn: str
+    type: str
+    op: str = "same"
+    # Engine event timestamps, in seconds
+    start: Optional[int] = None
+    end: Optional[int] = None
+    failed: bool = False
+    parent: Optional[str] = None
+    dependencies: List[str] = field(default_factory=list)
+
+    @property
+    def duration(self) -> int:
+        if self.start is None or self.end is None:
+            return 0
+        return self.end - self.start
+
+    @property
+    def name(self) -> str:
+        return self.urn.split("::")[-1]
+
+class DeploymentTimer:
+    """
+    Collects per-resource start/finish times from the engine event stream (pass `on_event` to
+    `stack.up`). The events carry no dependency information, so the edges are added afterwards from
+    the exported stack state with `add_state`.
+    """
+    def __init__(self):
+        self.resources: Dict[str, ResourceTiming] = {}
+        self.started: Optional[int] = None
+        self.finished: Optional[int] = None
+
+    def _timing(self, metadata: events.StepEventMetadata) -> ResourceTiming:
+        timing = self.resources.get(metadata.urn)
+        if timing is None:
+            timing = self.resources[metadata.urn] = ResourceTiming(urn=metadata.urn, type=metadata.type)
+        timing.op = metadata.op.value if hasattr(metadata.op, "value") else str(metadata.op)
+        return timing
+
+    def on_event(self, event: events.EngineEvent) -> None:
+        if self.started is None:
+            self.started = event.timestamp
+        self.finished = event.timestamp
+
+        if event.resource_pre_event and not event.resource_pre_event.planning:
+            self._timing(event.resource_pre_event.metadata).start = event.timestamp
+        elif event.res_outputs_event and not event.res_outputs_event.planning:
+            self._timing(event.res_outputs_event.metadata).end = event.timestamp
+        elif event.res_op_failed_event:
+            timing = self._timing(event.res_op_failed_event.metadata)
+            timing.end = event.timestamp
+            timing.failed = True
+
+    def add_state(self, resources: Sequence[Dict[str, Any]]) -> None:
+        """Dependencies and parents from `stack.export_stack().deployment["resources"]`."""
+        for resource in resources:
+            timing = self.resources.get(resource["urn"])
+            if timing is None:
+                timing = self.resources[resource["urn"]] = ResourceTiming(urn=resource["urn"], type=resource["type"])
+            timing.parent = resource.get("parent")
+            dependencies = list(resource.get("dependencies") or [])
+            # A resource also waits for its provider, e.g. everything on the k8s provider waits for the cluster
+            if resource.get("provider"):
+                # Provider references are '<urn>::<id>'
+                dependencies.append(resource["provider"].rsplit("::", 1)[0])
+            timing.dependencies = dependencies
+
+    def component_of(self, urn: str) -> Optional[str]:
+        """The nearest enclosing component (Vpc, Eks, EksNodesEc2, ...) of a resource."""
+        timing = self.resources.get(urn)
+        while timing is not None:
+            if timing.type.startswith(COMPONENT_TYPE_PREFIX):
+                return timing.type[len(COMPONENT_TYPE_PREFIX):]
+            timing = self.resources.get(timing.parent) if timing.parent else None
+        return None
+
+    def critical_path(self) -> List[ResourceTiming]:
+        """
+        Walks back from the resource that finished last, each time to the dependency that finished
+        last - the one it actually waited for. Components are skipped, they finish when their children do.
+        """
+        timed = {
+            urn: t for urn, t in self.resources.items()
+            if t.end is not None and not t.type.startswith(COMPONENT_TYPE_PREFIX) and t.type != "pulumi:pulumi:Stack"
+        }
+        if not timed:
+            return []
+
+        path = []
+        current = max(timed.values(), key=lambda t: t.end)
+        while current is not None:
+            path.append(current)
+            blockers = [timed[d] for d in current.dependencies if d in timed and timed[d].end <= (current.start or current.end)]
+            current = max(blockers, key=lambda t: t.end) if blockers else None
+        return list(reversed(path))
+
+    def report(self) -> Dict[str, Any]:
+        path = self.critical_path()
+        by_component: Dict[str, int] = {}
+        for timing in path:
+            component = self.component_of(timing.urn) or "(stack)"
+            by_component[component] = by_component.get(component, 0) + timing.duration
+
+        return {
+            "total_seconds": (self.finished - self.started) if self.started is not None else 0,
+            "critical_path": [{
+                "urn": t.urn,
+                "component": self.component_of(t.urn),
+                "op": t.op,
+                "seconds": t.duration,
+            } for t in path],
+            "critical_path_by_component": dict(sorted(by_component.items(), key=lambda kv: -kv[1])),
+            "resources": [
+                {**asdict(t), "component": self.component_of(t.urn), "seconds": t.duration}
+                for t in sorted(self.resources.values(), key=lambda t: (t.start is None, t.start or 0))
+            ],
+        }
+
+    def write(self, path: str) -> Dict[str, Any]:
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+def format_summary(report: Dict[str, Any]) -> str:
+    lines = [f"Update took {report['total_seconds']}s. Critical path:"]
+    for step in report["critical_path"]:
+        lines.append(f"  {step['seconds']:>5}s  {step['component'] or '-':<14} {step['urn'].split('::')[-1]} ({step['op']})")
+    lines.append("By component:")
+    for component, seconds in report["critical_path_by_component"].items():
+        lines.append(f"  {seconds:>5}s  {component}")
+    return "\n".join(lines)
@@ -1,8 +1,13 @@
 import pulumi
 from typing import Optional, Sequence, TypedDict
 import pulumi_aws as aws
+from modules.providers import Providers
 
 
+def subnet_azs(availability_zones: Sequence[str], count: int) -> list:
+    """Subnets are spread round-robin over the AZs, so more subnets than AZs share an AZ."""
+    return [availability_zones[i % len(availability_zones)] for i in range(count)]
+
 class VpcArgs(TypedDict):
     cidr_block: str
     public_subnet_count: int
@@ -11,14 +16,24 @@ class VpcArgs(TypedDict):
     enable_dns_support: bool
     availability_zones: Sequence[str]
     resource_prefix: str
+    # Every EKS cluster sharing the VPC, for the kubernetes.io/cluster/<name> tags
+    cluster_names: Sequence[str]
 
 class Vpc(pulumi.ComponentResource):
-    def __init__(self, provider: aws.Provider, name: str, args: VpcArgs, opts: Optional[pulumi.ResourceOptions] = None):
+    def __init__(self, providers: Providers, name: str, args: VpcArgs, opts: Optional[pulumi.ResourceOptions] = None):
         super().__init__("components:index:Vpc", name, args, opts)
 
         resource_prefix = args["resource_prefix"]
-        child_opts = pulumi.ResourceOptions(parent=self, provider=provider)
+        child_opts = pulumi.ResourceOptions(parent=self, provider=providers.aws)
         subnet_cidr_prefix = ".".join(args["cidr_block"].split(".")[:2])
+        availability_zones = args["availability_zones"]
+        cluster_tags = {
+            f"kubernetes.io/cluster/{cluster_name}": "shared"
+            for cluster_name in [resource_prefix, *args.get("cluster_names", [])]
+        }
+
+        private_subnet_azs = subnet_azs(availability_zones, args["private_subnet_count"])
+        public_subnet_azs = subnet_azs(availability_zones, args["public_subnet_count"])
 
         # VPC
         main = aws.ec2.Vpc(
@@ -28,7 +43,7 @@ class Vpc(pulumi.ComponentResource):
             enable_dns_hostnames=args["enable_dns_hostnames"],
             tags={
                 "Name": f"{resource_prefix}-vpc",
-                f"kubernetes.io/cluster/{resource_prefix}": "shared",
+                **cluster_tags,
             },
             opts=child_opts,
         )
@@ -39,12 +54,12 @@ class Vpc(pulumi.ComponentResource):
             private_sn.append(
                 aws.ec2.Subnet(
                     f"{name}-private-sn-{i}",
-                    availability_zone=args["availability_zones"][i],
+                    availability_zone=private_subnet_azs[i],
                     cidr_block=f"{subnet_cidr_prefix}.{int(i) * 16}.0/20",
                     vpc_id=main.id,
                     tags={
                         "Name": f"{resource_prefix}-private-sn-{i}",
-                        f"kubernetes.io/cluster/{resource_prefix}": "shared",
+                        **cluster_tags,
                         "kubernetes.io/role/internal-elb": "1",
                     },
                     opts=child_opts,
@@ -58,13 +73,13 @@ class Vpc(pulumi.ComponentResource):
             public_sn.append(
                 aws.ec2.Subnet(
                     f"{name}-public-sn-{i}",
-                    availability_zone=args["availability_zones"][i],
+                    availability_zone=public_subnet_azs[i],
                     cidr_block=f"{subnet_cidr_prefix}.{_num * 16}.0/20",
                     vpc_id=main.id,
                     map_public_ip_on_launch=True,
                     tags={
                         "Name": f"{resource_prefix}-public-sn-{i}",
-                        f"kubernetes.io/cluster/{resource_prefix}": "shared",
+                        **cluster_tags,
                         "kubernetes.io/role/elb": "1",
                     },
                     opts=child_opts,
@@ -121,25 +136,32 @@ class Vpc(pulumi.ComponentResource):
             opts=child_opts,
         )
 
+        private_rtbas = []
         for i, sn in enumerate(private_sn):
-            aws.ec2.RouteTableAssociation(
+            private_rtbas.append(aws.ec2.RouteTableAssociation(
                 f"{name}-private-rtba-{i}",
                 subnet_id=sn.id,
                 route_table_id=private_rtb.id,
                 opts=child_opts,
-            )
+            ))
 
         # Outputs
         self.vpc_id = main.id
         self.public_subnet_ids = [sn.id for sn in public_sn]
         self.private_subnet_ids = [sn.id for sn in private_sn]
+        self.private_subnet_azs = private_subnet_azs
+        self.private_route_table_id = private_rtb.id
         self.vpc_cidr_block = main.cidr_block
         self.nat_public_ip = nat_cd_gw.public_ip
+        # Private subnets only have egress (ECR, EKS API) once these exist - what node groups wait for
+        self.private_network_dependencies = [private_rtb, *private_rtbas]
 
         self.register_outputs({
             "vpc_id": self.vpc_id,
             "public_subnet_ids": self.public_subnet_ids,
             "private_subnet_ids": self.private_subnet_ids,
+            "private_subnet_azs": self.private_subnet_azs,
+            "private_route_table_id": self.private_route_table_id,
             "vpc_cidr_block": self.vpc_cidr_block,
             "nat_public_ip": self.nat_public_ip,
         })
\ No newline at end of file
@@ -7,20 +7,50 @@ Usage:
     pip install pytest
     pytest tests/test_infra.py -v
 """
+import json
 import pulumi
 
 # ---------------------------------------------------------------------------
 # Mocks
 # ---------------------------------------------------------------------------
+# Outputs of the lower layers, keyed by the last '-' part of the referenced stack name
+STACK_REFERENCE_OUTPUTS = {
+    "network": {
+        "vpc_id": "vpc-network123",
+        "vpc_cidr_block": "10.0.0.0/16",
+        "nat_public_ip": "198.51.100.7",
+        "private_subnet_ids": ["subnet-net-0", "subnet-net-1"],
+        "private_subnet_azs": ["us-east-1a", "us-east-1b"],
+        "private_route_table_id": "rtb-network123",
+        "hosted_zone_id": "Z0NETWORKZONE",
+    },
+    "cluster": {
+        "eks_cluster_name": "layered",
+        "eks_cluster_endpoint": "https://layered.eks.amazonaws.com",
+        "eks_certificate_authority": "LS0tLS1CRUdJTi1DRVJU",
+        "oidc_provider_arn": "arn:aws:iam::123456789012:oidc-provider/oidc.eks.us-east-1.amazonaws.com/id/LAYERED",
+        "oidc_provider_url": "oidc.eks.us-east-1.amazonaws.com/id/LAYERED",
+        "efs_file_system_id": "fs-layered123",
+    },
+}
+
 class PulumiEksMocks(pulumi.runtime.Mocks):
     """
     Mocks for every resource type and provider function used by the
     pulumi-eks project.
     """
 
+    def __init__(self):
+        # Resources and invokes that don't name a provider. A real engine would create a default
+        # provider for them, which the stacks disable.
+        self.default_provider_uses = []
+
     def new_resource(self, args: pulumi.runtime.MockResourceArgs):
         outputs = {**args.inputs}
 
+        if args.custom and not args.provider and not args.typ.startswith("pulumi:"):
+            self.default_provider_uses.append(f"{args.typ} {args.name}")
+
         # ── AWS IAM ──────────────────────────────────────────────
         if args.typ == "aws:iam/role:Role":
             outputs["arn"] = f"arn:aws:iam::123456789012:role/{args.name}"
@@ -97,6 +127,10 @@ class PulumiEksMocks(pulumi.runtime.Mocks):
         elif args.typ == "aws:eks/addon:Addon":
             outputs["addonName"] = outputs.get("addonName", "aws-efs-csi-driver")
 
+        elif args.typ == "aws:eks/podIdentityAssociation:PodIdentityAssociation":
+            outputs["associationId"] = f"a-{args.name}"
+            outputs["associationArn"] = f"arn:aws:eks:us-east-1:123456789012:podidentityassociation/{outputs.get('clusterName')}/a-{args.name}"
+
         # ── AWS EFS ──────────────────────────────────────────────
         elif args.typ == "aws:efs/fileSystem:FileSystem":
             outputs["id"] = "fs-mock123"
@@ -105,6 +139,42 @@ class PulumiEksMocks(pulumi.runtime.Mocks):
         elif args.typ == "aws:efs/mountTarget:MountTarget":
             outputs["id"] = f"fsmt-mock-{args.name}"
 
+        # ── AWS FSx ──────────────────────────────────────────────
+        elif args.typ == "aws:fsx/openZfsFileSystem:OpenZfsFileSystem":
+            outputs["id"] = "fs-openzfs-mock123"
+            outputs["dnsName"] = "fs-openzfs-mock123.fsx.us-east-1.amazonaws.com"
+            outputs["rootVolumeId"] = "fsvol-mock123"
+
+        elif args.typ == "aws:fsx/lustreFileSystem:LustreFileSystem":
+            outputs["id"] = "fs-lustre-mock123"
+            outputs["dnsName"] = "fs-lustre-mock123.fsx.us-east-1.amazonaws.com"
+            outputs["mountName"] = "abcdefgh"
+
+        # ── AWS RDS / Secrets Manager ────────────────────────────
+        elif args.typ == "aws:rds/cluster:Cluster":
+            outputs["endpoint"] = f"{args.name}.cluster-mock.us-east-1.rds.amazonaws.com"
+            outputs["readerEndpoint"] = f"{args.name}.cluster-ro-mock.us-east-1.rds.amazonaws.com"
+            outputs["clusterIdentifier"] = outputs.get("clusterIdentifier", args.name)
+            outputs["engineVersion"] = outputs.get("engineVersion", "8.0.mysql_aurora.3.08.0")
+
+        elif args.typ == "aws:rds/instance:Instance":
+            outputs["address"] = f"{args.name}.mock.us-east-1.rds.amazonaws.com"
+            outputs["endpoint"] = f"{outputs['address']}:{outputs.get('port', 3306)}"
+
+        elif args.typ == "aws:rds/proxy:Proxy":
+            outputs["endpoint"] = f"{outputs.get('name', args.name)}.proxy-mock.us-east-1.rds.amazonaws.com"
+
+        elif args.typ == "aws:secretsmanager/secret:Secret":
+            outputs["arn"] = f"arn:aws:secretsmanager:us-east-1:123456789012:secret:{args.name}"
+
+        elif args.typ == "random:index/randomPassword:RandomPassword":
+            outputs["result"] = "mock-password-0123456789abcdef"
+
+        # ── Stack references (layered stacks) ────────────────────
+        elif args.typ == "pulumi:pulumi:StackReference":
+            outputs["outputs"] = STACK_REFERENCE_OUTPUTS.get(args.name.rsplit("-", 1)[-1], {})
+            outputs["secretOutputNames"] = []
+
         # ── AWS Route53 / ACM ────────────────────────────────────
         elif args.typ == "aws:route53/zone:Zone":
             outputs["id"] = "Z0123456789MOCK"
@@ -118,13 +188,15 @@ class PulumiEksMocks(pulumi.runtime.Mocks):
 
         elif args.typ == "aws:acm/certificate:Certificate":
             outputs["arn"] = f"arn:aws:acm:us-east-1:123456789012:certificate/mock-cert"
+            # ACM returns one DVO per name; '*.x' and 'x' share the same record
             outputs["domainValidationOptions"] = [
                 {
-                    "domainName": "*.example.com",
-                    "resourceRecordName": "_abc.example.com",
+                    "domainName": domain,
+                    "resourceRecordName": f"_abc.{domain.removeprefix('*.')}.",
                     "resourceRecordType": "CNAME",
                     "resourceRecordValue": "_xyz.acm-validations.aws.",
                 }
+                for domain in [outputs.get("domainName", "*.example.com"), *outputs.get("subjectAlternativeNames", [])]
             ]
 
         elif args.typ == "aws:acm/certificateValidation:CertificateValidation":
@@ -148,12 +220,14 @@ class PulumiEksMocks(pulumi.runtime.Mocks):
 
         elif args.typ == "tls:index/selfSignedCert:SelfSignedCert":
             outputs["certPem"] = "-----BEGIN CERTIFICATE-----\nMOCKCA\n-----END CERTIFICATE-----\n"
+            outputs["validityEndTime"] = "2035-01-01T00:00:00Z"
 
         elif args.typ == "tls:index/certRequest:CertRequest":
             outputs["certRequestPem"] = "-----BEGIN CERTIFICATE REQUEST-----\nMOCK\n-----END CERTIFICATE REQUEST-----\n"
 
         elif args.typ == "tls:index/locallySignedCert:LocallySignedCert":
             outputs["certPem"] = "-----BEGIN CERTIFICATE-----\nMOCKSERVER\n-----END CERTIFICATE-----\n"
+            outputs["validityEndTime"] = "2026-01-01T00:00:00Z"
 
         # ── Kubernetes ───────────────────────────────────────────
         elif args.typ == "pulumi:providers:kubernetes":
@@ -168,6 +242,10 @@ class PulumiEksMocks(pulumi.runtime.Mocks):
         elif args.typ == "kubernetes:helm.sh/v4:Chart":
             pass
 
+        elif args.typ == "kubernetes:networking.k8s.io/v1:Ingress":
+            # Read with Ingress.get(): the status the aws-load-balancer-controller published
+            outputs["status"] = {"loadBalancer": {"ingress": [{"hostname": "k8s-core-mock-1234567890.us-east-1.elb.amazonaws.com"}]}}
+
         elif args.typ == "kubernetes:storage.k8s.io/v1:StorageClass":
             outputs["id"] = f"sc-{args.name}"
 
@@ -187,6 +265,9 @@ class PulumiEksMocks(pulumi.runtime.Mocks):
 
 
     def call(self, args: pulumi.runtime.MockCallArgs):
+        if not args.provider:
+            self.default_provider_uses.append(args.token)
+
         # aws.get_caller_identity()
         if args.token == "aws:index/getCallerIdentity:getCallerIdentity":
             return {
@@ -219,6 +300,26 @@ class PulumiEksMocks(pulumi.runtime.Mocks):
                 "zoneId": "Z9999999PARENT",
             }
 
+        # aws.eks.get_addon_version()
+        if args.token == "aws:eks/getAddonVersion:getAddonVersion":
+            return {
+                "addonName": args.args.get("addonName"),
+                "kubernetesVersion": args.args.get("kubernetesVersion"),
+                "version": "v2.3.0-eksbuild.1",
+                "id": args.args.get("addonName"),
+            }
+
+        # command.local.run(): `aws eks describe-addon-versions` lists the compatible addon versions
+        if args.token == "command:local:run":
+            stdout = ""
+            if "describe-addon-versions" in args.args.get("command", ""):
+                stdout = json.dumps(["v2.1.0-eksbuild.1", "v2.3.0-eksbuild.1", "v2.2.0-eksbuild.1"])
+            return {"command": args.args.get("command"), "stdout": stdout, "stderr": ""}
+
+        # aws.lb.get_hosted_zone_id()
+        if args.token == "aws:lb/getHostedZoneId:getHostedZoneId":
+            return {"id": "Z35SXDOTRQ7X7K"}
+
         # std.concat
         if args.token == "std:index:concat":
             # Flatten the input lists
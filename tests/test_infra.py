@@ -1,23 +1,44 @@
 import pulumi
+import pytest
 from mocks import PulumiEksMocks
 import json
+import asyncio
 import importlib.util
 import os
+import tempfile
+import hashlib
+import base64
+from dataclasses import replace
+
+ADDON_VERSION_CACHE = os.path.join(tempfile.mkdtemp(), "addon-versions.json")
+
+# Pre-populated chart cache so the program never reaches out to the chart repo
+CHART_CACHE_DIR = tempfile.mkdtemp()
+ALB_CHART_ARCHIVE = os.path.join(CHART_CACHE_DIR, "aws-load-balancer-controller-1.13.0.tgz")
+with open(ALB_CHART_ARCHIVE, "wb") as _f:
+    _f.write(b"mock chart archive")
+with open(f"{ALB_CHART_ARCHIVE}.sha256", "w") as _f:
+    _f.write(hashlib.sha256(b"mock chart archive").hexdigest())
+with open(os.path.join(CHART_CACHE_DIR, "external-dns-1.15.0.tgz"), "wb") as _f:
+    _f.write(b"mock chart archive")
+with open(os.path.join(CHART_CACHE_DIR, "metrics-server-3.12.2.tgz"), "wb") as _f:
+    _f.write(b"mock chart archive")
 
 # ---------------------------------------------------------------------------
 # Set up mocks and config BEFORE importing the Pulumi program
 # ---------------------------------------------------------------------------
+MOCKS = PulumiEksMocks()
 pulumi.runtime.set_mocks(
-    PulumiEksMocks(),
+    MOCKS,
     preview=False,
     project="pulumi-eks",
     stack="cbci",
 )
 
 # Set required config values
-pulumi.runtime.set_all_config({
+CONFIG = {
     "pulumi-eks:resource_prefix": "test-cluster",
-    "pulumi-eks:vpc_cidr_block": "10.0.0.0/20",
+    "pulumi-eks:vpc_cidr_block": "10.0.0.0/16",
     "pulumi-eks:kubernetes_version": "1.31",
     "pulumi-eks:zone_name": "test.example.com",
     "pulumi-eks:storage_class_name": "efs-sc-1000",
@@ -26,11 +47,54 @@ pulumi.runtime.set_all_config({
     "pulumi-eks:create_eks_cluster": "true",
     "pulumi-eks:create_alb_controller": "true",
     "pulumi-eks:create_efs_filesystem": "true",
+    "pulumi-eks:create_ebs_csi": "true",
+    "pulumi-eks:create_fsx_cache": "true",
+    "pulumi-eks:create_database": "true",
+    "pulumi-eks:database_read_replica_count": "2",
+    "pulumi-eks:database_monitoring_interval": "30",
+    "pulumi-eks:database_performance_insights": "true",
+    "pulumi-eks:fsx_throughput_capacity": "320",
     "pulumi-eks:create_r53_zone": "true",
     "pulumi-eks:route53_wait_for_validation": "true",
+    "pulumi-eks:create_ingress_dns_alias": "true",
+    "pulumi-eks:subject_alternative_names": json.dumps(["test.example.com", "example.com", "*.test.example.com"]),
+    "pulumi-eks:create_external_dns": "true",
+    "pulumi-eks:external_dns_chart_digest": hashlib.sha256(b"mock chart archive").hexdigest(),
+    "pulumi-eks:control_plane_log_types": json.dumps(["api", "audit", "scheduler"]),
+    "pulumi-eks:control_plane_log_retention_days": "14",
+    "pulumi-eks:create_metrics_server": "true",
+    "pulumi-eks:metrics_server_chart_digest": hashlib.sha256(b"mock chart archive").hexdigest(),
+    "pulumi-eks:create_cloudwatch_observability": "true",
+    "pulumi-eks:create_observability_dashboard": "true",
+    "pulumi-eks:create_api_priority_and_fairness": "true",
+    "pulumi-eks:ci_namespace": "core",
     "pulumi-eks:myip": "203.0.113.50/32",
+    "pulumi-eks:efs_throughput_mode": "elastic",
+    "pulumi-eks:addon_version_cache": ADDON_VERSION_CACHE,
+    "pulumi-eks:chart_cache_dir": CHART_CACHE_DIR,
     "aws:region": "us-east-1",
-})
+    # A second, broken stack read through pulumi.Config("badstack") by TestStackConfig
+    "badstack:resource_prefix": "bad",
+    "badstack:kubernetes_version": "1.31",
+    "badstack:storage_class_name": "efs-sc",
+    "badstack:eks_node_group_instance_types": json.dumps(["t3.xlarge"]),
+    "badstack:storage_mount_options": json.dumps(["tls"]),
+    "badstack:vpc_cidr_block": "10.0.0.0/16",
+    "badstack:public_subnet_count": "two",
+    "badstack:create_database": "maybe",
+}
+pulumi.runtime.set_all_config(CONFIG)
+
+# depends_on and inputs of every resource the program registers, by resource name
+DEPENDS_ON = {}
+RESOURCE_PROPS = {}
+ALIASES = {}
+def _record_depends_on(args):
+    DEPENDS_ON[args.name] = list(args.opts.depends_on or [])
+    RESOURCE_PROPS[args.name] = args.props
+    ALIASES[args.name] = list(args.opts.aliases or [])
+    return None
+pulumi.runtime.register_stack_transformation(_record_depends_on)
 
 _spec = importlib.util.spec_from_file_location(
     "pulumi_program",
@@ -43,11 +107,226 @@ except Exception as e:
     print(f"ERROR loading __main__.py: {e}")
     raise
 
+# The same program as a platform-layer stack, reading the network and cluster stacks via StackReferences.
+# Config is only read while the program loads, so it's restored right after.
+pulumi.runtime.set_all_config({
+    **CONFIG,
+    "pulumi-eks:resource_prefix": "layered",
+    "pulumi-eks:layer": "platform",
+    "pulumi-eks:network_stack": "org/pulumi-eks/dev-network",
+    "pulumi-eks:cluster_stack": "org/pulumi-eks/dev-cluster",
+    "pulumi-eks:create_fsx_cache": "false",
+    "pulumi-eks:create_database": "false",
+})
+platform = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(platform)
+
+# Two clusters sharing one VPC, their controllers using EKS Pod Identity instead of IRSA, their
+# pods resolving through NodeLocal DNSCache and kube-proxy in IPVS mode, on a larger control plane,
+# sharing an FSx for Lustre build cache
+pulumi.runtime.set_all_config({
+    **CONFIG,
+    "pulumi-eks:resource_prefix": "fleet",
+    "pulumi-eks:kubernetes_upgrade_policy": "EXTENDED",
+    "pulumi-eks:control_plane_scaling_tier": "tier-xl",
+    "pulumi-eks:api_priority": json.dumps({"agent_namespace": "agents", "agent_shares": 10}),
+    "pulumi-eks:service_account_role_mode": "pod-identity",
+    "pulumi-eks:create_coredns_addon": "true",
+    "pulumi-eks:create_node_local_dns": "true",
+    "pulumi-eks:create_kube_proxy_addon": "true",
+    "pulumi-eks:kube_proxy": json.dumps({"ipvs_scheduler": "lc"}),
+    "pulumi-eks:clusters": json.dumps([
+        {"name": "team-a"},
+        {"name": "team-b", "kubernetes_version": "1.30", "eks_nodes_per_nodegroup": 2},
+    ]),
+    "pulumi-eks:create_fsx_cache": "true",
+    "pulumi-eks:fsx_file_system_type": "lustre",
+    "pulumi-eks:fsx_deployment_type": "PERSISTENT_2",
+    "pulumi-eks:fsx_throughput_capacity": "250",
+    "pulumi-eks:fsx_storage_capacity": "1200",
+    "pulumi-eks:create_database": "false",
+})
+fleet = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fleet)
+pulumi.runtime.set_all_config(CONFIG)
+
+from modules.efs import Efs, validate_efs_args
+from modules.fsx import Fsx, validate_fsx_args
+from modules.addon_versions import AddonVersionResolver
+from modules.rds import validate_rds_args, rds_parameters
+from modules.stack_config import ClusterConfig, StackConfigError, check_availability_zones, load_stack_config, validate_stack_config
+from modules.chart_cache import ChartCache, ChartCacheError
+from modules import automation
+from modules.automation import StackContext, alb_inbound_cidrs, helm_values_env, read_stack, render_values
+from modules.timing import DeploymentTimer
+from pulumi.automation import events
+from modules.external_dns import validate_external_dns_settings
+from modules.lb import alb_controller_profile_values, validate_alb_controller_profile, validate_tls_settings
+from modules.eks_addons import validate_ebs_storage_classes, validate_efs_mount_options, validate_efs_storage_classes
+from modules.service_account_role import trust_policy, validate_service_account_role_mode
+from modules.dns import coredns_configuration_values, validate_coredns_settings
+from modules.eks_nodes_ec2 import node_user_data
+from modules.kube_proxy import ipvs_kernel_modules, kube_proxy_configuration_values, validate_kube_proxy_settings
+from modules.eks import validate_control_plane_logging, validate_control_plane_scaling_tier
+from modules.api_priority import effective_api_priority_settings, validate_api_priority_settings
+from modules.observability import dashboard_body
+from modules.route53 import ingress_hostname
+import pulumi_kubernetes as k8s
+
 
 # ---------------------------------------------------------------------------
 # Tests
 # ---------------------------------------------------------------------------
 
+class TestStackConfig:
+    def test_defaults_keep_public_access(self):
+        assert infra.cfg.cluster_enable_public_access is True
+        assert infra.cfg.enable_dns_support is True
+        assert infra.cfg.cluster_access_cidrs == ("203.0.113.50/32",)
+
+    def test_config_is_frozen(self):
+        with pytest.raises(AttributeError):
+            infra.cfg.private_subnet_count = 3
+
+    def test_read_errors_reported_together(self):
+        with pytest.raises(StackConfigError) as e:
+            load_stack_config(pulumi.Config("badstack"))
+        assert "'zone_name' is required" in e.value.errors
+        assert any("public_subnet_count" in err for err in e.value.errors)
+        assert any("create_database" in err for err in e.value.errors)
+
+    def test_all_errors_reported_together(self):
+        cfg = infra.cfg.__class__(**{
+            **{f: getattr(infra.cfg, f) for f in infra.cfg.__slots__},
+            'vpc_cidr_block': "10.0.0.0/24",
+            'private_subnet_count': 1,
+            'eks_nodes_per_nodegroup': 3,
+            'eks_max_nodes_per_nodegroup': 2,
+            'cluster_enable_public_access': False,
+            'create_asg_schedule': True,
+            'asg_schedule': {},
+        })
+        errors = validate_stack_config(cfg)
+        assert any("too small" in err for err in errors)
+        assert any("2 availability zones" in err for err in errors)
+        assert any("eks_max_nodes_per_nodegroup" in err for err in errors)
+        assert any("cluster_enable_public_access" in err for err in errors)
+        assert any("asg_schedule" in err for err in errors)
+
+    def test_pinned_availability_zones_must_exist(self):
+        with pytest.raises(StackConfigError):
+            check_availability_zones(infra.cfg, ["us-east-1a"])
+
+
+class TestLayers:
+    def test_platform_layer_skips_lower_layers(self):
+        assert not hasattr(platform, "vpc")
+        assert not hasattr(platform, "eks")
+        assert not hasattr(platform, "rds")
+        assert hasattr(platform, "alb")
+
+    @pulumi.runtime.test
+    def test_platform_reads_cluster_outputs(self):
+        def check(args):
+            oidc_arn, role_arn = args
+            assert oidc_arn.endswith("/LAYERED")
+            assert role_arn is not None
+        return pulumi.Output.all(platform.oidc_provider_arn, platform.alb.lb_controller_role_arn).apply(check)
+
+    @pulumi.runtime.test
+    def test_platform_reads_network_outputs(self):
+        def check(zone_id):
+            assert zone_id == "Z0NETWORKZONE"
+        return platform.hosted_zone_id.apply(check)
+
+    def test_upper_layers_need_stack_references(self):
+        cfg = infra.cfg.__class__(**{
+            **{f: getattr(infra.cfg, f) for f in infra.cfg.__slots__},
+            'layer': "platform",
+        })
+        errors = validate_stack_config(cfg)
+        assert any("network_stack" in err for err in errors)
+        assert any("cluster_stack" in err for err in errors)
+
+
+class TestClusters:
+    def test_single_cluster_by_default(self):
+        assert [c.cluster_name for c in infra.cfg.clusters] == ["test-cluster"]
+        assert "test-cluster-eks" in DEPENDS_ON
+
+    def test_one_network_per_stack(self):
+        assert "fleet-vpc" in DEPENDS_ON
+        assert list(fleet.eks_clusters) == ["team-a", "team-b"]
+        assert "fleet-team-a-eks-main" in DEPENDS_ON and "fleet-team-b-eks-main" in DEPENDS_ON
+        assert not any(name.startswith("fleet-team-") and name.endswith("-vpc") for name in DEPENDS_ON)
+
+    def test_subnets_tagged_for_every_cluster(self):
+        tags = RESOURCE_PROPS["fleet-vpc-private-sn-0"]["tags"]
+        assert tags["kubernetes.io/cluster/fleet-team-a"] == "shared"
+        assert tags["kubernetes.io/cluster/fleet-team-b"] == "shared"
+
+    def test_cluster_settings_override_stack_settings(self):
+        assert RESOURCE_PROPS["fleet-team-a-eks-main"]["version"] == "1.31"
+        assert RESOURCE_PROPS["fleet-team-b-eks-main"]["version"] == "1.30"
+        assert RESOURCE_PROPS["fleet-team-b-eks-nodes-node-0"]["scaling_config"]["desired_size"] == 2
+
+    def test_clusters_have_own_security_groups_and_platform(self):
+        for team in ["team-a", "team-b"]:
+            assert RESOURCE_PROPS[f"fleet-{team}-eks-eks_sg"]["name"] == f"fleet-{team}_eks_sg"
+            for component in ["k8s-provider", "efs-addon", "ebs-addon", "alb-controller", "external-dns"]:
+                assert f"fleet-{team}-{component}" in DEPENDS_ON
+        # The CI ingress and its wildcard record are on the first cluster only
+        assert "fleet-team-a-ingress-dns" in DEPENDS_ON
+        assert "fleet-team-b-ingress-dns" not in DEPENDS_ON
+
+    def test_clusters_do_not_wait_for_each_other(self):
+        for name, deps in DEPENDS_ON.items():
+            for team, other in [("team-a", "team-b"), ("team-b", "team-a")]:
+                if name.startswith(f"fleet-{team}-"):
+                    assert not any(r._name.startswith(f"fleet-{other}-") for r in deps), name
+
+    def test_outputs_per_cluster(self):
+        assert set(fleet.cluster_outputs) == {"team-a", "team-b"}
+        assert "eks_cluster_endpoint" in fleet.cluster_outputs["team-b"]
+
+    def test_cluster_entries_are_checked(self):
+        cluster = ClusterConfig(name="team-a", cluster_name="test-cluster-team-a", kubernetes_version="1.31",
+            eks_node_group_instance_types=(), eks_nodes_per_nodegroup=3,
+            eks_max_nodes_per_nodegroup=2, eks_nodegroup_ami_type="AL2023_x86_64_STANDARD")
+        cfg = infra.cfg.__class__(**{
+            **{f: getattr(infra.cfg, f) for f in infra.cfg.__slots__},
+            'layer': "cluster",
+            'network_stack': "org/pulumi-eks/dev-network",
+            'clusters': (cluster, cluster),
+        })
+        errors = validate_stack_config(cfg)
+        assert any("unique" in err for err in errors)
+        assert any("instance type" in err for err in errors)
+        assert any("eks_nodes_per_nodegroup" in err for err in errors)
+        assert any("'all' stack" in err for err in errors)
+
+    def test_kubeconfig_resources_keep_names_on_primary_cluster(self):
+        for resource in ["create_kubeconfig", "create_kubeconfig_provisioner_0"]:
+            assert [a.name for a in ALIASES[f"test-cluster-eks-{resource}"]] == [resource]
+            assert ALIASES[f"fleet-team-b-eks-{resource}"] == []
+
+class TestProviders:
+    @pulumi.runtime.test
+    def test_no_default_providers(self):
+        """Every resource and invoke names its provider, so the engine never creates an untagged default one."""
+        def check(_):
+            assert MOCKS.default_provider_uses == []
+        # Registrations reach the mocks asynchronously; the programs' outputs resolve once they have
+        outputs = [value for program in (infra, platform, fleet) for cluster in program.cluster_outputs.values() for value in cluster.values()]
+        return pulumi.Output.all(*outputs).apply(check)
+
+    def test_one_provider_per_target(self):
+        assert infra.providers.aws.package == "aws"
+        assert infra.providers.tls.package == "tls"
+        assert infra.providers.k8s is None  # Only the per-cluster copies carry a Kubernetes provider
+        assert fleet.cluster_providers.aws is fleet.providers.aws
+
+
 class TestVpc:
     @pulumi.runtime.test
     def test_vpc_is_created(self):
@@ -104,6 +383,29 @@ class TestEksCluster:
             assert arn.startswith("arn:aws:iam:")
         return infra.eks.aws_iam_role_node_arn.apply(check)
 
+    def test_upgrade_policy_support_type(self):
+        assert RESOURCE_PROPS["test-cluster-eks-main"]["upgrade_policy"] == {"support_type": "STANDARD"}
+        assert RESOURCE_PROPS["fleet-team-a-eks-main"]["upgrade_policy"] == {"support_type": "EXTENDED"}
+
+    @pulumi.runtime.test
+    def test_upgrade_support_type_exported(self):
+        def check(support_type):
+            assert support_type == "EXTENDED"
+        return fleet.cluster_outputs["team-b"]["upgrade_support_type"].apply(check)
+
+    def test_control_plane_scaling_tier(self):
+        # The standard tier needs nothing set
+        assert "test-cluster-eks-control-plane-scaling" not in DEPENDS_ON
+        command = RESOURCE_PROPS["fleet-team-a-eks-control-plane-scaling"]
+        assert "--name fleet-team-a" in command["create"]
+        assert "--control-plane-scaling-config tier=tier-xl" in command["create"]
+        assert command["update"] == command["create"]
+        assert "tier=standard" in command["delete"]
+        assert [r._name for r in DEPENDS_ON["fleet-team-a-eks-control-plane-scaling"]] == ["fleet-team-a-eks-main"]
+        assert fleet.cluster_outputs["team-a"]["control_plane_scaling_tier"] == "tier-xl"
+        with pytest.raises(ValueError):
+            validate_control_plane_scaling_tier("tier-8xl")
+
 
 class TestEksNodes:
     @pulumi.runtime.test
@@ -120,6 +422,42 @@ class TestEksNodes:
         return pulumi.Output.all(*infra.eks_nodes_ec2.eks_nodegroup_ids).apply(check)
 
 
+class TestDependencyGraph:
+    """Edges are on the resources that are actually needed, never on whole components."""
+    def _depends_on(self, name):
+        return [r._name for r in DEPENDS_ON[name]]
+
+    def test_no_component_dependencies(self):
+        for name, deps in DEPENDS_ON.items():
+            components = [r._name for r in deps if r._type.startswith("components:index:")]
+            assert components == [], f"{name} depends on components {components}"
+
+    def test_node_groups_wait_for_cluster_roles_and_routes(self):
+        deps = self._depends_on("test-cluster-eks-nodes-node-0")
+        assert "test-cluster-eks-main" in deps
+        assert "test-cluster-eks-AmazonEKSWorkerNodePolicy" in deps
+        assert "test-cluster-vpc-private-rtba-0" in deps
+        # Not the OIDC provider or the kubeconfig command
+        assert "test-cluster-eks-oidc-provider" not in deps
+        assert "test-cluster-eks-create_kubeconfig_provisioner_0" not in deps
+
+    def test_addons_wait_only_for_node_groups(self):
+        for name in ["test-cluster-efs-addon-addon", "test-cluster-ebs-addon-addon", "test-cluster-external-dns-sa"]:
+            assert self._depends_on(name) == ["test-cluster-eks-nodes-node-0", "test-cluster-eks-nodes-node-1"]
+
+    def test_storage_class_and_alb_controller_need_only_the_api_server(self):
+        assert self._depends_on("test-cluster-efs-addon-efs-sc") == []
+        assert "test-cluster-alb-controller-sa" not in DEPENDS_ON or self._depends_on("test-cluster-alb-controller-sa") == []
+
+    def test_ingress_dns_needs_no_kubeconfig(self):
+        # The Ingress is read through the cluster's k8s provider, not kubectl and a local context
+        assert self._depends_on("test-cluster-ingress-dns") == ["test-cluster-alb-controller-chart"]
+
+    def test_platform_layer_has_no_cluster_edges(self):
+        assert self._depends_on("layered-efs-addon-addon") == []
+        assert self._depends_on("layered-ingress-dns") == ["layered-alb-controller-chart"]
+
+
 class TestAlbController:
     @pulumi.runtime.test
     def test_alb_role_arn_exported(self):
@@ -134,6 +472,56 @@ class TestAlbController:
             assert name == "aws-load-balancer-controller"
         return pulumi.Output.from_input(infra.alb.service_account_name).apply(check)
 
+    def test_webhook_tls_defaults_to_ecdsa(self):
+        assert infra.alb.webhook_tls["key_algorithm"] == "ECDSA"
+
+    @pulumi.runtime.test
+    def test_webhook_tls_fingerprints_and_expiry_exported(self):
+        def check(args):
+            fingerprint, expiry = args
+            assert fingerprint
+            assert expiry.startswith("20")
+        return pulumi.Output.all(
+            infra.alb.webhook_tls["server_cert_fingerprint"],
+            infra.alb.webhook_tls["server_cert_expiry"],
+        ).apply(check)
+
+    def test_webhook_tls_renewal_window_must_fit_validity(self):
+        with pytest.raises(ValueError):
+            validate_tls_settings({"server_validity_hours": 24, "server_early_renewal_hours": 48})
+
+
+class TestAlbControllerProfile:
+    def test_profile_defaults_to_ip_targets(self):
+        values = alb_controller_profile_values({"replicas": 3})
+        assert values["replicaCount"] == 3
+        assert values["defaultTargetType"] == "ip"
+
+    @pytest.mark.parametrize("profile", [
+        {"replicas": 0},
+        {"ingress_max_concurrent_reconciles": "10"},
+        {"default_target_type": "nodeport"},
+        {"feature_gates": {"EnableIPTargetType": "yes"}},
+        {"max_reconciles": 10},
+    ])
+    def test_bad_profile_rejected(self, profile):
+        with pytest.raises(ValueError):
+            validate_alb_controller_profile(profile)
+
+
+class TestChartCache:
+    def test_cache_hit_returns_local_archive(self):
+        path = ChartCache(CHART_CACHE_DIR).get("aws-load-balancer-controller", "1.13.0", "https://invalid.example.com")
+        assert path == ALB_CHART_ARCHIVE
+
+    def test_digest_mismatch_rejected(self):
+        with pytest.raises(ChartCacheError):
+            ChartCache(CHART_CACHE_DIR).get("aws-load-balancer-controller", "1.13.0", "https://invalid.example.com", digest="0" * 64)
+
+    def test_unpinned_chart_rejected(self):
+        with pytest.raises(ChartCacheError):
+            ChartCache(CHART_CACHE_DIR).get("aws-load-balancer-controller", "", "https://invalid.example.com")
+
 
 class TestEfs:
     @pulumi.runtime.test
@@ -150,6 +538,215 @@ class TestEfs:
             assert fs_id.startswith("fs-")
         return infra.efs[0].efs_file_system_id.apply(check)
 
+    @pulumi.runtime.test
+    def test_efs_throughput_mode_exported(self):
+        def check(mode):
+            assert mode == "elastic"
+        return infra.efs[0].throughput_mode.apply(check)
+
+    @pulumi.runtime.test
+    def test_efs_one_mount_target_per_az(self):
+        efs = Efs(infra.providers, "test-efs-shared-az", {
+            'resource_prefix': "test-efs-shared-az",
+            'private_subnet_ids': ["subnet-a", "subnet-b", "subnet-c"],
+            'private_subnet_azs': ["us-east-1a", "us-east-1b", "us-east-1a"],
+            'vpc_id': "vpc-mock123",
+            'vpc_cidr': "10.0.0.0/20",
+        })
+        def check(ids):
+            assert len(ids) == 2, f"Expected 2 mount targets, got {len(ids)}"
+        return pulumi.Output.all(*efs.efs_mount_target_ids).apply(check)
+
+    def test_efs_provisioned_requires_mibps(self):
+        with pytest.raises(ValueError):
+            validate_efs_args({'throughput_mode': "provisioned"})
+
+    def test_efs_archive_requires_elastic(self):
+        with pytest.raises(ValueError):
+            validate_efs_args({'transition_to_ia': "AFTER_30_DAYS", 'transition_to_archive': "AFTER_90_DAYS"})
+
+
+class TestEfsAddon:
+    def test_efs_default_storage_class(self):
+        assert infra.efs_addon.storage_class_names == ["efs-sc-1000"]
+
+    def test_efs_tuned_mount_options_accepted(self):
+        validate_efs_mount_options(["tls", "iam", "noresvport", "rsize=1048576", "wsize=1048576", "nconnect=8", "actimeo=30"])
+
+    @pytest.mark.parametrize("options", [
+        ["bogus"],
+        ["async", "sync"],
+        ["rsize=1000"],
+        ["nconnect=32"],
+        ["iam"],
+        ["actimeo=30", "acregmin=3"],
+    ])
+    def test_efs_bad_mount_options_rejected(self, options):
+        with pytest.raises(ValueError):
+            validate_efs_mount_options(options)
+
+    def test_efs_gid_and_gid_range_exclusive(self):
+        with pytest.raises(ValueError):
+            validate_efs_storage_classes([{"name": "efs", "gid": 1000, "gid_range_start": 50000, "gid_range_end": 60000}])
+
+    def test_efs_sub_path_pattern_is_opt_in(self):
+        assert "subPathPattern" not in RESOURCE_PROPS["test-cluster-efs-addon-efs-sc"]["parameters"]
+        validate_efs_storage_classes([{"name": "efs", "reuse_access_point": True, "sub_path_pattern": "${.PVC.namespace}/${.PVC.name}"}])
+        with pytest.raises(ValueError):
+            validate_efs_storage_classes([{"name": "efs", "sub_path_pattern": "/absolute"}])
+
+    @pytest.mark.parametrize("perms", ["899", "78", "0700", "rwx"])
+    def test_efs_directory_perms_must_be_octal(self, perms):
+        with pytest.raises(ValueError):
+            validate_efs_storage_classes([{"name": "efs", "directory_perms": perms}])
+
+
+class TestAddonVersions:
+    def test_resolved_versions_are_cached(self):
+        with open(ADDON_VERSION_CACHE) as f:
+            cache = json.load(f)
+        assert cache["us-east-1/aws-efs-csi-driver/1.31"]["version"] == "v2.3.0-eksbuild.1"
+
+    def test_pinned_version_newer_than_compatible_rejected(self):
+        resolver = AddonVersionResolver(infra.providers, "1.31", "us-east-1",
+            pinned={"aws-efs-csi-driver": "v9.0.0-eksbuild.1"},
+            cache_path=ADDON_VERSION_CACHE,
+        )
+        with pytest.raises(ValueError):
+            resolver.resolve("aws-efs-csi-driver")
+
+    def test_pinned_version_not_supporting_kubernetes_version_rejected(self):
+        resolver = AddonVersionResolver(infra.providers, "1.31", "us-east-1",
+            pinned={"aws-efs-csi-driver": "v1.4.0-eksbuild.1"},
+            cache_path=ADDON_VERSION_CACHE,
+        )
+        with pytest.raises(ValueError, match="doesn't support Kubernetes 1.31"):
+            resolver.resolve("aws-efs-csi-driver")
+        with open(ADDON_VERSION_CACHE) as f:
+            cache = json.load(f)
+        assert cache["us-east-1/aws-efs-csi-driver/1.31/compatible"]["versions"][0] == "v2.3.0-eksbuild.1"
+
+    def test_older_pinned_version_kept(self):
+        resolver = AddonVersionResolver(infra.providers, "1.31", "us-east-1",
+            pinned={"aws-efs-csi-driver": "v2.1.0-eksbuild.1"},
+            cache_path=ADDON_VERSION_CACHE,
+        )
+        assert resolver.resolve("aws-efs-csi-driver") == "v2.1.0-eksbuild.1"
+
+
+class TestEbsAddon:
+    @pulumi.runtime.test
+    def test_ebs_csi_role_arn_exported(self):
+        def check(arn):
+            assert arn.startswith("arn:aws:iam:")
+        return infra.ebs_addon.ebs_csi_role_arn.apply(check)
+
+    def test_ebs_default_storage_class(self):
+        assert infra.ebs_addon.storage_class_names == ["gp3"]
+
+    def test_ebs_throughput_needs_iops(self):
+        with pytest.raises(ValueError):
+            validate_ebs_storage_classes([{"name": "fast", "iops": 3000, "throughput": 1000}])
+
+    def test_ebs_storage_class_names_unique(self):
+        with pytest.raises(ValueError):
+            validate_ebs_storage_classes([{"name": "gp3"}, {"name": "gp3"}])
+
+
+class TestFsx:
+    @pulumi.runtime.test
+    def test_fsx_openzfs_is_default(self):
+        def check(fs_id):
+            assert fs_id.startswith("fs-openzfs")
+        return infra.fsx.file_system_id.apply(check)
+
+    @pulumi.runtime.test
+    def test_fsx_lustre_exports_mount_name(self):
+        fsx = Fsx(infra.providers, "test-fsx-lustre", {
+            'resource_prefix': "test-fsx-lustre",
+            'file_system_type': "lustre",
+            'deployment_type': "PERSISTENT_2",
+            'throughput_capacity': 250,
+            'private_subnet_ids': ["subnet-a", "subnet-b"],
+            'vpc_id': "vpc-mock123",
+            'vpc_cidr': "10.0.0.0/20",
+        })
+        def check(mount_name):
+            assert mount_name == "abcdefgh"
+        return fsx.mount_name.apply(check)
+
+    def test_lustre_cache_bound_to_one_claim(self):
+        assert "fleet-team-a-fsx-addon-fsx-sc" not in RESOURCE_PROPS
+        volume = RESOURCE_PROPS["fleet-team-a-fsx-addon-fsx-pv"]["spec"]
+        claim = RESOURCE_PROPS["fleet-team-a-fsx-addon-fsx-pvc"]
+        # No storage class on either side, so nothing else binds the volume or provisions a new one
+        assert volume["storage_class_name"] == claim["spec"]["storage_class_name"] == ""
+        assert volume["claim_ref"] == {"namespace": "core-builds", "name": "fsx-build-cache"}
+        assert RESOURCE_PROPS["fleet-team-a-fsx-addon-claim-namespace"]["metadata"] == {"name": "core-builds"}
+        assert fleet.cluster_outputs["team-b"]["fsx_storage_class_name"] is None
+
+    @pulumi.runtime.test
+    def test_lustre_claim_names_the_volume(self):
+        def check(args):
+            volume_name, capacity, claim_name, claim_namespace = args
+            assert volume_name == "fsx-build-cache"
+            assert capacity == "1200Gi"
+            # Exported for the build pods to mount
+            assert [claim_name, claim_namespace] == ["fsx-build-cache", "core-builds"]
+        claim = RESOURCE_PROPS["fleet-team-a-fsx-addon-fsx-pvc"]["spec"]
+        outputs = fleet.cluster_outputs["team-a"]
+        return pulumi.Output.all(claim["volume_name"], claim["resources"]["requests"]["storage"],
+                                 outputs["fsx_claim_name"], outputs["fsx_claim_namespace"]).apply(check)
+
+    def test_fsx_throughput_must_match_deployment_type(self):
+        with pytest.raises(ValueError):
+            validate_fsx_args({'file_system_type': "openzfs", 'deployment_type': "SINGLE_AZ_1", 'throughput_capacity': 320})
+
+
+class TestRds:
+    @pulumi.runtime.test
+    def test_database_dns_points_at_proxy(self):
+        def check(args):
+            record, proxy_endpoint = args
+            assert record == "db"
+            assert "proxy" in proxy_endpoint
+        return pulumi.Output.all(infra.rds.dns_name, infra.rds.proxy_endpoint).apply(check)
+
+    @pulumi.runtime.test
+    def test_database_password_is_secret(self):
+        def check(is_secret):
+            assert is_secret
+        return pulumi.Output.from_input(infra.rds.password.is_secret()).apply(check)
+
+    def test_database_acu_range_rejected(self):
+        with pytest.raises(ValueError):
+            validate_rds_args({"mode": "aurora-serverless", "min_acu": 8, "max_acu": 2})
+
+    @pulumi.runtime.test
+    def test_database_reader_record(self):
+        def check(reader):
+            assert reader == "db-ro"
+        return infra.rds.reader_dns_name.apply(check)
+
+    def test_parameter_profile_sizes_buffer_pool(self):
+        params = {p["name"]: p for p in rds_parameters("aurora-mysql8.0", "instance", 60, {"long_query_time": "2"})}
+        assert params["innodb_buffer_pool_size"]["value"] == "{DBInstanceClassMemory*60/100}"
+        assert params["innodb_buffer_pool_size"]["apply_method"] == "pending-reboot"
+        assert params["long_query_time"]["value"] == "2"
+        # Charset lives on the cluster group for Aurora
+        assert "character_set_server" not in params
+
+    def test_database_gp3_iops_needs_large_volume(self):
+        with pytest.raises(ValueError):
+            validate_rds_args({"mode": "instance", "allocated_storage": 100, "storage_iops": 12000})
+        validate_rds_args({"mode": "instance", "allocated_storage": 400, "storage_iops": 12000, "storage_throughput": 500})
+
+    def test_database_monitoring_settings_rejected(self):
+        with pytest.raises(ValueError):
+            validate_rds_args({"mode": "instance", "monitoring_interval": 7})
+        with pytest.raises(ValueError):
+            validate_rds_args({"mode": "instance", "performance_insights_retention_days": 30})
+
 
 class TestRoute53:
     @pulumi.runtime.test
@@ -171,6 +768,48 @@ class TestRoute53:
             assert len(ns) >= 2
         return infra.zone.nameservers.apply(check)
 
+    @pulumi.runtime.test
+    def test_validation_records_deduplicated(self):
+        """*.test.example.com and test.example.com share one record; example.com gets its own."""
+        assert sorted(infra.zone.validation_records) == ["example.com", "test.example.com"]
+        def check(fqdns):
+            assert fqdns == ["_abc.test.example.com.", "_abc.example.com."]
+        return pulumi.Output.all(*infra.zone.validation_records.values()).apply(check)
+
+    @pulumi.runtime.test
+    def test_ingress_alb_hostname_resolved(self):
+        def check(hostname):
+            assert hostname.endswith(".elb.amazonaws.com")
+        return infra.ingress_dns.alb_dns_name.apply(check)
+
+    @pulumi.runtime.test
+    def test_ingress_alias_is_wildcard(self):
+        def check(fqdn):
+            assert fqdn == "*.test.example.com"
+        return infra.ingress_dns.record_fqdn.apply(check)
+
+    def test_ingress_without_alb_rejected(self):
+        status = k8s.networking.v1.outputs.IngressStatus(load_balancer=k8s.networking.v1.outputs.IngressLoadBalancerStatus(ingress=[]))
+        with pytest.raises(ValueError, match="core/cjoc"):
+            ingress_hostname(status, "core/cjoc")
+        with pytest.raises(ValueError):
+            ingress_hostname(None, "core/cjoc")
+
+
+class TestExternalDns:
+    @pulumi.runtime.test
+    def test_external_dns_role_arn_exported(self):
+        def check(arn):
+            assert arn.startswith("arn:aws:iam:")
+        return infra.external_dns.external_dns_role_arn.apply(check)
+
+    def test_external_dns_defaults_to_upsert_only(self):
+        assert infra.external_dns.policy == "upsert-only"
+
+    def test_external_dns_sync_requires_txt_registry(self):
+        with pytest.raises(ValueError):
+            validate_external_dns_settings({"policy": "sync", "registry": "noop"})
+
 
 class TestIamPolicies:
     @pulumi.runtime.test
@@ -203,4 +842,349 @@ class TestIamPolicies:
             assert "Federated" in statements[1]["Principal"]
             assert "StringEquals" in statements[1]["Condition"]
 
-        return infra.eks.eks_node_role.assume_role_policy.apply(check)
\ No newline at end of file
+        return infra.eks.eks_node_role.assume_role_policy.apply(check)
+
+    @pulumi.runtime.test
+    def test_node_role_trusts_the_clusters_oidc_provider(self):
+        def check(policy_json):
+            federated = json.loads(policy_json)["Statement"][1]["Principal"]["Federated"]
+            assert federated == "arn:aws:iam::123456789012:oidc-provider/oidc.eks.us-east-1.amazonaws.com/id/ABCDEF1234"
+        return infra.eks.eks_node_role.assume_role_policy.apply(check)
+
+
+class TestServiceAccountRoles:
+    def test_irsa_trust_policy(self):
+        policy = json.loads(trust_policy("irsa", "kube-system", "external-dns", "arn:aws:iam::123456789012:oidc-provider/oidc.example", "oidc.example"))
+        statement = policy["Statement"][0]
+        assert statement["Action"] == "sts:AssumeRoleWithWebIdentity"
+        assert statement["Condition"]["StringEquals"]["oidc.example:sub"] == "system:serviceaccount:kube-system:external-dns"
+
+    def test_trust_policies_are_memoized(self):
+        first = trust_policy("pod-identity", "kube-system", "external-dns")
+        assert trust_policy("pod-identity", "kube-system", "external-dns") is first
+        assert json.loads(first)["Statement"][0]["Principal"] == {"Service": "pods.eks.amazonaws.com"}
+
+    def test_unknown_mode_rejected(self):
+        with pytest.raises(ValueError):
+            validate_service_account_role_mode("kiam")
+
+    def test_irsa_controllers_have_no_association(self):
+        assert "test-cluster-eks-oidc-provider" in DEPENDS_ON
+        assert not any(name.startswith("test-cluster-") and name.endswith("-pod-identity") for name in DEPENDS_ON)
+        assert RESOURCE_PROPS["test-cluster-efs-addon-addon"]["service_account_role_arn"] is not None
+
+    def test_pod_identity_replaces_the_oidc_provider(self):
+        assert "fleet-team-a-eks-oidc-provider" not in DEPENDS_ON
+        assert fleet.eks_clusters["team-a"].oidc_provider_arn is None
+        for component in ["efs-addon", "ebs-addon", "alb-controller", "external-dns"]:
+            association = RESOURCE_PROPS[f"fleet-team-a-{component}-pod-identity"]
+            assert association["namespace"] == "kube-system"
+        assert RESOURCE_PROPS["fleet-team-a-efs-addon-addon"].get("service_account_role_arn") is None
+
+    def test_pod_identity_workloads_wait_for_agent_and_association(self):
+        assert RESOURCE_PROPS["fleet-team-a-pod-identity-agent"]["addon_name"] == "eks-pod-identity-agent"
+        deps = [r._name for r in DEPENDS_ON["fleet-team-a-alb-controller-sa"]]
+        assert "fleet-team-a-pod-identity-agent" in deps
+        assert "fleet-team-a-alb-controller-pod-identity" in deps
+        deps = [r._name for r in DEPENDS_ON["fleet-team-b-ebs-addon-addon"]]
+        assert "fleet-team-b-pod-identity-agent" in deps
+        assert "fleet-team-b-ebs-addon-pod-identity" in deps
+
+class TestClusterDns:
+    def test_coredns_autoscales_by_default(self):
+        values = json.loads(RESOURCE_PROPS["fleet-team-a-dns-coredns"]["configuration_values"])
+        assert values["autoScaling"] == {"enabled": True, "minReplicas": 2, "maxReplicas": 10}
+        assert "cache 30" in values["corefile"]
+
+    def test_fixed_replicas_and_cache_ttl(self):
+        values = json.loads(coredns_configuration_values({"autoscaling": False, "replicas": 4, "cache_ttl": 60}))
+        assert values["replicaCount"] == 4
+        assert "autoScaling" not in values
+        assert "cache 60" in values["corefile"]
+
+    def test_min_replicas_above_max_rejected(self):
+        with pytest.raises(ValueError):
+            validate_coredns_settings({"min_replicas": 5, "max_replicas": 3})
+
+    def test_kubelet_points_at_node_local_dns(self):
+        user_data = base64.b64decode(RESOURCE_PROPS["fleet-team-b-eks-nodes-node-template"]["user_data"]).decode()
+        assert "kind: NodeConfig" in user_data
+        assert "- 169.254.20.10" in user_data
+
+    def test_bottlerocket_and_al2_user_data(self):
+        assert 'cluster-dns-ip = "169.254.20.10"' in base64.b64decode(node_user_data("BOTTLEROCKET_x86_64", "169.254.20.10")).decode()
+        assert node_user_data("AL2_x86_64") is None
+        with pytest.raises(ValueError):
+            node_user_data("AL2_x86_64", "169.254.20.10")
+
+    def test_workloads_wait_for_node_local_dns(self):
+        for name in ["fleet-team-a-alb-controller-sa", "fleet-team-a-external-dns-sa", "fleet-team-a-ebs-addon-addon"]:
+            assert "fleet-team-a-dns-node-local-dns" in [r._name for r in DEPENDS_ON[name]], name
+        assert "test-cluster-dns" not in DEPENDS_ON
+        assert RESOURCE_PROPS["test-cluster-eks-nodes-node-template"].get("user_data") is None
+
+    def test_node_local_dns_needs_node_config_ami(self):
+        cfg = infra.cfg.__class__(**{
+            **{f: getattr(infra.cfg, f) for f in infra.cfg.__slots__},
+            'create_node_local_dns': True,
+            'clusters': tuple(replace(c, eks_nodegroup_ami_type="AL2_x86_64") for c in infra.cfg.clusters),
+        })
+        assert any("AL2_x86_64" in err for err in validate_stack_config(cfg))
+
+    def test_node_local_dns_needs_all_layer(self):
+        cfg = platform.cfg.__class__(**{
+            **{f: getattr(platform.cfg, f) for f in platform.cfg.__slots__},
+            'create_node_local_dns': True,
+        })
+        assert "create_node_local_dns needs an 'all' stack, this is a 'platform' stack" in validate_stack_config(cfg)
+
+class TestKubeProxy:
+    def test_ipvs_mode_configured(self):
+        values = json.loads(RESOURCE_PROPS["fleet-team-a-kube-proxy-addon"]["configuration_values"])
+        assert values == {"mode": "ipvs", "ipvs": {"scheduler": "lc"}}
+        assert fleet.cluster_outputs["team-b"]["kube_proxy_mode"] == "ipvs"
+        assert "test-cluster-kube-proxy" not in DEPENDS_ON
+
+    def test_nodes_load_ipvs_modules(self):
+        user_data = base64.b64decode(RESOURCE_PROPS["fleet-team-a-eks-nodes-node-template"]["user_data"]).decode()
+        assert "modprobe ip_vs_lc" in user_data
+        # Both the module script and the kubelet settings are in the one multipart document
+        assert "kind: NodeConfig" in user_data
+
+    def test_ipvs_mode_needs_all_layer(self):
+        settings = {f: getattr(platform.cfg, f) for f in platform.cfg.__slots__}
+        cfg = platform.cfg.__class__(**{**settings, 'create_kube_proxy_addon': True})
+        assert "create_kube_proxy_addon in IPVS mode needs an 'all' stack, this is a 'platform' stack" in validate_stack_config(cfg)
+        cfg = platform.cfg.__class__(**{**settings, 'create_kube_proxy_addon': True, 'kube_proxy_settings': {"mode": "iptables"}})
+        assert not any("create_kube_proxy_addon" in error for error in validate_stack_config(cfg))
+
+    def test_iptables_mode_needs_no_modules(self):
+        assert ipvs_kernel_modules({"mode": "iptables"}) == []
+        assert json.loads(kube_proxy_configuration_values({"mode": "iptables"})) == {"mode": "iptables"}
+
+    def test_unknown_scheduler_rejected(self):
+        with pytest.raises(ValueError):
+            validate_kube_proxy_settings({"ipvs_scheduler": "random"})
+
+class TestApiPriority:
+    def test_controllers_and_agents_get_their_own_levels(self):
+        controllers = RESOURCE_PROPS["test-cluster-api-priority-controllers"]["spec"]
+        assert controllers["priority_level_configuration"] == {"name": "ci-controllers"}
+        assert [s["service_account"] for s in controllers["rules"][0]["subjects"]] == [
+            {"name": "jenkins", "namespace": "core"}, {"name": "cjoc", "namespace": "core"},
+        ]
+        agents = RESOURCE_PROPS["test-cluster-api-priority-agents"]["spec"]
+        assert agents["rules"][0]["subjects"][0]["service_account"] == {"name": "*", "namespace": "core-builds"}
+        # Matched before the built-in service-accounts schema, controllers first
+        assert controllers["matching_precedence"] < agents["matching_precedence"] < 9000
+
+    def test_controllers_do_not_lend_their_seats(self):
+        levels = {name: RESOURCE_PROPS[f"fleet-team-a-api-priority-{name}-level"]["spec"]["limited"] for name in ["controllers", "agents"]}
+        assert levels["controllers"]["lendable_percent"] == 0
+        assert levels["agents"]["nominal_concurrency_shares"] == 10
+        assert fleet.cluster_outputs["team-a"]["api_priority_settings"]["agent_namespace"] == "agents"
+
+    def test_schemas_wait_for_their_levels(self):
+        assert [r._name for r in DEPENDS_ON["test-cluster-api-priority-agents"]] == ["test-cluster-api-priority-agents-level"]
+
+    def test_settings(self):
+        assert effective_api_priority_settings({}, "ci")["agent_namespace"] == "ci-builds"
+        with pytest.raises(ValueError):
+            validate_api_priority_settings({"controller_service_accounts": []})
+        with pytest.raises(ValueError):
+            validate_api_priority_settings({"agent_lendable_percent": 150})
+
+class TestObservability:
+    def test_control_plane_logs_kept_for_retention(self):
+        assert RESOURCE_PROPS["test-cluster-eks-main"]["enabled_cluster_log_types"] == ["api", "audit", "scheduler"]
+        log_group = RESOURCE_PROPS["test-cluster-eks-control-plane-logs"]
+        assert log_group["name"] == "/aws/eks/test-cluster/cluster"
+        assert log_group["retention_in_days"] == 14
+        # Created before the cluster, so EKS doesn't create it without a retention
+        assert "test-cluster-eks-control-plane-logs" in [r._name for r in DEPENDS_ON["test-cluster-eks-main"]]
+
+    def test_bad_logging_settings_rejected(self):
+        with pytest.raises(ValueError):
+            validate_control_plane_logging(["api", "kubelet"], 30)
+        with pytest.raises(ValueError):
+            validate_control_plane_logging(["api"], 10)
+
+    def test_metrics_server_waits_for_nodes(self):
+        deps = [r._name for r in DEPENDS_ON["test-cluster-observability-metrics-server"]]
+        assert deps == ["test-cluster-eks-nodes-node-0", "test-cluster-eks-nodes-node-1"]
+
+    def test_cloudwatch_agent_credentials(self):
+        addon = RESOURCE_PROPS["test-cluster-observability-cloudwatch-observability"]
+        assert addon["addon_name"] == "amazon-cloudwatch-observability"
+        assert json.loads(addon["configuration_values"]) == {"containerLogs": {"enabled": False}}
+        # Pod Identity clusters associate the agent's service account instead
+        association = RESOURCE_PROPS["fleet-team-a-observability-cloudwatch-agent-pod-identity"]
+        assert (association["namespace"], association["service_account"]) == ("amazon-cloudwatch", "cloudwatch-agent")
+
+    def test_dashboard_covers_api_server_scheduling_and_nodes(self):
+        body = json.loads(dashboard_body("test-cluster", "us-east-1", container_insights=True))
+        metrics = [m for widget in body["widgets"] for m in widget["properties"]["metrics"]]
+        assert ["AWS/EKS", "apiserver_request_duration_seconds_LIST_P99", "ClusterName", "test-cluster"] in metrics
+        assert any(m[1] == "scheduler_pending_pods" for m in metrics)
+        assert any(m[0] == "ContainerInsights" and m[1] == "pod_cpu_utilization" for m in metrics)
+        body = json.loads(dashboard_body("test-cluster", "us-east-1", container_insights=False))
+        assert not any(w["properties"]["metrics"][0][0] == "ContainerInsights" for w in body["widgets"])
+
+    @pulumi.runtime.test
+    def test_dashboard_name_exported(self):
+        def check(name):
+            assert name == "test-cluster-performance"
+        return infra.observability.dashboard_name.apply(check)
+
+class TestHelper:
+    def test_render_values_matches_envsubst(self):
+        rendered = render_values('HostName: "${hosted_zone_name}"\narn: $certificate_arn\nunset: "${nope}"', {
+            "hosted_zone_name": "ci.example.com",
+            "certificate_arn": "arn:aws:acm:cert",
+        })
+        assert rendered == 'HostName: "ci.example.com"\narn: arn:aws:acm:cert\nunset: ""'
+
+    def test_alb_inbound_cidrs(self):
+        ctx = StackContext(stack=None, config={
+            "pulumi-eks:myip": "203.0.113.50/32",
+            "pulumi-eks:additional_alb_access_cidrs": json.dumps(["10.1.0.0/16"]),
+        }, outputs={"nat_public_ip": "198.51.100.7"})
+        assert alb_inbound_cidrs(ctx) == "203.0.113.50/32,198.51.100.7/32,10.1.0.0/16"
+
+    def test_agent_namespace_left_to_the_stack_with_lustre_claim(self):
+        assert helm_values_env(StackContext(stack=None, config={}, outputs={}))["create_agent_namespace"] == "true"
+        ctx = StackContext(stack=None, config={}, outputs={"fsx_claim_namespace": "core-builds"})
+        assert helm_values_env(ctx)["create_agent_namespace"] == "false"
+
+    def test_stack_read_once(self):
+        class Value:
+            def __init__(self, value):
+                self.value = value
+
+        class FakeStack:
+            calls = []
+            def get_all_config(self):
+                self.calls.append("config")
+                return {"pulumi-eks:ci_namespace": Value("core")}
+            def outputs(self):
+                self.calls.append("outputs")
+                return {"zone_name": Value("ci.example.com")}
+
+        ctx = asyncio.run(read_stack(FakeStack()))
+        assert sorted(FakeStack.calls) == ["config", "outputs"]
+        assert ctx.config_value("ci_namespace") == "core"
+        assert ctx.output("zone_name") == "ci.example.com"
+
+    def test_cluster_steps_target_the_primary_cluster(self, monkeypatch):
+        commands = []
+        async def run(*cmd, check=True, capture=False):
+            commands.append(cmd)
+            return "exists" if capture else ""
+        monkeypatch.setattr(automation, "run", run)
+        ctx = StackContext(stack=None, config={
+            "pulumi-eks:resource_prefix": "fleet",
+            "pulumi-eks:ci_version": "3.1.0",
+        }, outputs={"eks_cluster_name": "team-a"})
+
+        asyncio.run(automation.helm_install(ctx, "values.yaml"))
+        asyncio.run(automation.helm_uninstall(ctx))
+        asyncio.run(automation.ecr_access(ctx, "delete", "123456789012"))
+        kubectl = [cmd for cmd in commands if cmd[0] == "kubectl"]
+        helm = [cmd for cmd in commands if cmd[0] == "helm"]
+        eksctl = [cmd for cmd in commands if cmd[0] == "eksctl"]
+        assert kubectl and all(cmd[1:3] == ("--context", "team-a") for cmd in kubectl)
+        assert helm and all(cmd[cmd.index("--kube-context") + 1] == "team-a" for cmd in helm)
+        assert eksctl and all(cmd[cmd.index("--cluster") + 1] == "team-a" for cmd in eksctl)
+
+    def test_create_waits_for_the_alb_hostname(self, monkeypatch):
+        steps = []
+        async def stream(*cmd):
+            steps.append(cmd)
+            for line in ["", "", "k8s-core-cjoc-0123456789.us-east-1.elb.amazonaws.com"]:
+                steps.append(f"event {line!r}")
+                yield line
+            steps.append("unreachable")
+        async def set_ingress_dns_alias(ctx, enabled):
+            steps.append(f"alias {enabled}")
+            return {}
+        monkeypatch.setattr(automation, "stream", stream)
+        monkeypatch.setattr(automation, "set_ingress_dns_alias", set_ingress_dns_alias)
+        ctx = StackContext(stack=None, config={"pulumi-eks:ci_namespace": "ci"}, outputs={"eks_cluster_name": "team-a"})
+
+        asyncio.run(automation.install_helper(ctx, "create"))
+        watch = steps[0]
+        assert watch[:3] == ("kubectl", "--context", "team-a")
+        assert watch[watch.index("-n") + 1] == "ci"
+        assert watch[watch.index("--field-selector") + 1] == "metadata.name=cjoc"
+        assert "--watch" in watch
+        assert steps[1:] == ["event ''", "event ''", "event 'k8s-core-cjoc-0123456789.us-east-1.elb.amazonaws.com'", "alias True"]
+
+    def test_ingress_wait_times_out(self, monkeypatch):
+        closed = []
+        async def stream(*cmd):
+            try:
+                yield ""
+                await asyncio.sleep(60)
+            finally:
+                closed.append(True)
+        monkeypatch.setattr(automation, "stream", stream)
+        ctx = StackContext(stack=None, config={}, outputs={"eks_cluster_name": "team-a"})
+
+        with pytest.raises(automation.HelperError, match="core/cjoc has no ALB hostname"):
+            asyncio.run(automation.wait_for_ingress_hostname(ctx, timeout=0.05))
+        assert closed == [True]
+
+    def test_cluster_steps_need_the_cluster_output(self):
+        with pytest.raises(automation.HelperError, match="eks_cluster_name"):
+            asyncio.run(automation.helm_uninstall(StackContext(stack=None, config={}, outputs={})))
+
+
+class TestDeploymentTiming:
+    PREFIX = "urn:pulumi:cbci::pulumi-eks::"
+
+    def urn(self, typ, name):
+        return f"{self.PREFIX}{typ}::{name}"
+
+    def event(self, kind, typ, name, ts):
+        metadata = events.StepEventMetadata(op=events.OpType.CREATE, urn=self.urn(typ, name), type=typ.split("$")[-1], provider="")
+        if kind == "pre":
+            return events.EngineEvent(sequence=ts, timestamp=ts, resource_pre_event=events.ResourcePreEvent(metadata))
+        return events.EngineEvent(sequence=ts, timestamp=ts, res_outputs_event=events.ResOutputsEvent(metadata))
+
+    def test_critical_path_names_components(self):
+        vpc = self.urn("components:index:Vpc", "vpc")
+        subnet = self.urn("components:index:Vpc$aws:ec2/subnet:Subnet", "sn")
+        eks = self.urn("components:index:Eks", "eks")
+        cluster = self.urn("components:index:Eks$aws:eks/cluster:Cluster", "cluster")
+        zone = self.urn("components:index:Route53", "zone")
+        cert = self.urn("components:index:Route53$aws:acm/certificateValidation:CertificateValidation", "cert")
+        nodes = self.urn("components:index:EksNodesEc2", "nodes")
+        ng = self.urn("components:index:EksNodesEc2$aws:eks/nodeGroup:NodeGroup", "ng")
+
+        timer = DeploymentTimer()
+        for kind, typ, name, ts in [
+            ("pre", "components:index:Vpc$aws:ec2/subnet:Subnet", "sn", 0),
+            ("pre", "components:index:Route53$aws:acm/certificateValidation:CertificateValidation", "cert", 0),
+            ("out", "components:index:Vpc$aws:ec2/subnet:Subnet", "sn", 10),
+            ("pre", "components:index:Eks$aws:eks/cluster:Cluster", "cluster", 10),
+            ("out", "components:index:Route53$aws:acm/certificateValidation:CertificateValidation", "cert", 300),
+            ("out", "components:index:Eks$aws:eks/cluster:Cluster", "cluster", 610),
+            ("pre", "components:index:EksNodesEc2$aws:eks/nodeGroup:NodeGroup", "ng", 610),
+            ("out", "components:index:EksNodesEc2$aws:eks/nodeGroup:NodeGroup", "ng", 800),
+        ]:
+            timer.on_event(self.event(kind, typ, name, ts))
+        timer.add_state([
+            {"urn": vpc, "type": "components:index:Vpc"},
+            {"urn": subnet, "type": "aws:ec2/subnet:Subnet", "parent": vpc},
+            {"urn": eks, "type": "components:index:Eks"},
+            {"urn": cluster, "type": "aws:eks/cluster:Cluster", "parent": eks, "dependencies": [subnet]},
+            {"urn": zone, "type": "components:index:Route53"},
+            {"urn": cert, "type": "aws:acm/certificateValidation:CertificateValidation", "parent": zone},
+            {"urn": nodes, "type": "components:index:EksNodesEc2"},
+            {"urn": ng, "type": "aws:eks/nodeGroup:NodeGroup", "parent": nodes, "dependencies": [cluster]},
+        ])
+
+        report = timer.report()
+        assert [step["component"] for step in report["critical_path"]] == ["Vpc", "Eks", "EksNodesEc2"]
+        assert report["critical_path_by_component"] == {"Eks": 600, "EksNodesEc2": 190, "Vpc": 10}
+        assert report["total_seconds"] == 800